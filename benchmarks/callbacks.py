@@ -0,0 +1,150 @@
+# benchmarks/callbacks.py
+
+import argparse
+import asyncio
+import json
+import platform
+import random
+import string
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+import aiogram
+from aiogram import Router
+from aiogram.types import CallbackQuery
+from benchmarks.stats import summarize
+from services.callbacks import CallbackCodec, CallbackTable
+
+# Стоимость выбора хендлера callback в роутере aiogram в зависимости от числа маршрутов:
+# цепочка фильтров startswith с разбором split("_") в хендлере (как было в user_handlers)
+# против одной таблицы CallbackTable. Хендлеры пустые — меряется только маршрутизация и разбор.
+
+BATCH = 100
+
+
+class _Item(NamedTuple):
+    item_id: int
+    page: int = 0
+
+
+def _prefix(index: int) -> str:
+    # x… не пересекается с префиксами кнопок бота (имена маршрутов общие для метрик)
+    letters = ""
+    index += 1
+    while index:
+        index, rest = divmod(index - 1, 26)
+        letters = string.ascii_lowercase[rest] + letters
+    return "x" + letters
+
+
+def build_filters_router(routes: int) -> Router:
+    router = Router()
+    for i in range(routes):
+        prefix = f"{_prefix(i)}_"
+
+        async def handler(callback: CallbackQuery) -> None:
+            parts = callback.data.split("_")
+            int(parts[1]), int(parts[2])
+
+        router.callback_query.register(handler, lambda c, p=prefix: c.data and c.data.startswith(p))
+    return router
+
+
+def build_table_router(routes: int) -> Router:
+    router = Router()
+    table = CallbackTable()
+    table.attach(router)
+
+    async def handler(callback: CallbackQuery, item: _Item) -> None:
+        pass
+
+    for i in range(routes):
+        table.register(CallbackCodec(f"bench_{i}", _prefix(i), _Item), handler)
+    return router
+
+
+def _callback(data: str) -> CallbackQuery:
+    return CallbackQuery.model_validate({
+        "id": "1", "from": {"id": 1, "is_bot": False, "first_name": "Bench"}, "chat_instance": "1", "data": data,
+    })
+
+
+async def _measure(router: Router, events: Sequence[CallbackQuery], batches: int) -> Dict[str, float]:
+    # Одна операция слишком коротка для perf_counter, поэтому замер — средняя по пачке
+    samples = []
+    wall_started = time.perf_counter()
+    for b in range(batches):
+        started = time.perf_counter()
+        for event in events[b * BATCH:(b + 1) * BATCH]:
+            await router.propagate_event("callback_query", event)
+        samples.append((time.perf_counter() - started) / BATCH)
+    wall = time.perf_counter() - wall_started
+    result = summarize(samples, wall / BATCH)
+    result["ops"] = batches * BATCH
+    result["mean_us"] = result["mean_ms"] * 1000
+    return result
+
+
+async def bench(routes: int, batches: int, rng: random.Random) -> Dict[str, Dict[str, float]]:
+    # Нажатия равномерно по всем маршрутам: у цепочки фильтров в среднем проверяется половина
+    targets = [rng.randrange(routes) for _ in range(batches * BATCH)]
+    old = [_callback(f"{_prefix(t)}_{rng.randrange(10_000)}_1") for t in targets]
+    packed = [_callback(f"{_prefix(t)}1:{rng.randrange(10_000)}:1") for t in targets]
+    warmup = max(1, batches // 10)
+    results = {}
+    for name, router, events in (
+            ("filters", build_filters_router(routes), old),
+            ("table", build_table_router(routes), packed),
+    ):
+        await _measure(router, events, warmup)
+        results[f"callback.{name}[{routes}]"] = await _measure(router, events, batches)
+    return results
+
+
+def run(route_counts: Sequence[int], batches: int, seed: int = 1) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    results: Dict[str, Dict[str, float]] = {}
+    for routes in route_counts:
+        results.update(asyncio.run(bench(routes, batches, rng)))
+    # Во сколько раз выросла средняя стоимость от меньшего числа маршрутов к большему
+    low, high = min(route_counts), max(route_counts)
+    growth = {
+        name: results[f"callback.{name}[{high}]"]["mean_ms"] / results[f"callback.{name}[{low}]"]["mean_ms"]
+        for name in ("filters", "table")
+    }
+    return {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "aiogram": aiogram.__version__,
+            "platform": platform.platform(),
+            "routes": list(route_counts),
+            "iterations": batches * BATCH,
+        },
+        "results": results,
+        "growth": growth,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Callback dispatch cost vs number of registered callbacks")
+    parser.add_argument("--routes", default="1,10,100,1000", help="Comma-separated route counts")
+    parser.add_argument("--batches", type=int, default=10, help=f"Batches of {BATCH} callbacks per case")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write JSON report to this file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    route_counts = [int(n) for n in args.routes.split(",") if n.strip()]
+    report = run(route_counts, args.batches, args.seed)
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
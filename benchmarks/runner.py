@@ -0,0 +1,276 @@
+# benchmarks/runner.py
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timezone
+from typing import Any, AsyncGenerator, Awaitable, Callable, Dict, List, Optional
+import sqlalchemy
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import TelegramMethod
+from aiogram.types import CallbackQuery, Message
+from sqlalchemy.orm import sessionmaker
+import config
+from benchmarks.seed import Scale, SeededShop, seed_shop
+from benchmarks.stats import summarize
+from database import crud, sales
+from database.db import create_db_engine
+from handlers import user_handlers
+from middlewares.db import DbSessionMiddleware
+from services.cart import cart_store
+from services.catalog_cache import catalog_cache
+from services.user_cache import user_cache
+
+BENCH_TOKEN = "123456:benchmark"
+
+
+# Сессия бота без сети: ответы Bot API собираются на месте, чтобы мерить только наш код
+class NullSession(BaseSession):
+    async def make_request(self, bot: Bot, method: TelegramMethod, timeout: Optional[int] = None) -> Any:
+        returning = str(method.__returning__)
+        if "Message" not in returning:
+            return True
+        chat_id = getattr(method, "chat_id", None) or 1
+        return Message.model_validate(
+            {"message_id": 1, "date": 0, "chat": {"id": chat_id, "type": "private"}, "text": ""},
+            context={"bot": bot},
+        )
+
+    async def stream_content(self, url: str, headers: Optional[Dict[str, Any]] = None, timeout: int = 30,
+                             chunk_size: int = 65536, raise_for_status: bool = True) -> AsyncGenerator[bytes, None]:
+        yield b""
+
+    async def close(self) -> None:
+        pass
+
+
+def measure(op: Callable[[int], Any], iterations: int, warmup: int) -> Dict[str, float]:
+    for i in range(warmup):
+        op(i)
+    samples = []
+    wall_started = time.perf_counter()
+    for i in range(iterations):
+        started = time.perf_counter()
+        op(i)
+        samples.append(time.perf_counter() - started)
+    return summarize(samples, time.perf_counter() - wall_started)
+
+
+async def measure_async(op: Callable[[int], Awaitable[Any]], iterations: int, warmup: int) -> Dict[str, float]:
+    for i in range(warmup):
+        await op(i)
+    samples = []
+    wall_started = time.perf_counter()
+    for i in range(iterations):
+        started = time.perf_counter()
+        await op(i)
+        samples.append(time.perf_counter() - started)
+    return summarize(samples, time.perf_counter() - wall_started)
+
+
+def bench_crud(factory: sessionmaker, shop: SeededShop, rng: random.Random,
+               iterations: int, warmup: int) -> Dict[str, Dict[str, float]]:
+    results = {}
+    page = config.CATALOG_PAGE_SIZE + 1
+    with factory() as db:
+        results["crud.get_products"] = measure(
+            lambda i: crud.get_products(db, category_id=rng.choice(shop.category_ids), limit=page),
+            iterations, warmup,
+        )
+        db.expunge_all()
+        results["crud.get_orders_by_user"] = measure(
+            lambda i: crud.get_orders_by_user(db, rng.choice(shop.user_ids)), iterations, warmup
+        )
+        db.expunge_all()
+        results["crud.get_order_details"] = measure(
+            lambda i: crud.get_order_details(db, rng.choice(shop.order_ids)), iterations, warmup
+        )
+
+        # Отчёт /stats по всей истории: читает только сводку daily_sales
+        def sales_report(i: int) -> None:
+            since = date.min
+            sales.revenue_by_day(db, since)
+            sales.revenue_by_category(db, since)
+            sales.top_products(db, since, config.STATS_TOP_LIMIT)
+            sales.low_stock(db, config.LOW_STOCK_THRESHOLD, config.STATS_TOP_LIMIT)
+
+        results["sales.report"] = measure(sales_report, iterations, warmup)
+
+    # Каждая покупка откатывается, чтобы повторные прогоны шли по одинаковым данным
+    with factory() as db:
+        order = crud.create_order(db, shop.user_ids[0])
+
+        def add_item(i: int) -> None:
+            crud.add_item_to_order(db, order.id, rng.choice(shop.product_ids), 1)
+
+        results["crud.add_item_to_order"] = measure(add_item, iterations, warmup)
+        db.rollback()
+    return results
+
+
+def _user(tg_id: int) -> Dict[str, Any]:
+    return {"id": tg_id, "is_bot": False, "first_name": "Bench", "username": f"user{tg_id}"}
+
+
+def fake_message(bot: Bot, tg_id: int, text: str) -> Message:
+    return Message.model_validate(
+        {"message_id": 1, "date": 0, "chat": {"id": tg_id, "type": "private"}, "from": _user(tg_id), "text": text},
+        context={"bot": bot},
+    )
+
+
+def fake_callback(bot: Bot, tg_id: int, data: str) -> CallbackQuery:
+    return CallbackQuery.model_validate(
+        {
+            "id": "1",
+            "from": _user(tg_id),
+            "chat_instance": "1",
+            "data": data,
+            "message": {"message_id": 1, "date": 0, "chat": {"id": tg_id, "type": "private"}, "text": ""},
+        },
+        context={"bot": bot},
+    )
+
+
+async def bench_handlers(factory: sessionmaker, shop: SeededShop, rng: random.Random,
+                         iterations: int, warmup: int) -> Dict[str, Dict[str, float]]:
+    bot = Bot(token=BENCH_TOKEN, session=NullSession())
+    middleware = DbSessionMiddleware(factory)
+
+    def call(handler: Callable[..., Awaitable[Any]], event: Any, uses_read_db: bool = False):
+        # Полный путь апдейта за вычетом роутинга: сессия, хендлер, коммит
+        async def inner(event: Any, data: Dict[str, Any]) -> Any:
+            return await handler(event, data["read_db"] if uses_read_db else data["db"])
+        return middleware(inner, event, {})
+
+    def dispatch(event: CallbackQuery, db: Any) -> Awaitable[Any]:
+        # Callback идут через таблицу маршрутов: разбор данных входит в замер
+        return user_handlers.callbacks.dispatch(event, db=db, read_db=db)
+
+    def tg_id() -> int:
+        return rng.choice(shop.telegram_ids)
+
+    async def checkout(event: CallbackQuery, db: Any) -> None:
+        # Корзина в памяти наполняется почти бесплатно, измеряем в основном оформление заказа
+        for product_id in rng.sample(shop.product_ids, 3):
+            await cart_store.add(db, event.from_user.id, product_id)
+        await dispatch(event, db)
+
+    cases = {
+        "handler./start": lambda i: call(user_handlers.cmd_start, fake_message(bot, tg_id(), "/start")),
+        "handler./categories": lambda i: call(
+            user_handlers.cmd_categories, fake_message(bot, tg_id(), "/categories"), True
+        ),
+        "handler.show_cat": lambda i: call(
+            dispatch, fake_callback(bot, tg_id(), user_handlers.SHOW_CATEGORY.pack(rng.choice(shop.category_ids))), True,
+        ),
+        "handler.buy": lambda i: call(
+            dispatch, fake_callback(bot, tg_id(), user_handlers.BUY.pack(rng.choice(shop.product_ids)))
+        ),
+        "handler.checkout": lambda i: call(checkout, fake_callback(bot, tg_id(), user_handlers.CART.pack("checkout"))),
+        "handler./orders": lambda i: call(user_handlers.cmd_orders, fake_message(bot, tg_id(), "/orders"), True),
+        "handler./order": lambda i: call(
+            user_handlers.cmd_order_details, fake_message(bot, tg_id(), f"/order {rng.choice(shop.order_ids)}"), True
+        ),
+    }
+    results = {}
+    try:
+        for name, op in cases.items():
+            results[name] = await measure_async(op, iterations, warmup)
+    finally:
+        await bot.session.close()
+    return results
+
+
+def run(scale: Scale, iterations: int, warmup: int, database: Optional[str] = None) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = database or os.path.join(tmpdir, "bench.db")
+        engine = create_db_engine(f"sqlite:///{path}")
+        try:
+            shop = seed_shop(engine, scale)
+            factory = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+            rng = random.Random(scale.seed)
+            # Кэши глобальные: стартуем с пустых, чтобы прогоны были сравнимы
+            catalog_cache.invalidate_all()
+            user_cache.clear()
+            cart_store.reset()
+            results = bench_crud(factory, shop, rng, iterations, warmup)
+            results.update(asyncio.run(bench_handlers(factory, shop, rng, iterations, warmup)))
+        finally:
+            catalog_cache.invalidate_all()
+            user_cache.clear()
+            cart_store.reset()
+            engine.dispose()
+    return {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlalchemy": sqlalchemy.__version__,
+            "platform": platform.platform(),
+            "scale": scale.as_dict(),
+            "iterations": iterations,
+            "warmup": warmup,
+        },
+        "results": results,
+    }
+
+
+# Сравнение с сохранённым прогоном: регрессия — падение ops/sec больше допуска
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    regressions = []
+    for name, current in report["results"].items():
+        previous = baseline.get("results", {}).get(name)
+        if not previous or not previous.get("ops_per_sec"):
+            continue
+        change = current["ops_per_sec"] / previous["ops_per_sec"] - 1
+        if change < -tolerance:
+            regressions.append(
+                f"{name}: {previous['ops_per_sec']:.1f} -> {current['ops_per_sec']:.1f} ops/s ({change:+.1%})"
+            )
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="CRUD and handler throughput benchmarks")
+    defaults = Scale()
+    parser.add_argument("--users", type=int, default=defaults.users)
+    parser.add_argument("--categories", type=int, default=defaults.categories)
+    parser.add_argument("--products", type=int, default=defaults.products)
+    parser.add_argument("--orders", type=int, default=defaults.orders)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--database", help="SQLite file to seed (default: temporary file)")
+    parser.add_argument("--output", help="Write JSON report to this file (default: stdout)")
+    parser.add_argument("--baseline", help="JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed ops/sec drop, 0.2 = 20%%")
+    args = parser.parse_args(argv)
+
+    scale = Scale(users=args.users, categories=args.categories, products=args.products,
+                  orders=args.orders, seed=args.seed)
+    report = run(scale, args.iterations, args.warmup, args.database)
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            regressions = compare(report, json.load(fh), args.tolerance)
+        for line in regressions:
+            print("REGRESSION", line, file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+# benchmarks/seed.py
+
+import random
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from database import migrations
+from database.models import Category, Order, OrderItem, Product, User
+from database.sales import rebuild_daily_sales
+
+
+@dataclass
+class Scale:
+    users: int = 1000
+    categories: int = 20
+    products: int = 2000
+    orders: int = 5000
+    items_per_order: int = 3
+    seed: int = 42
+
+    def as_dict(self) -> Dict[str, int]:
+        return asdict(self)
+
+
+@dataclass
+class SeededShop:
+    user_ids: List[int]
+    telegram_ids: List[int]
+    category_ids: List[int]
+    product_ids: List[int]
+    order_ids: List[int]
+
+
+# Синтетический магазин: детерминирован по scale.seed, вставляется пачками в обход ORM
+def seed_shop(engine: Engine, scale: Scale) -> SeededShop:
+    rng = random.Random(scale.seed)
+    migrations.upgrade(engine)
+    started = datetime(2024, 1, 1)
+
+    users = [
+        {"id": i, "telegram_id": 100000 + i, "username": f"user{i}", "full_name": f"User {i}", "is_admin": False}
+        for i in range(1, scale.users + 1)
+    ]
+    categories = [{"id": i, "name": f"Category {i}"} for i in range(1, scale.categories + 1)]
+    products = [
+        {
+            "id": i,
+            "name": f"Product {rng.randrange(10 ** 6):06d}",
+            "description": "",
+            "price": round(rng.uniform(1, 1000), 2),
+            # Запас с избытком, чтобы бенчмарк покупок не упирался в нулевой остаток
+            "quantity": 10 ** 6,
+            "category_id": rng.randint(1, scale.categories),
+        }
+        for i in range(1, scale.products + 1)
+    ]
+    prices = {p["id"]: p["price"] for p in products}
+    orders = []
+    items = []
+    for order_id in range(1, scale.orders + 1):
+        orders.append({
+            "id": order_id,
+            "user_id": rng.randint(1, scale.users),
+            "created_at": started + timedelta(minutes=order_id),
+            "status": rng.choice(("pending", "paid", "shipped")),
+        })
+        for product_id in rng.sample(range(1, scale.products + 1), min(scale.items_per_order, scale.products)):
+            items.append({
+                "order_id": order_id,
+                "product_id": product_id,
+                "quantity": rng.randint(1, 3),
+                "unit_price": prices[product_id],
+            })
+
+    with Session(engine) as db:
+        for model, rows in ((User, users), (Category, categories), (Product, products),
+                            (Order, orders), (OrderItem, items)):
+            db.bulk_insert_mappings(model, rows)
+        # Заказы вставлены в обход crud, поэтому сводку продаж пересчитываем целиком
+        rebuild_daily_sales(db.connection())
+        db.commit()
+
+    return SeededShop(
+        user_ids=[u["id"] for u in users],
+        telegram_ids=[u["telegram_id"] for u in users],
+        category_ids=[c["id"] for c in categories],
+        product_ids=[p["id"] for p in products],
+        order_ids=[o["id"] for o in orders],
+    )
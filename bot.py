@@ -2,28 +2,144 @@
 
 import asyncio
 import logging
+from typing import Optional, Tuple
 from aiogram import Bot, Dispatcher
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 import config
-from database.db import init_db
-from handlers import user_handlers, admin_handlers
+from database.db import engine, init_db, read_engine, run_in_db, ReadSessionLocal, SessionLocal
+from middlewares.db import DbSessionMiddleware
+from middlewares.idempotency import IdempotencyMiddleware
+from middlewares.metrics import ApiMetricsMiddleware, UpdateMetricsMiddleware
+from services.archiver import OrderArchiver
+from services.metrics import MetricsServer, instrument_engine, instrument_pool
+from services.notifications import NotificationWorker
+from services.send_queue import SendScheduler
+from services.sweeper import OrderSweeper
+from services.warmup import StartupReport, Warmup
+from webhook import run_webhook
+from workers import run_workers
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Создаём БД (таблицы) при старте
-init_db()
+# Импорт модуля ничего не открывает: движки SQLAlchemy подключаются к БД при первом запросе,
+# миграции и прогрев выполняются на старте Dispatcher (polling, вебхук или процесс-воркер)
 
-# Просто передаём токен (без BotDefaults)
-bot = Bot(token=config.TOKEN)
-dp = Dispatcher()
 
-# Подключаем роутеры с хендлерами
-dp.include_router(user_handlers.router)
-dp.include_router(admin_handlers.router)
+def create_bot() -> Bot:
+    # Просто передаём токен (без BotDefaults); TELEGRAM_API_URL — для локального Bot API
+    session = (
+        AiohttpSession(api=TelegramAPIServer.from_base(config.TELEGRAM_API_URL)) if config.TELEGRAM_API_URL else None
+    )
+    bot = Bot(token=config.TOKEN, session=session)
+    # Внешним идёт планировщик отправки (лимиты Telegram), внутри него — метрики каждого HTTP-вызова
+    if config.SEND_RATE_LIMIT:
+        bot.session.middleware(SendScheduler())
+    bot.session.middleware(ApiMetricsMiddleware())
+    return bot
+
+
+def create_dispatcher(report: Optional[StartupReport] = None) -> Dispatcher:
+    report = report or StartupReport()
+    # Роутеры создаются при импорте модулей хендлеров, поэтому импортируем их здесь
+    from handlers import admin_handlers, user_handlers
+    from services.user_cache import user_cache
+
+    dp = Dispatcher()
+    dp["startup_report"] = report
+
+    # Первым на старте — схема БД, остальные хуки стартуют уже на актуальной схеме
+    async def migrate() -> None:
+        with report.phase("migrations"):
+            await run_in_db(init_db)
+    dp.startup.register(migrate)
+
+    # Метрики: время апдейтов по маршрутам, SQL-запросы по функциям crud, вызовы Bot API
+    instrument_engine(engine)
+    instrument_engine(read_engine)
+    # Пул соединений: ожидание, удержание, таймауты — для подбора DB_POOL_*
+    instrument_pool(engine, "write")
+    if read_engine is not engine:
+        instrument_pool(read_engine, "read")
+    dp.update.outer_middleware(UpdateMetricsMiddleware(dp))
+    if config.METRICS_PORT:
+        metrics_server = MetricsServer(config.METRICS_HOST, config.METRICS_PORT)
+        dp.startup.register(metrics_server.start)
+        dp.shutdown.register(metrics_server.stop)
+
+    # Фоновая рассылка уведомлений покупателям; хендлеры получают её как аргумент notifier
+    notifier = NotificationWorker()
+    dp["notifier"] = notifier
+    dp.startup.register(notifier.start)
+
+    # Архив заказов: команда /archive_orders доступна везде, расписание — в одном процессе
+    archiver = OrderArchiver()
+    dp["archiver"] = archiver
+    if config.WORKER_INDEX == 0:
+        dp.startup.register(archiver.start)
+        dp.shutdown.register(archiver.stop)
+
+    # Просроченные неоплаченные заказы: тоже один процесс, уведомления — через notifier
+    if config.WORKER_INDEX == 0:
+        sweeper = OrderSweeper(notifier=notifier)
+        dp.startup.register(sweeper.start)
+        dp.shutdown.register(sweeper.stop)
+    # Хуки остановки идут в порядке регистрации: рассылка останавливается после тех, кто в неё пишет
+    dp.shutdown.register(notifier.stop)
+
+    # Прогрев каталога и недавних покупателей через те же сессии чтения, что у хендлеров
+    if config.WARMUP:
+        warmup = Warmup(ReadSessionLocal, report)
+        warmup.add("catalog", user_handlers.prime_catalog)
+        warmup.add("users", user_cache.prime)
+        dp.startup.register(warmup.start)
+        dp.shutdown.register(warmup.stop)
+
+    # Дубли апдейтов и двойные нажатия отсекаются до открытия сессии БД
+    dp.update.outer_middleware(IdempotencyMiddleware())
+
+    # Одна сессия БД на апдейт, один коммит в конце
+    dp.update.outer_middleware(
+        DbSessionMiddleware(SessionLocal, ReadSessionLocal if read_engine is not engine else None)
+    )
+
+    # Подключаем роутеры с хендлерами
+    dp.include_router(user_handlers.router)
+    dp.include_router(admin_handlers.router)
+
+    async def ready() -> None:
+        report.mark("ready")
+        report.log("ready")
+    dp.startup.register(ready)
+    return dp
+
+
+_app: Optional[Tuple[Bot, Dispatcher]] = None
+
+
+def create_app() -> Tuple[Bot, Dispatcher]:
+    # Роутеры хендлеров — синглтоны модулей и подключаются только к одному Dispatcher,
+    # поэтому приложение одно на процесс: повторный вызов возвращает уже собранное
+    global _app
+    if _app is None:
+        report = StartupReport()
+        with report.phase("app"):
+            _app = create_bot(), create_dispatcher(report)
+    return _app
+
 
 async def main() -> None:
+    bot, dp = create_app()
     logger.info("Bot is starting...")
-    await dp.start_polling(bot)
+    await dp.start_polling(bot, tasks_concurrency_limit=config.POLLING_MAX_CONCURRENCY)
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    # WORKER_PROCESSES > 0: этот процесс только принимает апдейты (polling или вебхук),
+    # а хендлеры выполняют дочерние процессы, каждый со своим Dispatcher
+    if config.WORKER_PROCESSES:
+        run_workers(*create_app())
+    elif config.RUN_MODE == "webhook":
+        run_webhook(*create_app())
+    else:
+        asyncio.run(main())
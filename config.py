@@ -2,3 +2,103 @@ from os import getenv
 
 TOKEN: str = getenv("TELEGRAM_BOT_TOKEN", "TELEGRAM_BOT_TOKEN")
 DATABASE_URL: str = getenv("DATABASE_URL", "sqlite:///online_shop.db")
+DATABASE_READ_URL: str = getenv("DATABASE_READ_URL", "")
+DB_EXECUTOR_WORKERS: int = int(getenv("DB_EXECUTOR_WORKERS", "8"))
+DB_POOL_SIZE: int = int(getenv("DB_POOL_SIZE", "8"))
+# Сессия апдейта держит соединение между вызовами run_in_db, поэтому пул (DB_POOL_SIZE +
+# DB_POOL_MAX_OVERFLOW) не меньше числа апдейтов в работе: POLLING_MAX_CONCURRENCY,
+# WEBHOOK_MAX_CONCURRENCY, WORKER_CONCURRENCY. Иначе потоки пула БД ждут соединений друг друга
+DB_POOL_MAX_OVERFLOW: int = int(getenv("DB_POOL_MAX_OVERFLOW", "56"))
+DB_POOL_TIMEOUT: float = float(getenv("DB_POOL_TIMEOUT", "30"))
+SQLITE_JOURNAL_MODE: str = getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS: str = getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS: int = int(getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE: int = int(getenv("SQLITE_MMAP_SIZE", "268435456"))
+# Кэш страниц — на каждое соединение; чтение в основном идёт через mmap
+SQLITE_CACHE_SIZE_KB: int = int(getenv("SQLITE_CACHE_SIZE_KB", "8192"))
+STOCK_RETRY_ATTEMPTS: int = int(getenv("STOCK_RETRY_ATTEMPTS", "5"))
+STOCK_RETRY_BASE_DELAY: float = float(getenv("STOCK_RETRY_BASE_DELAY", "0.02"))
+STOCK_RETRY_MAX_DELAY: float = float(getenv("STOCK_RETRY_MAX_DELAY", "0.5"))
+STOCK_PRODUCT_LOCKS: bool = getenv("STOCK_PRODUCT_LOCKS", "0") == "1"
+CATALOG_CACHE_TTL: float = float(getenv("CATALOG_CACHE_TTL", "300"))
+CATALOG_CACHE_SIZE: int = int(getenv("CATALOG_CACHE_SIZE", "1024"))
+CATALOG_PAGE_SIZE: int = int(getenv("CATALOG_PAGE_SIZE", "10"))
+TELEGRAM_API_URL: str = getenv("TELEGRAM_API_URL", "")
+RUN_MODE: str = getenv("RUN_MODE", "polling")
+WEBHOOK_BASE_URL: str = getenv("WEBHOOK_BASE_URL", "")
+WEBHOOK_PATH: str = getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET: str = getenv("WEBHOOK_SECRET", "")
+WEBHOOK_MAX_CONCURRENCY: int = int(getenv("WEBHOOK_MAX_CONCURRENCY", "64"))
+POLLING_MAX_CONCURRENCY: int = int(getenv("POLLING_MAX_CONCURRENCY", "64"))
+WEBHOOK_SET_ON_STARTUP: bool = getenv("WEBHOOK_SET_ON_STARTUP", "1") == "1"
+WEBAPP_HOST: str = getenv("WEBAPP_HOST", "0.0.0.0")
+WEBAPP_PORT: int = int(getenv("WEBAPP_PORT", "8080"))
+WEBAPP_SHUTDOWN_TIMEOUT: float = float(getenv("WEBAPP_SHUTDOWN_TIMEOUT", "30"))
+USER_CACHE_TTL: float = float(getenv("USER_CACHE_TTL", "300"))
+USER_CACHE_SIZE: int = int(getenv("USER_CACHE_SIZE", "10000"))
+IMPORT_BATCH_SIZE: int = int(getenv("IMPORT_BATCH_SIZE", "500"))
+EXPORT_CHUNK_SIZE: int = int(getenv("EXPORT_CHUNK_SIZE", "1000"))
+IMPORT_PROGRESS_INTERVAL: float = float(getenv("IMPORT_PROGRESS_INTERVAL", "2"))
+METRICS_HOST: str = getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT: int = int(getenv("METRICS_PORT", "9100"))
+METRICS_SLOW_UPDATE_MS: float = float(getenv("METRICS_SLOW_UPDATE_MS", "0"))
+SEARCH_QUERY_TTL: float = float(getenv("SEARCH_QUERY_TTL", "3600"))
+SEARCH_QUERY_CACHE_SIZE: int = int(getenv("SEARCH_QUERY_CACHE_SIZE", "10000"))
+INLINE_RESULTS_LIMIT: int = int(getenv("INLINE_RESULTS_LIMIT", "20"))
+INLINE_CACHE_TIME: int = int(getenv("INLINE_CACHE_TIME", "30"))
+SEND_RATE_LIMIT: bool = getenv("SEND_RATE_LIMIT", "1") == "1"
+SEND_GLOBAL_RATE: float = float(getenv("SEND_GLOBAL_RATE", "30"))
+SEND_CHAT_RATE: float = float(getenv("SEND_CHAT_RATE", "1"))
+SEND_CHAT_BURST: float = float(getenv("SEND_CHAT_BURST", "3"))
+SEND_GROUP_RATE: float = float(getenv("SEND_GROUP_RATE", "0.33"))
+SEND_MAX_RETRIES: int = int(getenv("SEND_MAX_RETRIES", "3"))
+SEND_CHAT_LANES: int = int(getenv("SEND_CHAT_LANES", "10000"))
+NOTIFY_CONCURRENCY: int = int(getenv("NOTIFY_CONCURRENCY", "8"))
+NOTIFY_SHUTDOWN_TIMEOUT: float = float(getenv("NOTIFY_SHUTDOWN_TIMEOUT", "10"))
+SET_STATUS_MAX_IDS: int = int(getenv("SET_STATUS_MAX_IDS", "5000"))
+CART_TTL: float = float(getenv("CART_TTL", "86400"))
+CART_CACHE_SIZE: int = int(getenv("CART_CACHE_SIZE", "100000"))
+CART_PERSIST: bool = getenv("CART_PERSIST", "0") == "1"
+CART_MAX_ITEMS: int = int(getenv("CART_MAX_ITEMS", "30"))
+CART_MAX_QUANTITY: int = int(getenv("CART_MAX_QUANTITY", "99"))
+IDEMPOTENCY_UPDATE_TTL: float = float(getenv("IDEMPOTENCY_UPDATE_TTL", "600"))
+IDEMPOTENCY_CALLBACK_WINDOW: float = float(getenv("IDEMPOTENCY_CALLBACK_WINDOW", "3"))
+# b1:/k1:… — текущий формат кнопок, buy_/cart_… — кнопки из сообщений, отправленных до него
+IDEMPOTENCY_CALLBACK_PREFIXES: tuple = tuple(
+    p.strip() for p in getenv(
+        "IDEMPOTENCY_CALLBACK_PREFIXES", "b1:,k1:checkout,k1:clear,buy_,cart_checkout,cart_clear"
+    ).split(",") if p.strip()
+)
+IDEMPOTENCY_CACHE_SIZE: int = int(getenv("IDEMPOTENCY_CACHE_SIZE", "100000"))
+STATS_DEFAULT_DAYS: int = int(getenv("STATS_DEFAULT_DAYS", "7"))
+STATS_MAX_DAYS: int = int(getenv("STATS_MAX_DAYS", "366"))
+STATS_TOP_LIMIT: int = int(getenv("STATS_TOP_LIMIT", "5"))
+LOW_STOCK_THRESHOLD: int = int(getenv("LOW_STOCK_THRESHOLD", "5"))
+# Архив заказов: завершённые заказы старше ARCHIVE_AFTER_DAYS переносятся пачками
+# по ARCHIVE_BATCH_SIZE раз в ARCHIVE_INTERVAL секунд (0 — только командой /archive_orders)
+ARCHIVE_AFTER_DAYS: int = int(getenv("ARCHIVE_AFTER_DAYS", "180"))
+ARCHIVE_STATUSES: tuple = tuple(
+    s.strip() for s in getenv("ARCHIVE_STATUSES", "delivered,cancelled,expired").split(",") if s.strip()
+)
+ARCHIVE_BATCH_SIZE: int = int(getenv("ARCHIVE_BATCH_SIZE", "500"))
+ARCHIVE_BATCH_PAUSE: float = float(getenv("ARCHIVE_BATCH_PAUSE", "0.05"))
+ARCHIVE_INTERVAL: float = float(getenv("ARCHIVE_INTERVAL", "21600"))
+# Прогрев при старте: кэш каталога и недавние покупатели. Старт ждёт его не дольше
+# WARMUP_WAIT секунд, дальше прогрев доделывается в фоне
+WARMUP: bool = getenv("WARMUP", "1") == "1"
+WARMUP_WAIT: float = float(getenv("WARMUP_WAIT", "5"))
+WARMUP_MAX_CATEGORIES: int = int(getenv("WARMUP_MAX_CATEGORIES", "200"))
+WARMUP_USERS: int = int(getenv("WARMUP_USERS", "1000"))
+# Неоплаченные заказы старше ORDER_EXPIRY_TTL секунд переводятся в «expired», а их товары
+# возвращаются на склад; проверка раз в ORDER_EXPIRY_INTERVAL секунд (0 — выключить)
+ORDER_EXPIRY_TTL: float = float(getenv("ORDER_EXPIRY_TTL", "86400"))
+ORDER_EXPIRY_INTERVAL: float = float(getenv("ORDER_EXPIRY_INTERVAL", "300"))
+ORDER_EXPIRY_BATCH_SIZE: int = int(getenv("ORDER_EXPIRY_BATCH_SIZE", "500"))
+ORDER_EXPIRY_BATCH_PAUSE: float = float(getenv("ORDER_EXPIRY_BATCH_PAUSE", "0.05"))
+WORKER_PROCESSES: int = int(getenv("WORKER_PROCESSES", "0"))
+WORKER_CONCURRENCY: int = int(getenv("WORKER_CONCURRENCY", "64"))
+WORKER_MAX_PENDING: int = int(getenv("WORKER_MAX_PENDING", "10000"))
+WORKER_CHECK_INTERVAL: float = float(getenv("WORKER_CHECK_INTERVAL", "1"))
+WORKER_SHUTDOWN_TIMEOUT: float = float(getenv("WORKER_SHUTDOWN_TIMEOUT", "30"))
+# Номер процесса-воркера (его выставляет WorkerPool); фоновые задачи на всю базу идут только в нулевом
+WORKER_INDEX: int = int(getenv("WORKER_INDEX", "0"))
@@ -0,0 +1,58 @@
+from datetime import datetime
+from typing import List, Sequence
+from sqlalchemy import DateTime, delete, func, insert, literal, select
+from sqlalchemy.orm import Session
+from database.models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem
+
+# Перенос завершённых заказов из orders/order_items в orders_archive/order_items_archive.
+# Одна пачка — одна короткая транзакция (вызывающий коммитит), поэтому блокировка записи
+# SQLite держится миллисекунды и покупки между пачками не ждут. Сводка daily_sales уже
+# учитывает эти заказы и не меняется.
+
+_ORDER_COLUMNS = ("id", "user_id", "created_at", "status", "idempotency_key")
+_ITEM_COLUMNS = ("order_id", "product_id", "quantity", "unit_price")
+
+
+def archive_orders(
+        db: Session, before: datetime, statuses: Sequence[str], limit: int, after_id: int = 0
+) -> List[int]:
+    # id перенесённых заказов по возрастанию; меньше limit — кандидатов больше нет.
+    # Обход по первичному ключу от after_id: каждый запуск читает orders один раз,
+    # без отдельного индекса по статусу, который пришлось бы обновлять при каждой покупке.
+    # Заказ с наибольшим id не переносим: SQLite выдаёт новый id как max(id) + 1 и иначе
+    # мог бы повторить id, уже лежащий в архиве.
+    newest = select(func.max(Order.id)).scalar_subquery()
+    ids = [
+        order_id for order_id, in db.query(Order.id)
+        .filter(
+            Order.id > after_id,
+            Order.id < newest,
+            Order.created_at < before,
+            Order.status.in_(list(statuses)),
+        )
+        .order_by(Order.id)
+        .limit(limit)
+    ]
+    if not ids:
+        return []
+    db.execute(
+        insert(ArchivedOrder).from_select(
+            [*_ORDER_COLUMNS, "archived_at"],
+            select(*(getattr(Order, name) for name in _ORDER_COLUMNS), literal(datetime.utcnow(), DateTime()))
+            .where(Order.id.in_(ids)),
+        )
+    )
+    # id позиций в архиве новые: позиции ни на что не ссылаются, а старые id могли бы совпасть
+    db.execute(
+        insert(ArchivedOrderItem).from_select(
+            list(_ITEM_COLUMNS),
+            select(*(getattr(OrderItem, name) for name in _ITEM_COLUMNS))
+            .where(OrderItem.order_id.in_(ids))
+            .order_by(OrderItem.id),
+        )
+    )
+    db.execute(
+        delete(OrderItem).where(OrderItem.order_id.in_(ids)).execution_options(synchronize_session=False)
+    )
+    db.execute(delete(Order).where(Order.id.in_(ids)).execution_options(synchronize_session=False))
+    return ids
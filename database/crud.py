@@ -1,8 +1,17 @@
+import re
 from datetime import datetime
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple, Union
+from sqlalchemy import column, delete, func, insert, select, table, text, tuple_, update
 from sqlalchemy.exc import NoResultFound
-from sqlalchemy.orm import Session
-from database.models import User, Category, Product, Order, OrderItem
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.exc import StaleDataError
+from database.models import (
+    FINAL_STATUSES, MANUAL_ORDER_STATUSES, User, Category, Product, Order, OrderItem, CartItem, ArchivedOrder,
+    ArchivedOrderItem,
+)
+from database.sales import UNSOLD_STATUSES, adjust_for_cancellation, record_sales
+from database.stock import begin_immediate, reserve_stock
 
 
 def get_or_create_user(
@@ -10,10 +19,10 @@ def get_or_create_user(
 ) -> User:
     user = db.query(User).filter(User.telegram_id == telegram_id).one_or_none()
     if user:
-        user.username = username
-        user.full_name = full_name
-        db.commit()
-        db.refresh(user)
+        if user.username != username or user.full_name != full_name:
+            user.username = username
+            user.full_name = full_name
+            db.flush()
         return user
     new_user = User(
         telegram_id=telegram_id,
@@ -22,11 +31,14 @@ def get_or_create_user(
         is_admin=is_admin,
     )
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    db.flush()
     return new_user
 
 
+def get_user_by_telegram_id(db: Session, telegram_id: int) -> Optional[User]:
+    return db.query(User).filter(User.telegram_id == telegram_id).one_or_none()
+
+
 def get_all_categories(db: Session) -> List[Category]:
     return db.query(Category).order_by(Category.name).all()
 
@@ -37,18 +49,66 @@ def create_category(db: Session, name: str) -> Category:
         raise ValueError(f"Category '{name}' already exists.")
     category = Category(name=name)
     db.add(category)
-    db.commit()
-    db.refresh(category)
+    db.flush()
     return category
 
 
 def get_products(
-        db: Session, category_id: Optional[int] = None
+        db: Session,
+        category_id: Optional[int] = None,
+        after_id: Optional[int] = None,
+        before_id: Optional[int] = None,
+        limit: Optional[int] = None,
 ) -> List[Product]:
+    # Keyset-пагинация по (name, id): курсор — id крайнего товара соседней страницы
     query = db.query(Product)
     if category_id is not None:
         query = query.filter(Product.category_id == category_id)
-    return query.order_by(Product.name).all()
+    cursor_id = after_id if after_id is not None else before_id
+    cursor_name = None
+    if cursor_id is not None:
+        cursor_name = db.query(Product.name).filter(Product.id == cursor_id).scalar()
+    if cursor_name is None:
+        query = query.order_by(Product.name, Product.id)
+    elif after_id is not None:
+        query = query.filter(tuple_(Product.name, Product.id) > tuple_(cursor_name, cursor_id))
+        query = query.order_by(Product.name, Product.id)
+    else:
+        query = query.filter(tuple_(Product.name, Product.id) < tuple_(cursor_name, cursor_id))
+        query = query.order_by(Product.name.desc(), Product.id.desc())
+    if limit is not None:
+        query = query.limit(limit)
+    products = query.all()
+    if cursor_name is not None and after_id is None:
+        products.reverse()
+    return products
+
+
+_products_fts = table("products_fts", column("rowid"), column("rank"))
+_SEARCH_TERMS = 8
+
+
+def search_query(raw: str) -> Optional[str]:
+    # Каждое слово — префиксный терм FTS5 в кавычках: спецсинтаксис из ввода не пробрасывается
+    terms = re.findall(r"\w+", raw.lower())[:_SEARCH_TERMS]
+    return " ".join(f'"{term}"*' for term in terms) or None
+
+
+def search_products(db: Session, query: str, offset: int = 0, limit: Optional[int] = None) -> List[Product]:
+    match = search_query(query)
+    if match is None:
+        return []
+    q = (
+        db.query(Product)
+        .join(_products_fts, _products_fts.c.rowid == Product.id)
+        .filter(text("products_fts MATCH :match"))
+        .params(match=match)
+        .order_by(_products_fts.c.rank, Product.id)
+        .offset(offset)
+    )
+    if limit is not None:
+        q = q.limit(limit)
+    return q.all()
 
 
 def create_product(
@@ -70,8 +130,7 @@ def create_product(
         category_id=category_id,
     )
     db.add(product)
-    db.commit()
-    db.refresh(product)
+    db.flush()
     return product
 
 
@@ -100,8 +159,7 @@ def update_product(
         if not cat:
             raise ValueError(f"Category id={category_id} not found.")
         product.category_id = category_id
-    db.commit()
-    db.refresh(product)
+    db.flush()
     return product
 
 
@@ -110,17 +168,16 @@ def delete_product(db: Session, product_id: int) -> None:
     if not product:
         raise NoResultFound(f"Product id={product_id} not found.")
     db.delete(product)
-    db.commit()
+    db.flush()
 
 
-def create_order(db: Session, user_id: int) -> Order:
+def create_order(db: Session, user_id: int, idempotency_key: Optional[str] = None) -> Order:
     user = db.query(User).filter(User.id == user_id).one_or_none()
     if not user:
         raise NoResultFound(f"User id={user_id} not found.")
-    order = Order(user_id=user_id, status="pending", created_at=datetime.utcnow())
+    order = Order(user_id=user_id, status="pending", created_at=datetime.utcnow(), idempotency_key=idempotency_key)
     db.add(order)
-    db.commit()
-    db.refresh(order)
+    db.flush()
     return order
 
 
@@ -130,13 +187,15 @@ def add_item_to_order(
     order = db.query(Order).filter(Order.id == order_id).one_or_none()
     if not order:
         raise NoResultFound(f"Order id={order_id} not found.")
-    product = db.query(Product).filter(Product.id == product_id).one_or_none()
-    if not product:
-        raise NoResultFound(f"Product id={product_id} not found.")
-    if product.quantity < quantity:
+    if quantity <= 0:
+        raise ValueError("Quantity must be positive.")
+    if not reserve_stock(db, product_id, quantity):
+        exists = db.query(Product.id).filter(Product.id == product_id).one_or_none()
+        if not exists:
+            raise NoResultFound(f"Product id={product_id} not found.")
         raise ValueError(f"Insufficient stock for product id={product_id}.")
+    product = db.query(Product).populate_existing().filter(Product.id == product_id).one()
     unit_price = product.price
-    product.quantity -= quantity
     item = OrderItem(
         order_id=order_id,
         product_id=product_id,
@@ -144,33 +203,226 @@ def add_item_to_order(
         unit_price=unit_price,
     )
     db.add(item)
-    db.commit()
-    db.refresh(item)
+    record_sales(db, order.created_at.date(), [(product_id, quantity, unit_price)])
+    db.flush()
     return item
 
 
-def get_orders_by_user(db: Session, user_id: int) -> List[Order]:
+def add_items_to_order(db: Session, order_id: int, items: Dict[int, int]) -> List[OrderItem]:
+    # Оформление корзины: одно списание на товар, цены одним запросом, позиции одним INSERT
+    created_at = db.query(Order.created_at).filter(Order.id == order_id).scalar()
+    if created_at is None:
+        raise NoResultFound(f"Order id={order_id} not found.")
+    if not items or any(quantity <= 0 for quantity in items.values()):
+        raise ValueError("Quantity must be positive.")
+    prices = dict(db.query(Product.id, Product.price).filter(Product.id.in_(list(items))).all())
+    missing = sorted(set(items) - set(prices))
+    if missing:
+        raise NoResultFound(f"Product id={missing[0]} not found.")
+    for product_id in sorted(items):
+        if not reserve_stock(db, product_id, items[product_id]):
+            raise ValueError(f"Insufficient stock for product id={product_id}.")
+    order_items = [
+        OrderItem(order_id=order_id, product_id=product_id, quantity=quantity, unit_price=prices[product_id])
+        for product_id, quantity in sorted(items.items())
+    ]
+    db.add_all(order_items)
+    record_sales(db, created_at.date(), [(i.product_id, i.quantity, i.unit_price) for i in order_items])
+    db.flush()
+    return order_items
+
+
+def get_products_by_ids(db: Session, product_ids: List[int]) -> Dict[int, Product]:
+    if not product_ids:
+        return {}
+    return {p.id: p for p in db.query(Product).filter(Product.id.in_(product_ids)).all()}
+
+
+def get_cart_items(db: Session, telegram_id: int) -> Dict[int, int]:
+    rows = db.query(CartItem.product_id, CartItem.quantity).filter(CartItem.telegram_id == telegram_id).all()
+    return dict(rows)
+
+
+def replace_cart_items(db: Session, telegram_id: int, items: Dict[int, int]) -> None:
+    db.execute(delete(CartItem).where(CartItem.telegram_id == telegram_id))
+    if items:
+        now = datetime.utcnow()
+        db.execute(insert(CartItem), [
+            {"telegram_id": telegram_id, "product_id": product_id, "quantity": quantity, "updated_at": now}
+            for product_id, quantity in items.items()
+        ])
+
+
+def get_recent_buyers(db: Session, limit: int) -> List[User]:
+    # Покупатели по свежести последнего заказа; max(id) берётся из индекса по user_id
+    latest = (
+        db.query(Order.user_id, func.max(Order.id).label("last_order_id"))
+        .group_by(Order.user_id)
+        .order_by(func.max(Order.id).desc())
+        .limit(limit)
+        .subquery()
+    )
     return (
-        db.query(Order)
-        .filter(Order.user_id == user_id)
-        .order_by(Order.created_at.desc())
+        db.query(User)
+        .join(latest, latest.c.user_id == User.id)
+        .order_by(latest.c.last_order_id.desc())
         .all()
     )
 
 
-def get_order_details(db: Session, order_id: int) -> Tuple[Order, float]:
-    order = db.query(Order).filter(Order.id == order_id).one_or_none()
-    if not order:
+def get_order_id_by_idempotency_key(db: Session, idempotency_key: str) -> Optional[int]:
+    return db.query(Order.id).filter(Order.idempotency_key == idempotency_key).scalar()
+
+
+# Заказ из горячей таблицы или из архива (database/archive.py): поля и связи у них одинаковые
+AnyOrder = Union[Order, ArchivedOrder]
+
+
+def _user_orders(db: Session, model, item_model, user_id: int) -> List[AnyOrder]:
+    return (
+        db.query(model)
+        .options(selectinload(model.items).joinedload(item_model.product))
+        .filter(model.user_id == user_id)
+        .order_by(model.created_at.desc())
+        .all()
+    )
+
+
+def get_orders_by_user(db: Session, user_id: int, include_archived: bool = True) -> List[AnyOrder]:
+    orders = _user_orders(db, Order, OrderItem, user_id)
+    archived = _user_orders(db, ArchivedOrder, ArchivedOrderItem, user_id) if include_archived else []
+    if archived:
+        # Старые незавершённые заказы остаются в горячей таблице, поэтому общий порядок — по дате
+        orders = sorted(orders + archived, key=lambda o: o.created_at, reverse=True)
+    return orders
+
+
+def _order_total_expr(item_model=OrderItem):
+    return func.coalesce(func.sum(item_model.quantity * item_model.unit_price), 0.0)
+
+
+def _order_totals(db: Session, item_model, order_ids: List[int]) -> List[Tuple[int, float]]:
+    return (
+        db.query(item_model.order_id, _order_total_expr(item_model))
+        .filter(item_model.order_id.in_(order_ids))
+        .group_by(item_model.order_id)
+        .all()
+    )
+
+
+def get_order_totals(db: Session, order_ids: List[int]) -> Dict[int, float]:
+    if not order_ids:
+        return {}
+    rows = dict(_order_totals(db, OrderItem, order_ids))
+    totals = {order_id: 0.0 for order_id in order_ids}
+    totals.update(rows)
+    # Заказы без позиций в горячей таблице могут быть архивными
+    unseen = [order_id for order_id in order_ids if order_id not in rows]
+    if unseen:
+        totals.update(_order_totals(db, ArchivedOrderItem, unseen))
+    return totals
+
+
+def _order_with_total(db: Session, model, item_model, order_id: int) -> Optional[Tuple[AnyOrder, float]]:
+    total = (
+        select(_order_total_expr(item_model))
+        .where(item_model.order_id == model.id)
+        .scalar_subquery()
+    )
+    return (
+        db.query(model, total)
+        .options(selectinload(model.items).joinedload(item_model.product))
+        .filter(model.id == order_id)
+        .one_or_none()
+    )
+
+
+def get_order_details(db: Session, order_id: int) -> Tuple[AnyOrder, float]:
+    row = _order_with_total(db, Order, OrderItem, order_id)
+    if not row:
+        row = _order_with_total(db, ArchivedOrder, ArchivedOrderItem, order_id)
+    if not row:
         raise NoResultFound(f"Order id={order_id} not found.")
-    total_price = sum(item.quantity * item.unit_price for item in order.items)
+    order, total_price = row
     return order, total_price
 
 
 def update_order_status(db: Session, order_id: int, new_status: str) -> Order:
-    order = db.query(Order).filter(Order.id == order_id).one_or_none()
+    # Свежий статус из БД: от перехода в «cancelled» и обратно зависит сводка продаж
+    _check_manual_status(new_status)
+    begin_immediate(db)
+    order = db.query(Order).populate_existing().filter(Order.id == order_id).one_or_none()
     if not order:
         raise NoResultFound(f"Order id={order_id} not found.")
-    order.status = new_status
-    db.commit()
-    db.refresh(order)
+    if order.status in FINAL_STATUSES:
+        raise ValueError(f"Order id={order_id} is {order.status}, its status can't be changed.")
+    if order.status != new_status:
+        _set_statuses_if_unchanged(db, [(order.id, order.status)], new_status)
+        set_committed_value(order, "status", new_status)
     return order
+
+
+def _set_statuses_if_unchanged(db: Session, changes: List[Tuple[int, str]], new_status: str) -> None:
+    # changes: (order_id, прочитанный статус). UPDATE сверяет статус с прочитанным, поэтому
+    # заказ, который успели изменить (например, просрочить), не перезаписывается вслепую,
+    # а сводка продаж меняется только вместе с реально обновлёнными строками
+    by_status: Dict[str, List[int]] = {}
+    for order_id, old in changes:
+        by_status.setdefault(old, []).append(order_id)
+    for old, order_ids in by_status.items():
+        result = db.execute(
+            update(Order)
+            .where(Order.id.in_(order_ids), Order.status == old, Order.status.notin_(FINAL_STATUSES))
+            .values(status=new_status)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != len(order_ids):
+            raise StaleDataError(f"Order statuses changed concurrently, expected {len(order_ids)} rows.")
+    _adjust_sales(db, changes, new_status)
+
+
+def _adjust_sales(db: Session, changes: List[Tuple[int, str]], new_status: str) -> None:
+    # changes: (order_id, старый статус); сводка продаж не учитывает отменённые и просроченные заказы
+    if new_status in UNSOLD_STATUSES:
+        adjust_for_cancellation(db, [order_id for order_id, old in changes if old not in UNSOLD_STATUSES], [])
+    else:
+        adjust_for_cancellation(db, [], [order_id for order_id, old in changes if old in UNSOLD_STATUSES])
+
+
+def _check_manual_status(new_status: str) -> None:
+    if new_status in FINAL_STATUSES:
+        raise ValueError(f"Status '{new_status}' is set only by the order sweeper.")
+    if new_status not in MANUAL_ORDER_STATUSES:
+        raise ValueError(f"Unknown status '{new_status}'.")
+
+
+# SQLite ограничивает число параметров запроса, поэтому длинные списки id режем на части
+_IN_CHUNK = 500
+
+
+def update_order_statuses(
+        db: Session, order_ids: List[int], new_status: str
+) -> Tuple[List[Tuple[int, int]], List[int], List[int]]:
+    # Массовая смена статуса: (order_id, telegram_id) изменённых заказов, id, которых нет в базе,
+    # и id заказов в окончательном статусе, которые не меняются
+    _check_manual_status(new_status)
+    begin_immediate(db)
+    ids = sorted(set(order_ids))
+    changed: List[Tuple[int, int]] = []
+    final: List[int] = []
+    found = set()
+    for start in range(0, len(ids), _IN_CHUNK):
+        chunk = ids[start:start + _IN_CHUNK]
+        rows = (
+            db.query(Order.id, Order.status, User.telegram_id)
+            .join(User, User.id == Order.user_id)
+            .filter(Order.id.in_(chunk))
+            .all()
+        )
+        found.update(row.id for row in rows)
+        final.extend(row.id for row in rows if row.status in FINAL_STATUSES)
+        to_change = [row for row in rows if row.status != new_status and row.status not in FINAL_STATUSES]
+        if to_change:
+            _set_statuses_if_unchanged(db, [(row.id, row.status) for row in to_change], new_status)
+            changed.extend((row.id, row.telegram_id) for row in to_change)
+    return changed, [order_id for order_id in ids if order_id not in found], sorted(final)
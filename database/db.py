@@ -1,15 +1,85 @@
-from typing import Generator
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Generator, TypeVar
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
 import config
-from database.models import Base
+from database import migrations
+from database.pool import TimedQueuePool, install_pool_timing, pool_status
 
-engine = create_engine(config.DATABASE_URL, echo=False, future=True)
+T = TypeVar("T")
+
+
+def _apply_sqlite_pragmas(dbapi_connection: Any, readonly: bool) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        if not readonly:
+            # WAL: читатели не ждут коммита покупки, а писатель не ждёт читателей
+            cursor.execute(f"PRAGMA journal_mode={config.SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA busy_timeout={config.SQLITE_BUSY_TIMEOUT_MS:d}")
+        cursor.execute(f"PRAGMA synchronous={config.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA mmap_size={config.SQLITE_MMAP_SIZE:d}")
+        # Отрицательное значение cache_size задаётся в KiB, а не в страницах
+        cursor.execute(f"PRAGMA cache_size=-{config.SQLITE_CACHE_SIZE_KB:d}")
+        if readonly:
+            cursor.execute("PRAGMA query_only=ON")
+    finally:
+        cursor.close()
+
+
+def create_db_engine(url: str, readonly: bool = False, **kwargs: Any) -> Engine:
+    db_url = make_url(url)
+    options: Dict[str, Any] = dict(echo=False, future=True)
+    if db_url.get_backend_name() == "sqlite":
+        # Сессии работают в потоках пула, а не в потоке event loop
+        options["connect_args"] = {
+            "check_same_thread": False,
+            "timeout": config.SQLITE_BUSY_TIMEOUT_MS / 1000,
+        }
+    if db_url.get_backend_name() == "sqlite" and db_url.database in (None, "", ":memory:"):
+        # База в памяти живёт, пока открыто соединение, поэтому оно одно на всех
+        options["poolclass"] = StaticPool
+    else:
+        options.update(
+            poolclass=TimedQueuePool,
+            pool_size=config.DB_POOL_SIZE,
+            max_overflow=config.DB_POOL_MAX_OVERFLOW,
+            pool_timeout=config.DB_POOL_TIMEOUT,
+        )
+    options.update(kwargs)
+    db_engine = create_engine(url, **options)
+
+    if db_url.get_backend_name() == "sqlite":
+        @event.listens_for(db_engine, "connect")
+        def _on_connect(dbapi_connection: Any, connection_record: Any) -> None:
+            _apply_sqlite_pragmas(dbapi_connection, readonly)
+
+    install_pool_timing(db_engine)
+    return db_engine
+
+
+engine = create_db_engine(config.DATABASE_URL)
+# Каталог и история заказов могут читаться через отдельный read-only движок
+read_engine = create_db_engine(config.DATABASE_READ_URL, readonly=True) if config.DATABASE_READ_URL else engine
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, expire_on_commit=False)
+ReadSessionLocal = sessionmaker(bind=read_engine, autoflush=False, autocommit=False, expire_on_commit=False)
+
+# Ограниченный пул потоков для блокирующих вызовов SQLAlchemy
+db_executor = ThreadPoolExecutor(max_workers=config.DB_EXECUTOR_WORKERS, thread_name_prefix="db")
 
 
 def init_db() -> None:
-    Base.metadata.create_all(bind=engine)
+    migrations.upgrade(engine)
+
+
+def pool_stats() -> Dict[str, Dict[str, Any]]:
+    stats = {"write": pool_status(engine)}
+    if read_engine is not engine:
+        stats["read"] = pool_status(read_engine)
+    return stats
 
 
 def get_db() -> Generator:
@@ -18,3 +88,35 @@ def get_db() -> Generator:
         yield db
     finally:
         db.close()
+
+
+async def run_in_db(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, partial(func, *args, **kwargs))
+
+
+def _call_with_session(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    with SessionLocal() as db:
+        result = func(db, *args, **kwargs)
+        db.commit()
+        return result
+
+
+async def run_db(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    return await run_in_db(_call_with_session, func, *args, **kwargs)
+
+
+# Колбэки, которые нужно выполнить только после успешного коммита текущей транзакции
+def on_commit(db: Session, callback: Callable[[], Any]) -> None:
+    db.info.setdefault("on_commit", []).append(callback)
+
+
+@event.listens_for(Session, "after_commit")
+def _run_on_commit(session: Session) -> None:
+    for callback in session.info.pop("on_commit", ()):
+        callback()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_commit(session: Session) -> None:
+    session.info.pop("on_commit", None)
@@ -0,0 +1,74 @@
+from datetime import datetime
+from typing import List, NamedTuple, Set, Tuple
+from sqlalchemy import bindparam, func, literal_column, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
+from database.models import Order, OrderItem, Product, User
+from database.sales import adjust_for_cancellation
+from database.stock import begin_immediate
+
+# Неоплаченные заказы старше TTL переводятся в «expired», а остаток, списанный при оформлении,
+# возвращается в products. Пачка — несколько запросов над множеством заказов без загрузки
+# ORM-объектов, в одной короткой транзакции (коммитит вызывающий).
+
+# Литерал, а не параметр: условие с параметром SQLite не сопоставит с частичным индексом
+_PENDING = Order.status == literal_column("'pending'")
+
+
+class ExpiredBatch(NamedTuple):
+    orders: List[Tuple[int, int]]  # (order_id, telegram_id) для уведомлений
+    units: int
+    category_ids: Set[int]
+
+
+def expire_orders(db: Session, before: datetime, limit: int) -> ExpiredBatch:
+    # Меньше limit заказов — просроченных больше нет. Курсор не нужен: просроченные
+    # заказы уходят из индекса ix_orders_pending_created_at, следующая пачка начнёт сначала.
+    # Блокировка записи берётся до чтения: иначе /set_status paid между выбором и UPDATE
+    # вернул бы на склад товары уже оплаченного заказа
+    begin_immediate(db)
+    orders = [
+        (order_id, telegram_id) for order_id, telegram_id in db.query(Order.id, User.telegram_id)
+        .join(User, User.id == Order.user_id)
+        .filter(_PENDING, Order.created_at < before)
+        .order_by(Order.created_at)
+        .limit(limit)
+    ]
+    if not orders:
+        return ExpiredBatch([], 0, set())
+    ids = [order_id for order_id, _ in orders]
+
+    # Первым — смена статуса с проверкой pending: остаток и сводка меняются только вместе с ней
+    result = db.execute(
+        update(Order)
+        .where(Order.id.in_(ids), _PENDING)
+        .values(status="expired")
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != len(ids):
+        raise StaleDataError(f"Pending orders changed concurrently, expected {len(ids)} rows.")
+
+    # Позиции пачки суммируются по товару одним запросом, остатки возвращаются одним UPDATE
+    # по первичному ключу (executemany). Коррелированный подзапрос в UPDATE заново проверял бы
+    # список id заказов для каждого товара, а UPDATE … FROM есть только в SQLite 3.33+.
+    restocked = (
+        db.query(OrderItem.product_id, Product.category_id, func.sum(OrderItem.quantity))
+        .join(Product, Product.id == OrderItem.product_id)
+        .filter(OrderItem.order_id.in_(ids))
+        .group_by(OrderItem.product_id)
+        .all()
+    )
+    if restocked:
+        products = Product.__table__
+        db.execute(
+            update(products)
+            .where(products.c.id == bindparam("product_id"))
+            .values(quantity=products.c.quantity + bindparam("returned")),
+            [{"product_id": product_id, "returned": quantity} for product_id, _, quantity in restocked],
+        )
+    adjust_for_cancellation(db, ids, [])
+    return ExpiredBatch(
+        orders,
+        sum(quantity for _, _, quantity in restocked),
+        {category_id for _, category_id, _ in restocked if category_id is not None},
+    )
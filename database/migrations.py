@@ -0,0 +1,122 @@
+import logging
+from typing import Callable, List
+from sqlalchemy.engine import Connection, Engine
+from database.models import ArchivedOrder, ArchivedOrderItem, Base, CartItem, DailySales
+from database.sales import rebuild_daily_sales
+
+logger = logging.getLogger(__name__)
+
+# Версия схемы хранится в PRAGMA user_version. Каждая миграция идемпотентна:
+# pysqlite выполняет DDL вне транзакции, поэтому после сбоя шаг просто повторяется.
+Migration = Callable[[Connection], None]
+
+
+def _create_tables(conn: Connection) -> None:
+    Base.metadata.create_all(bind=conn)
+
+
+def _add_lookup_indexes(conn: Connection) -> None:
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_products_category_id_name ON products (category_id, name)"
+    )
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_orders_user_id_created_at ON orders (user_id, created_at DESC)"
+    )
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_order_items_order_id ON order_items (order_id)"
+    )
+
+
+# Полнотекстовый индекс товаров (FTS5, external content). Синхронизация — триггерами,
+# поэтому её получают и CRUD, и массовый импорт. Триггер на UPDATE смотрит только на
+# name/description: списание остатка при покупке индекс не трогает.
+def _add_product_search(conn: Connection) -> None:
+    conn.exec_driver_sql(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5("
+        "name, description, content='products', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2')"
+    )
+    conn.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN "
+        "INSERT INTO products_fts(rowid, name, description) "
+        "VALUES (new.id, new.name, coalesce(new.description, '')); END"
+    )
+    conn.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN "
+        "INSERT INTO products_fts(products_fts, rowid, name, description) "
+        "VALUES ('delete', old.id, old.name, coalesce(old.description, '')); END"
+    )
+    conn.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF name, description ON products BEGIN "
+        "INSERT INTO products_fts(products_fts, rowid, name, description) "
+        "VALUES ('delete', old.id, old.name, coalesce(old.description, '')); "
+        "INSERT INTO products_fts(rowid, name, description) "
+        "VALUES (new.id, new.name, coalesce(new.description, '')); END"
+    )
+    # Совпадение в названии весит больше, чем в описании
+    conn.exec_driver_sql("INSERT INTO products_fts(products_fts, rank) VALUES ('rank', 'bm25(10.0, 1.0)')")
+    conn.exec_driver_sql("INSERT INTO products_fts(products_fts) VALUES ('rebuild')")
+
+
+def _add_cart_items(conn: Connection) -> None:
+    CartItem.__table__.create(bind=conn, checkfirst=True)
+
+
+# Ключ идемпотентности заказа: повторное оформление той же корзины находит уже созданный заказ.
+# NULL в уникальном индексе SQLite не конфликтуют, старые заказы остаются без ключа.
+def _add_order_idempotency_key(conn: Connection) -> None:
+    columns = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info(orders)")}
+    if "idempotency_key" not in columns:
+        conn.exec_driver_sql("ALTER TABLE orders ADD COLUMN idempotency_key VARCHAR")
+    conn.exec_driver_sql(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_orders_idempotency_key ON orders (idempotency_key)"
+    )
+
+
+# Дневная сводка продаж для /stats заполняется из уже существующих заказов; индекс по остатку
+# нужен отчёту о заканчивающихся товарах
+def _add_daily_sales(conn: Connection) -> None:
+    DailySales.__table__.create(bind=conn, checkfirst=True)
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_products_quantity ON products (quantity)")
+    rebuild_daily_sales(conn)
+
+
+# Архив завершённых заказов (database/archive.py); индексы создаются вместе с таблицами
+def _add_order_archive(conn: Connection) -> None:
+    ArchivedOrder.__table__.create(bind=conn, checkfirst=True)
+    ArchivedOrderItem.__table__.create(bind=conn, checkfirst=True)
+
+
+# Неоплаченные заказы для database/expiry.py: частичный индекс держит только строки
+# в статусе pending, поэтому поиск просроченных не читает всю таблицу orders
+def _add_pending_orders_index(conn: Connection) -> None:
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_orders_pending_created_at ON orders (created_at) WHERE status = 'pending'"
+    )
+
+
+MIGRATIONS: List[Migration] = [
+    _create_tables,
+    _add_lookup_indexes,
+    _add_product_search,
+    _add_cart_items,
+    _add_order_idempotency_key,
+    _add_daily_sales,
+    _add_order_archive,
+    _add_pending_orders_index,
+]
+
+
+def get_version(conn: Connection) -> int:
+    return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def upgrade(engine: Engine) -> int:
+    with engine.connect() as conn:
+        version = get_version(conn)
+        for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            logger.info("Applying migration %d: %s", number, migration.__name__)
+            migration(conn)
+            conn.exec_driver_sql(f"PRAGMA user_version = {number}")
+            conn.commit()
+        return get_version(conn)
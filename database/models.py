@@ -1,11 +1,17 @@
 from __future__ import annotations
 from datetime import datetime, date
 from typing import List, Optional
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Date, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Date, ForeignKey, Index, desc, text
 from sqlalchemy.orm import relationship, declarative_base
 
 Base = declarative_base()
 
+ORDER_STATUSES = ("pending", "paid", "shipped", "delivered", "cancelled", "expired")
+# «expired» ставит только database/expiry.py, уже вернув товары на склад, поэтому статус
+# окончательный: вручную в него не переводят и из него не выводят
+FINAL_STATUSES = ("expired",)
+MANUAL_ORDER_STATUSES = tuple(s for s in ORDER_STATUSES if s not in FINAL_STATUSES)
+
 
 class User(Base):
     __tablename__ = "users"
@@ -34,6 +40,9 @@ class Product(Base):
     category_id: int = Column(Integer, ForeignKey("categories.id"), nullable=False)
     category: Category = relationship("Category", back_populates="products")
     order_items: List[OrderItem] = relationship("OrderItem", back_populates="product")
+    __table_args__ = (
+        Index("ix_products_category_id_name", "category_id", "name"),
+    )
 
 
 class Order(Base):
@@ -42,8 +51,15 @@ class Order(Base):
     user_id: int = Column(Integer, ForeignKey("users.id"), nullable=False)
     created_at: datetime = Column(DateTime, default=datetime.utcnow, nullable=False)
     status: str = Column(String, nullable=False, default="pending")
+    idempotency_key: Optional[str] = Column(String, nullable=True)
     user: User = relationship("User", back_populates="orders")
     items: List[OrderItem] = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
+    __table_args__ = (
+        Index("ix_orders_user_id_created_at", "user_id", desc("created_at")),
+        Index("ix_orders_idempotency_key", "idempotency_key", unique=True),
+        # Частичный индекс: в нём только неоплаченные заказы, их и ищет database/expiry.py
+        Index("ix_orders_pending_created_at", "created_at", sqlite_where=text("status = 'pending'")),
+    )
 
 
 class OrderItem(Base):
@@ -55,3 +71,55 @@ class OrderItem(Base):
     unit_price: float = Column(Float, nullable=False)
     order: Order = relationship("Order", back_populates="items")
     product: Product = relationship("Product", back_populates="order_items")
+    __table_args__ = (
+        Index("ix_order_items_order_id", "order_id"),
+    )
+
+
+class CartItem(Base):
+    __tablename__ = "cart_items"
+    telegram_id: int = Column(Integer, primary_key=True)
+    product_id: int = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    quantity: int = Column(Integer, nullable=False)
+    updated_at: datetime = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class DailySales(Base):
+    __tablename__ = "daily_sales"
+    day: date = Column(Date, primary_key=True)
+    product_id: int = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    quantity: int = Column(Integer, nullable=False, default=0)
+    revenue: float = Column(Float, nullable=False, default=0.0)
+
+
+# Архив завершённых заказов: те же поля, что в orders/order_items, id заказа сохраняется.
+# Горячие таблицы остаются маленькими, а старые заказы по-прежнему читаются через crud.
+class ArchivedOrder(Base):
+    __tablename__ = "orders_archive"
+    id: int = Column(Integer, primary_key=True, autoincrement=False)
+    user_id: int = Column(Integer, ForeignKey("users.id"), nullable=False)
+    created_at: datetime = Column(DateTime, nullable=False)
+    status: str = Column(String, nullable=False)
+    idempotency_key: Optional[str] = Column(String, nullable=True)
+    archived_at: datetime = Column(DateTime, default=datetime.utcnow, nullable=False)
+    user: User = relationship("User")
+    items: List[ArchivedOrderItem] = relationship(
+        "ArchivedOrderItem", back_populates="order", cascade="all, delete-orphan"
+    )
+    __table_args__ = (
+        Index("ix_orders_archive_user_id_created_at", "user_id", desc("created_at")),
+    )
+
+
+class ArchivedOrderItem(Base):
+    __tablename__ = "order_items_archive"
+    id: int = Column(Integer, primary_key=True, autoincrement=True)
+    order_id: int = Column(Integer, ForeignKey("orders_archive.id"), nullable=False)
+    product_id: int = Column(Integer, ForeignKey("products.id"), nullable=False)
+    quantity: int = Column(Integer, nullable=False)
+    unit_price: float = Column(Float, nullable=False)
+    order: ArchivedOrder = relationship("ArchivedOrder", back_populates="items")
+    product: Product = relationship("Product")
+    __table_args__ = (
+        Index("ix_order_items_archive_order_id", "order_id"),
+    )
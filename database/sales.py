@@ -0,0 +1,110 @@
+from datetime import date
+from typing import Iterable, List, Tuple
+from sqlalchemy import bindparam, func, inspect, text
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from database.models import Category, DailySales, Product
+
+# Дневная сводка продаж (daily_sales): строка на (день заказа, товар) с числом штук и выручкой.
+# Её обновляют добавление позиций в заказ и отмена/возврат заказа в той же транзакции,
+# поэтому отчёты читают несколько сотен строк сводки, а не всю историю order_items.
+
+_ROLLUP_SQL = (
+    "INSERT INTO daily_sales (day, product_id, quantity, revenue) "
+    "SELECT date(o.created_at), i.product_id, sum(i.quantity), sum(i.quantity * i.unit_price) "
+    "FROM {items} i JOIN {orders} o ON o.id = i.order_id "
+    "WHERE {where} "
+    "GROUP BY date(o.created_at), i.product_id "
+    "ON CONFLICT (day, product_id) DO UPDATE SET "
+    "quantity = daily_sales.quantity + {sign}excluded.quantity, "
+    "revenue = daily_sales.revenue + {sign}excluded.revenue"
+)
+
+# Заказы в этих статусах в сводку не входят: отменённые и просроченные неоплаченные
+UNSOLD_STATUSES = ("cancelled", "expired")
+
+
+def record_sales(db: Session, day: date, rows: Iterable[Tuple[int, int, float]]) -> None:
+    # rows: (product_id, quantity, unit_price)
+    values = [
+        {"day": day, "product_id": product_id, "quantity": quantity, "revenue": quantity * unit_price}
+        for product_id, quantity, unit_price in rows
+    ]
+    if not values:
+        return
+    stmt = insert(DailySales)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[DailySales.day, DailySales.product_id],
+        set_={
+            "quantity": DailySales.quantity + stmt.excluded.quantity,
+            "revenue": DailySales.revenue + stmt.excluded.revenue,
+        },
+    ), values)
+
+
+def adjust_for_cancellation(db: Session, cancelled: List[int], restored: List[int]) -> None:
+    # Отменённые заказы вычитаются из сводки, возвращённые из отмены — добавляются обратно
+    for order_ids, sign in ((cancelled, "-"), (restored, "")):
+        if not order_ids:
+            continue
+        sql = text(_ROLLUP_SQL.format(orders="orders", items="order_items", where="o.id IN :ids", sign=sign))
+        db.execute(sql.bindparams(bindparam("ids", expanding=True)), {"ids": list(order_ids)})
+
+
+def rebuild_daily_sales(conn: Connection) -> None:
+    conn.exec_driver_sql("DELETE FROM daily_sales")
+    # Архив заказов появляется миграцией позже сводки, поэтому берём только существующие таблицы
+    existing = set(inspect(conn).get_table_names())
+    for orders, items in (("orders", "order_items"), ("orders_archive", "order_items_archive")):
+        if orders in existing and items in existing:
+            sql = _ROLLUP_SQL.format(orders=orders, items=items, where=f"o.status NOT IN {UNSOLD_STATUSES!r}", sign="")
+            conn.execute(text(sql))
+
+
+def revenue_by_day(db: Session, since: date) -> List[Tuple[date, int, float]]:
+    return (
+        db.query(DailySales.day, func.sum(DailySales.quantity), func.sum(DailySales.revenue))
+        .filter(DailySales.day >= since)
+        .group_by(DailySales.day)
+        .order_by(DailySales.day)
+        .all()
+    )
+
+
+def revenue_by_category(db: Session, since: date) -> List[Tuple[str, int, float]]:
+    revenue = func.sum(DailySales.revenue)
+    return (
+        db.query(Category.name, func.sum(DailySales.quantity), revenue)
+        .select_from(DailySales)
+        .join(Product, Product.id == DailySales.product_id)
+        .join(Category, Category.id == Product.category_id)
+        .filter(DailySales.day >= since)
+        .group_by(Category.id)
+        .order_by(revenue.desc())
+        .all()
+    )
+
+
+def top_products(db: Session, since: date, limit: int) -> List[Tuple[int, str, int, float]]:
+    revenue = func.sum(DailySales.revenue)
+    return (
+        db.query(Product.id, Product.name, func.sum(DailySales.quantity), revenue)
+        .select_from(DailySales)
+        .join(Product, Product.id == DailySales.product_id)
+        .filter(DailySales.day >= since)
+        .group_by(Product.id)
+        .order_by(revenue.desc(), Product.id)
+        .limit(limit)
+        .all()
+    )
+
+
+def low_stock(db: Session, threshold: int, limit: int) -> List[Tuple[int, str, int]]:
+    return (
+        db.query(Product.id, Product.name, Product.quantity)
+        .filter(Product.quantity <= threshold)
+        .order_by(Product.quantity, Product.id)
+        .limit(limit)
+        .all()
+    )
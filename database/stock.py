@@ -0,0 +1,100 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, TypeVar
+from sqlalchemy import update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+import config
+from database.models import Product
+
+T = TypeVar("T")
+
+
+def reserve_stock(db: Session, product_id: int, quantity: int) -> bool:
+    # Условное списание одним UPDATE: проверка и уменьшение остатка атомарны на стороне БД
+    result = db.execute(
+        update(Product)
+        .where(Product.id == product_id, Product.quantity >= quantity)
+        .values(quantity=Product.quantity - quantity)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def begin_immediate(db: Session) -> None:
+    # pysqlite открывает транзакцию только перед первой записью, и чтение перед ней видит
+    # данные, которые другой писатель успеет изменить. BEGIN IMMEDIATE сразу берёт блокировку
+    # записи: прочитанное в этой транзакции не изменится до коммита
+    connection = db.connection()
+    if connection.dialect.name == "sqlite" and not connection.connection.in_transaction:
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+def is_locked_error(exc: BaseException) -> bool:
+    return isinstance(exc, OperationalError) and "database is locked" in str(exc.orig)
+
+
+def commit_with_retry(
+        db: Session,
+        func: Callable[..., T],
+        *args: Any,
+        attempts: int = config.STOCK_RETRY_ATTEMPTS,
+        base_delay: float = config.STOCK_RETRY_BASE_DELAY,
+        **kwargs: Any,
+) -> T:
+    # Вся транзакция повторяется целиком: после SQLITE_BUSY её нельзя безопасно продолжать
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            result = func(db, *args, **kwargs)
+            db.commit()
+            return result
+        except OperationalError as e:
+            db.rollback()
+            if not is_locked_error(e) or attempt >= attempts:
+                raise
+            delay = min(base_delay * 2 ** (attempt - 1), config.STOCK_RETRY_MAX_DELAY)
+            time.sleep(delay * random.uniform(0.5, 1.5))
+        except Exception:
+            db.rollback()
+            raise
+
+
+class ProductLockTable:
+    def __init__(self) -> None:
+        self._guard = threading.Lock()
+        self._locks: Dict[int, threading.Lock] = {}
+
+    def _lock_for(self, product_id: int) -> threading.Lock:
+        with self._guard:
+            lock = self._locks.get(product_id)
+            if lock is None:
+                lock = self._locks[product_id] = threading.Lock()
+            return lock
+
+    @contextmanager
+    def hold(self, product_ids: Iterable[int]) -> Iterator[None]:
+        # Сортировка исключает взаимные блокировки при покупке нескольких товаров
+        locks = [self._lock_for(pid) for pid in sorted(set(product_ids))]
+        for lock in locks:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+
+product_locks = ProductLockTable()
+
+
+@contextmanager
+def locked_products(product_ids: Iterable[int], enabled: bool = config.STOCK_PRODUCT_LOCKS) -> Iterator[None]:
+    if not enabled:
+        yield
+        return
+    with product_locks.hold(product_ids):
+        yield
@@ -1,22 +1,36 @@
 # handlers/admin_handlers.py
 
+import html
+import os
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from contextlib import suppress
+from typing import List, Tuple
 from aiogram import Router
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import Command
-from aiogram.types import Message
-from database.db import get_db
-from database import crud, models
+from aiogram.types import FSInputFile, Message
+from sqlalchemy.orm import Session
+import config
+from database.db import on_commit, run_in_db
+from database import crud, sales
+from database.models import MANUAL_ORDER_STATUSES
+from services import catalog_io
+from services.archiver import OrderArchiver
+from services.notifications import NotificationWorker, order_status_notification
+from services.user_cache import user_cache
 
 router = Router()
 
-async def is_admin_user(telegram_id: int) -> bool:
-    with next(get_db()) as db:
-        user = db.query(models.User).filter(models.User.telegram_id == telegram_id).one_or_none()
-        return bool(user and user.is_admin)
+async def is_admin_user(db: Session, telegram_id: int) -> bool:
+    user = await user_cache.lookup(db, telegram_id)
+    return bool(user and user.is_admin)
 
 @router.message(Command(commands=["add_product"]))
-async def cmd_add_product(message: Message) -> None:
+async def cmd_add_product(message: Message, db: Session) -> None:
     tg_id = message.from_user.id
-    if not await is_admin_user(tg_id):
+    if not await is_admin_user(db, tg_id):
         return await message.reply("🚫 Доступно только администраторам.", parse_mode="HTML")
 
     args = message.text[len("/add_product"):].strip()
@@ -37,19 +51,20 @@ async def cmd_add_product(message: Message) -> None:
     except ValueError:
         return await message.reply("❗️ Неверные числовые параметры.", parse_mode="HTML")
 
-    with next(get_db()) as db:
-        try:
-            prod = crud.create_product(db, name, description, price, quantity, category_id)
-        except Exception as e:
-            return await message.reply(f"❗️ Ошибка при создании товара: {e}", parse_mode="HTML")
+    try:
+        prod = await run_in_db(crud.create_product, db, name, description, price, quantity, category_id)
+    except Exception as e:
+        # Ошибка перехвачена, и DbSessionMiddleware закоммитит сессию: откатываем изменения сами
+        await run_in_db(db.rollback)
+        return await message.reply(f"❗️ Ошибка при создании товара: {e}", parse_mode="HTML")
 
     await message.reply(f"✅ Товар «<b>{prod.name}</b>» создан (ID={prod.id}).", parse_mode="HTML")
 
 
 @router.message(Command(commands=["update_product"]))
-async def cmd_update_product(message: Message) -> None:
+async def cmd_update_product(message: Message, db: Session) -> None:
     tg_id = message.from_user.id
-    if not await is_admin_user(tg_id):
+    if not await is_admin_user(db, tg_id):
         return await message.reply("🚫 Доступно только администраторам.", parse_mode="HTML")
 
     args = message.text[len("/update_product"):].strip()
@@ -73,11 +88,11 @@ async def cmd_update_product(message: Message) -> None:
     except ValueError:
         return await message.reply("❗️ Неверные числовые поля.", parse_mode="HTML")
 
-    with next(get_db()) as db:
-        try:
-            updated = crud.update_product(db, product_id, name, description, price, quantity, category_id)
-        except Exception as e:
-            return await message.reply(f"❗️ Ошибка при обновлении: {e}", parse_mode="HTML")
+    try:
+        updated = await run_in_db(crud.update_product, db, product_id, name, description, price, quantity, category_id)
+    except Exception as e:
+        await run_in_db(db.rollback)
+        return await message.reply(f"❗️ Ошибка при обновлении: {e}", parse_mode="HTML")
 
     await message.reply(
         f"✅ Товар #{updated.id} изменён.\n"
@@ -88,9 +103,9 @@ async def cmd_update_product(message: Message) -> None:
 
 
 @router.message(Command(commands=["delete_product"]))
-async def cmd_delete_product(message: Message) -> None:
+async def cmd_delete_product(message: Message, db: Session) -> None:
     tg_id = message.from_user.id
-    if not await is_admin_user(tg_id):
+    if not await is_admin_user(db, tg_id):
         return await message.reply("🚫 Доступно только администраторам.", parse_mode="HTML")
 
     parts = message.text.split()
@@ -98,10 +113,238 @@ async def cmd_delete_product(message: Message) -> None:
         return await message.reply("❗️ Использование: /delete_product <product_id>", parse_mode="HTML")
 
     product_id = int(parts[1])
-    with next(get_db()) as db:
-        try:
-            crud.delete_product(db, product_id)
-        except Exception as e:
-            return await message.reply(f"❗️ Ошибка при удалении: {e}", parse_mode="HTML")
+    try:
+        await run_in_db(crud.delete_product, db, product_id)
+    except Exception as e:
+        await run_in_db(db.rollback)
+        return await message.reply(f"❗️ Ошибка при удалении: {e}", parse_mode="HTML")
 
     await message.reply(f"✅ Товар #{product_id} удалён.", parse_mode="HTML")
+
+
+def _import_report(lines: int, created: int, updated: int, errors: List[Tuple[int, str]], done: bool) -> str:
+    head = "✅ Импорт завершён." if done else "⏳ Импорт каталога…"
+    text = (
+        f"{head}\n"
+        f"Обработано строк: {lines}\n"
+        f"Создано: {created}, обновлено: {updated}, ошибок: {len(errors)}"
+    )
+    if done and errors:
+        text += "\n\n" + "\n".join(f"Строка {line}: {html.escape(err)}" for line, err in errors[:10])
+        if len(errors) > 10:
+            text += f"\n… и ещё {len(errors) - 10}"
+    return text
+
+
+@router.message(Command(commands=["import_catalog"]))
+async def cmd_import_catalog(message: Message, db: Session) -> None:
+    tg_id = message.from_user.id
+    if not await is_admin_user(db, tg_id):
+        return await message.reply("🚫 Доступно только администраторам.", parse_mode="HTML")
+
+    document = message.document or (message.reply_to_message and message.reply_to_message.document)
+    if not document:
+        return await message.reply(
+            "❗️ Использование: отправьте файл .csv/.json/.jsonl с подписью /import_catalog "
+            "или ответьте этой командой на сообщение с файлом.\n"
+            "Колонки: id (необязательно), name, description, price, quantity, category",
+            parse_mode="HTML"
+        )
+    try:
+        fmt = catalog_io.detect_format(document.file_name or "")
+    except ValueError as e:
+        return await message.reply(f"❗️ {e}", parse_mode="HTML")
+
+    status = await message.reply(_import_report(0, 0, 0, [], done=False), parse_mode="HTML")
+    created = updated = lines = 0
+    errors: List[Tuple[int, str]] = []
+    last_report = time.monotonic()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "import")
+        await message.bot.download(document, destination=path)
+        with open(path, encoding="utf-8-sig", newline="") as fh:
+            batches = catalog_io.read_batches(fh, fmt)
+            while True:
+                batch = await run_in_db(next, batches, None)
+                if batch is None:
+                    break
+                lines = max(lines, batch.lines)
+                errors.extend(batch.errors)
+                if batch.rows:
+                    try:
+                        batch_created, batch_updated = await run_in_db(catalog_io.apply_batch, db, batch.rows)
+                        # Каждая пачка — отдельная короткая транзакция
+                        await run_in_db(db.commit)
+                    except Exception as e:
+                        await run_in_db(db.rollback)
+                        errors.append((batch.lines, f"пачка не сохранена: {e}"))
+                        break
+                    created += batch_created
+                    updated += batch_updated
+                if time.monotonic() - last_report >= config.IMPORT_PROGRESS_INTERVAL:
+                    last_report = time.monotonic()
+                    with suppress(TelegramBadRequest):
+                        await status.edit_text(
+                            _import_report(lines, created, updated, errors, done=False), parse_mode="HTML"
+                        )
+
+    with suppress(TelegramBadRequest):
+        await status.edit_text(_import_report(lines, created, updated, errors, done=True), parse_mode="HTML")
+
+
+@router.message(Command(commands=["export_catalog"]))
+async def cmd_export_catalog(message: Message, db: Session) -> None:
+    tg_id = message.from_user.id
+    if not await is_admin_user(db, tg_id):
+        return await message.reply("🚫 Доступно только администраторам.", parse_mode="HTML")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        products_path = os.path.join(tmp, "products.csv")
+        categories_path = os.path.join(tmp, "categories.csv")
+        products = await run_in_db(catalog_io.export_to_file, db, catalog_io.export_products, products_path)
+        categories = await run_in_db(catalog_io.export_to_file, db, catalog_io.export_categories, categories_path)
+        await message.reply_document(FSInputFile(products_path), caption=f"Товаров: {products}")
+        await message.reply_document(FSInputFile(categories_path), caption=f"Категорий: {categories}")
+
+
+def _parse_order_ids(raw: str, limit: int) -> List[int]:
+    # "1,2,3", "10-20" и пробелы в любых сочетаниях
+    ids = set()
+    for part in raw.replace(",", " ").split():
+        first, _, last = part.partition("-")
+        if not first.isdigit() or (last and not last.isdigit()):
+            raise ValueError(f"Неверный номер заказа: {html.escape(part)}")
+        start, end = int(first), int(last or first)
+        if end < start or len(ids) + end - start + 1 > limit:
+            raise ValueError(f"Слишком много или неверный диапазон заказов (не больше {limit}).")
+        ids.update(range(start, end + 1))
+    if not ids:
+        raise ValueError("Не указаны номера заказов.")
+    return sorted(ids)
+
+
+def _set_statuses(db: Session, order_ids: List[int], status: str, notifier: NotificationWorker):
+    changed, missing, final = crud.update_order_statuses(db, order_ids, status)
+    # Уведомления уходят только после успешного коммита и не задерживают ответ админу
+    on_commit(db, lambda: notifier.enqueue(
+        order_status_notification(telegram_id, order_id, status) for order_id, telegram_id in changed
+    ))
+    db.commit()
+    return changed, missing, final
+
+
+@router.message(Command(commands=["set_status"]))
+async def cmd_set_status(message: Message, db: Session, notifier: NotificationWorker) -> None:
+    tg_id = message.from_user.id
+    if not await is_admin_user(db, tg_id):
+        return await message.reply("🚫 Доступно только администраторам.", parse_mode="HTML")
+
+    parts = message.text.split(maxsplit=2)
+    if len(parts) != 3 or parts[1] not in MANUAL_ORDER_STATUSES:
+        return await message.reply(
+            "❗️ Использование: /set_status &lt;статус&gt; &lt;номера заказов&gt;\n"
+            f"Статусы: {', '.join(MANUAL_ORDER_STATUSES)}\n"
+            "Пример: /set_status shipped 12,15,20-40",
+            parse_mode="HTML"
+        )
+    status = parts[1]
+    try:
+        order_ids = _parse_order_ids(parts[2], config.SET_STATUS_MAX_IDS)
+    except ValueError as e:
+        return await message.reply(f"❗️ {e}", parse_mode="HTML")
+
+    try:
+        changed, missing, final = await run_in_db(_set_statuses, db, order_ids, status, notifier)
+    except Exception as e:
+        await run_in_db(db.rollback)
+        return await message.reply(f"❗️ Ошибка при смене статуса: {e}", parse_mode="HTML")
+
+    text = f"✅ Статус <i>{status}</i> установлен для {len(changed)} заказ(ов), уведомления отправляются."
+    unchanged = len(order_ids) - len(changed) - len(missing) - len(final)
+    if unchanged:
+        text += f"\nУже в этом статусе: {unchanged}"
+    if final:
+        # Товары просроченных заказов уже вернулись на склад, такой заказ не восстанавливается
+        shown = ", ".join(str(order_id) for order_id in final[:20])
+        more = f" … и ещё {len(final) - 20}" if len(final) > 20 else ""
+        text += f"\nПросрочены, статус не меняется: {shown}{more}"
+    if missing:
+        shown = ", ".join(str(order_id) for order_id in missing[:20])
+        more = f" … и ещё {len(missing) - 20}" if len(missing) > 20 else ""
+        text += f"\nНе найдены: {shown}{more}"
+    await message.reply(text, parse_mode="HTML")
+
+
+def _load_stats(db: Session, since: date) -> Tuple[list, list, list, list]:
+    return (
+        sales.revenue_by_day(db, since),
+        sales.revenue_by_category(db, since),
+        sales.top_products(db, since, config.STATS_TOP_LIMIT),
+        sales.low_stock(db, config.LOW_STOCK_THRESHOLD, config.STATS_TOP_LIMIT),
+    )
+
+
+def _render_stats(days: int, since: date, by_day: list, by_category: list, top: list, low: list) -> str:
+    total = sum(revenue for _, _, revenue in by_day)
+    units = sum(quantity for _, quantity, _ in by_day)
+    text = (
+        f"📊 <b>Продажи за {days} дн. (с {since:%d.%m.%Y})</b>\n"
+        f"Выручка: <b>{total:.2f}₽</b>, продано: {units} шт.\n"
+    )
+    if by_day:
+        text += "\n<b>По дням:</b>\n"
+        text += "".join(f"{day:%d.%m} — {revenue:.2f}₽ ({quantity} шт.)\n" for day, quantity, revenue in by_day)
+    if by_category:
+        text += "\n<b>По категориям:</b>\n"
+        text += "".join(
+            f"{html.escape(name)} — {revenue:.2f}₽ ({quantity} шт.)\n" for name, quantity, revenue in by_category
+        )
+    if top:
+        text += "\n<b>Топ товаров:</b>\n"
+        text += "".join(
+            f"#{product_id} {html.escape(name)} — {revenue:.2f}₽ ({quantity} шт.)\n"
+            for product_id, name, quantity, revenue in top
+        )
+    if low:
+        text += f"\n⚠️ <b>Заканчиваются (≤ {config.LOW_STOCK_THRESHOLD} шт.):</b>\n"
+        text += "".join(f"#{product_id} {html.escape(name)} — {quantity} шт.\n" for product_id, name, quantity in low)
+    return text
+
+
+@router.message(Command(commands=["stats"]))
+async def cmd_stats(message: Message, read_db: Session) -> None:
+    tg_id = message.from_user.id
+    if not await is_admin_user(read_db, tg_id):
+        return await message.reply("🚫 Доступно только администраторам.", parse_mode="HTML")
+
+    parts = message.text.split()
+    if len(parts) > 2 or (len(parts) == 2 and not parts[1].isdigit()):
+        return await message.reply("❗️ Использование: /stats [дней]", parse_mode="HTML")
+    days = min(max(int(parts[1]) if len(parts) == 2 else config.STATS_DEFAULT_DAYS, 1), config.STATS_MAX_DAYS)
+    # Дни в сводке — даты заказов по UTC, как и created_at
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+
+    by_day, by_category, top, low = await run_in_db(_load_stats, read_db, since)
+    await message.reply(_render_stats(days, since, by_day, by_category, top, low), parse_mode="HTML")
+
+
+@router.message(Command(commands=["archive_orders"]))
+async def cmd_archive_orders(message: Message, db: Session, archiver: OrderArchiver) -> None:
+    tg_id = message.from_user.id
+    if not await is_admin_user(db, tg_id):
+        return await message.reply("🚫 Доступно только администраторам.", parse_mode="HTML")
+
+    parts = message.text.split()
+    if len(parts) > 2 or (len(parts) == 2 and not parts[1].isdigit()):
+        return await message.reply("❗️ Использование: /archive_orders [дней]", parse_mode="HTML")
+    days = int(parts[1]) if len(parts) == 2 else archiver.after_days
+
+    try:
+        archived = await archiver.run_once(days)
+    except Exception as e:
+        return await message.reply(f"❗️ Ошибка при архивации: {e}", parse_mode="HTML")
+    await message.reply(
+        f"🗄 В архив перенесено заказов: {archived} "
+        f"(статусы {', '.join(archiver.statuses)}, старше {days} дн.)",
+        parse_mode="HTML"
+    )
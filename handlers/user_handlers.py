@@ -1,27 +1,137 @@
 # handlers/user_handlers.py
 
+import hashlib
+import html
+from contextlib import suppress
+from typing import Dict, List, NamedTuple, Optional, Tuple
 from aiogram import Router
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import Command
-from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
-from database.db import get_db
-from database import crud, models
+from aiogram.types import (
+    CallbackQuery,
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    InlineQuery,
+    InlineQueryResultArticle,
+    InputTextMessageContent,
+    Message,
+)
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+import config
+from database.db import run_in_db
+from database import crud, models, stock
+from services.cache import MISSING, TTLCache
+from services.callbacks import CallbackCodec, CallbackTable
+from services.cart import cart_store
+from services.catalog_cache import CATEGORIES, catalog_cache
+from services.send_queue import Priority, send_priority
+from services.user_cache import user_cache
 
 router = Router()
 
 
+# Данные inline-кнопок: компактный формат с версией (b1:7, c1:3:n15), см. services/callbacks.py.
+# Кнопки старого формата (buy_7_1, show_cat_3) из уже отправленных сообщений тоже принимаются.
+class CategoryPage(NamedTuple):
+    category_id: int
+    cursor: str = ""  # n<product_id> — следующая страница, p<product_id> — предыдущая
+
+
+class AddToCart(NamedTuple):
+    product_id: int
+    quantity: int = 1
+
+
+class CartAction(NamedTuple):
+    action: str  # show | clear | checkout | inc | dec | del
+    product_id: int = 0
+
+
+class SearchPage(NamedTuple):
+    key: str
+    offset: int = 0
+
+
+SHOW_CATEGORY = CallbackCodec("show_cat", "c", CategoryPage, legacy=r"show_cat_(\d+)(?:_([np]\d+))?")
+BUY = CallbackCodec("buy", "b", AddToCart, legacy=r"buy_(\d+)_(\d+)")
+CART = CallbackCodec("cart", "k", CartAction, legacy=r"cart_(show|clear|checkout|inc|dec|del)(?:_(\d+))?")
+SEARCH = CallbackCodec("search", "s", SearchPage, legacy=r"search_([0-9a-f]+)_(\d+)")
+
+callbacks = CallbackTable()
+callbacks.attach(router)
+
+
+# Синхронные части хендлеров: выполняются целиком в пуле потоков БД
+def _place_cart_order(
+        db: Session, tg_id: int, username: Optional[str], full_name: str, items: Dict[int, int],
+        idempotency_key: Optional[str] = None,
+) -> Tuple[models.Order, float]:
+    # Повторное оформление той же корзины возвращает уже созданный заказ, остатки не трогаем
+    if idempotency_key:
+        existing = crud.get_order_id_by_idempotency_key(db, idempotency_key)
+        if existing is not None:
+            return crud.get_order_details(db, existing)
+    user = user_cache.resolve(db, tg_id, username, full_name)
+    order = crud.create_order(db, user.id, idempotency_key=idempotency_key)
+    crud.add_items_to_order(db, order.id, items)
+    if cart_store.persist:
+        crud.replace_cart_items(db, tg_id, {})
+    return crud.get_order_details(db, order.id)
+
+
+def _checkout(
+        db: Session, tg_id: int, username: Optional[str], full_name: str, items: Dict[int, int],
+        idempotency_key: Optional[str] = None,
+) -> Tuple[models.Order, float]:
+    # Фиксируем заказ до того, как отправить пользователю подтверждение
+    try:
+        with stock.locked_products(items):
+            return stock.commit_with_retry(
+                db, _place_cart_order, tg_id, username, full_name, items, idempotency_key
+            )
+    except IntegrityError:
+        # Дубль оформили параллельно (другой процесс): отдаём заказ, который успел первым
+        existing = crud.get_order_id_by_idempotency_key(db, idempotency_key) if idempotency_key else None
+        if existing is None:
+            raise
+        return crud.get_order_details(db, existing)
+
+
+def _checkout_key(callback: CallbackQuery, items: Dict[int, int]) -> Optional[str]:
+    # Одно сообщение корзины с одним и тем же содержимым оформляется не больше одного раза
+    if callback.message:
+        origin = f"{callback.message.chat.id}:{callback.message.message_id}"
+    elif callback.inline_message_id:
+        origin = callback.inline_message_id
+    else:
+        return None
+    content = ",".join(f"{prod_id}x{qty}" for prod_id, qty in sorted(items.items()))
+    digest = hashlib.blake2s(f"{origin}|{content}".encode(), digest_size=8).hexdigest()
+    return f"checkout:{callback.from_user.id}:{digest}"
+
+
+def _load_orders(db: Session, user_id: int) -> Tuple[List[models.Order], Dict[int, float]]:
+    orders = crud.get_orders_by_user(db, user_id)
+    return orders, crud.get_order_totals(db, [o.id for o in orders])
+
+
 @router.message(Command(commands=["start", "help"]))
-async def cmd_start(message: Message) -> None:
+async def cmd_start(message: Message, db: Session) -> None:
     tg_id = message.from_user.id
     username = message.from_user.username
     full_name = f"{message.from_user.first_name} {message.from_user.last_name or ''}".strip()
 
-    with next(get_db()) as db:
-        user = crud.get_or_create_user(db, tg_id, username, full_name)
+    # Фиксируем запись сразу: иначе блокировка записи SQLite держится до конца апдейта,
+    # включая ответ в Telegram, и покупки в пуле потоков ждут её по busy_timeout
+    user = await user_cache.ensure(db, tg_id, username, full_name, commit=True)
 
     await message.reply(
         "👋 Здравствуйте, <b>{}</b>!\n\n"
         "📋 <b>Доступные команды:</b>\n"
         "/categories — выбрать категорию товаров\n"
+        "/search <i>запрос</i> — поиск товаров\n"
+        "/cart — корзина и оформление заказа\n"
         "/orders — посмотреть ваши заказы\n"
         "/order <i>order_id</i> — детали заказа\n"
         "/help — эта подсказка\n".format(user.full_name or user.username or tg_id),
@@ -29,100 +139,253 @@ async def cmd_start(message: Message) -> None:
     )
 
 
-@router.message(Command(commands=["categories"]))
-async def cmd_categories(message: Message) -> None:
-    with next(get_db()) as db:
-        cats = crud.get_all_categories(db)
-
+def _render_categories(cats: List[models.Category]) -> Optional[Tuple[str, InlineKeyboardMarkup]]:
     if not cats:
-        return await message.reply("Пока нет категорий.", parse_mode="HTML")
-
+        return None
     # Собираем клавиатуру (2 кнопки в ряд)
     inline_keyboard = []
     row = []
     for cat in cats:
-        btn = InlineKeyboardButton(text=cat.name, callback_data=f"show_cat_{cat.id}")
+        btn = InlineKeyboardButton(text=cat.name, callback_data=SHOW_CATEGORY.pack(cat.id))
         row.append(btn)
         if len(row) == 2:
             inline_keyboard.append(row)
             row = []
     if row:
         inline_keyboard.append(row)
+    return "<b>Выберите категорию:</b>", InlineKeyboardMarkup(inline_keyboard=inline_keyboard)
 
-    kb = InlineKeyboardMarkup(inline_keyboard=inline_keyboard)
-    await message.reply("<b>Выберите категорию:</b>", parse_mode="HTML", reply_markup=kb)
 
+_CART_BUTTON = InlineKeyboardButton(text="🛒 Корзина", callback_data=CART.pack("show"))
 
-@router.callback_query(lambda c: c.data and c.data.startswith("show_cat_"))
-async def process_category_callback(callback: CallbackQuery) -> None:
-    try:
-        cat_id = int(callback.data.split("_")[-1])
-    except (IndexError, ValueError):
-        return await callback.answer("Неверный формат категории.", show_alert=True)
 
-    with next(get_db()) as db:
-        products = crud.get_products(db, category_id=cat_id)
+def _clip(text: str, limit: int = 64) -> str:
+    return text if len(text) <= limit else text[:limit - 1] + "…"
 
-    if not products:
-        return await callback.answer("В этой категории нет товаров.", show_alert=True)
 
+def _load_category_page(
+        db: Session, cat_id: int, cursor: str
+) -> Tuple[List[models.Product], bool, bool]:
+    size = config.CATALOG_PAGE_SIZE
+    direction, cursor_id = (cursor[0], int(cursor[1:])) if cursor else ("", None)
+    if direction == "p":
+        products = crud.get_products(db, category_id=cat_id, before_id=cursor_id, limit=size + 1)
+        return products[-size:], len(products) > size, True
+    products = crud.get_products(
+        db, category_id=cat_id, after_id=cursor_id if direction == "n" else None, limit=size + 1
+    )
+    return products[:size], direction == "n", len(products) > size
+
+
+def _render_category(
+        cat_id: int, products: List[models.Product], has_prev: bool, has_next: bool
+) -> Optional[Tuple[str, InlineKeyboardMarkup]]:
+    if not products:
+        return None
     text = f"<b>Товары в категории #{cat_id}:</b>\n"
     inline_keyboard = []
     for p in products:
-        text += f"{p.id}. {p.name} — {p.price:.2f}₽ (в наличии: {p.quantity})\n"
-        btn = InlineKeyboardButton(text=f"Купить {p.name}", callback_data=f"buy_{p.id}_1")
+        text += f"{p.id}. {html.escape(_clip(p.name))} — {p.price:.2f}₽ (в наличии: {p.quantity})\n"
+        btn = InlineKeyboardButton(text=f"🛒 {_clip(p.name)}", callback_data=BUY.pack(p.id))
         inline_keyboard.append([btn])
+    nav = []
+    if has_prev:
+        nav.append(InlineKeyboardButton(text="◀️ Назад", callback_data=SHOW_CATEGORY.pack(cat_id, f"p{products[0].id}")))
+    if has_next:
+        nav.append(InlineKeyboardButton(text="Вперёд ▶️", callback_data=SHOW_CATEGORY.pack(cat_id, f"n{products[-1].id}")))
+    if nav:
+        inline_keyboard.append(nav)
+    inline_keyboard.append([_CART_BUTTON])
+    return text, InlineKeyboardMarkup(inline_keyboard=inline_keyboard)
+
+
+def prime_catalog(db: Session, max_categories: int = config.WARMUP_MAX_CATEGORIES) -> int:
+    # Прогрев после рестарта: список категорий и первые страницы категорий сразу в кэше,
+    # как их положили бы /categories и show_cat; возвращает число страниц
+    version = catalog_cache.version(CATEGORIES)
+    cats = crud.get_all_categories(db)
+    catalog_cache.put(("categories", CATEGORIES), version, _render_categories(cats))
+    for cat in cats[:max_categories]:
+        version = catalog_cache.version(cat.id)
+        products, has_prev, has_next = _load_category_page(db, cat.id, "")
+        catalog_cache.put(("category", cat.id, ""), version, _render_category(cat.id, products, has_prev, has_next))
+    return 1 + min(len(cats), max_categories)
+
+
+@router.message(Command(commands=["categories"]))
+async def cmd_categories(message: Message, read_db: Session) -> None:
+    key = ("categories", CATEGORIES)
+    rendered = catalog_cache.get(key)
+    if rendered is MISSING:
+        version = catalog_cache.version(CATEGORIES)
+        cats = await run_in_db(crud.get_all_categories, read_db)
+        rendered = _render_categories(cats)
+        catalog_cache.put(key, version, rendered)
+
+    if rendered is None:
+        return await message.reply("Пока нет категорий.", parse_mode="HTML")
+
+    text, kb = rendered
+    with send_priority(Priority.LOW):
+        await message.reply(text, parse_mode="HTML", reply_markup=kb)
+
+
+@callbacks(SHOW_CATEGORY)
+async def process_category_callback(callback: CallbackQuery, page: CategoryPage, read_db: Session) -> None:
+    cat_id, cursor = page
+    if cursor and (cursor[0] not in "np" or not cursor[1:].isdigit()):
+        return await callback.answer("Неверный формат категории.", show_alert=True)
+
+    key = ("category", cat_id, cursor)
+    rendered = catalog_cache.get(key)
+    if rendered is MISSING:
+        version = catalog_cache.version(cat_id)
+        products, has_prev, has_next = await run_in_db(_load_category_page, read_db, cat_id, cursor)
+        rendered = _render_category(cat_id, products, has_prev, has_next)
+        catalog_cache.put(key, version, rendered)
 
-    kb = InlineKeyboardMarkup(inline_keyboard=inline_keyboard)
+    if rendered is None:
+        return await callback.answer("В этой категории нет товаров.", show_alert=True)
+
+    text, kb = rendered
     await callback.answer()
-    await callback.message.answer(text, parse_mode="HTML", reply_markup=kb)
+    with send_priority(Priority.LOW):
+        if not cursor:
+            return await callback.message.answer(text, parse_mode="HTML", reply_markup=kb)
+        # Листание страниц редактирует уже показанное сообщение
+        try:
+            await callback.message.edit_text(text, parse_mode="HTML", reply_markup=kb)
+        except TelegramBadRequest:
+            pass
 
 
-@router.callback_query(lambda c: c.data and c.data.startswith("buy_"))
-async def process_buy_callback(callback: CallbackQuery) -> None:
-    parts = callback.data.split("_")
-    if len(parts) != 3:
-        return await callback.answer("Неверные данные для покупки.", show_alert=True)
-    try:
-        prod_id = int(parts[1])
-        qty = int(parts[2])
-    except ValueError:
+@callbacks(BUY)
+async def process_buy_callback(callback: CallbackQuery, item: AddToCart, db: Session) -> None:
+    # Кладёт товар в корзину, заказ создаётся при оформлении
+    prod_id, qty = item
+    if qty <= 0:
         return await callback.answer("Неверный ID товара или количество.", show_alert=True)
 
+    products = await run_in_db(crud.get_products_by_ids, db, [prod_id])
+    product = products.get(prod_id)
+    if product is None:
+        return await callback.answer("❗️ Товар не найден.", show_alert=True)
+    try:
+        cart = await cart_store.add(db, callback.from_user.id, prod_id, qty)
+    except ValueError as e:
+        return await callback.answer(f"❗️ {e}", show_alert=True)
+    await callback.answer(f"🛒 {_clip(product.name, 100)} — в корзине {cart[prod_id]} шт.")
+
+
+def _render_cart(cart: Dict[int, int], products: Dict[int, models.Product]) -> Tuple[str, InlineKeyboardMarkup]:
+    if not cart:
+        return "🛒 Корзина пуста. Выберите товары: /categories", InlineKeyboardMarkup(inline_keyboard=[])
+    text = "🛒 <b>Ваша корзина:</b>\n"
+    total = 0.0
+    inline_keyboard = []
+    for prod_id, qty in cart.items():
+        p = products[prod_id]
+        total += p.price * qty
+        text += f"{html.escape(_clip(p.name))} × {qty} шт. — {p.price * qty:.2f}₽\n"
+        inline_keyboard.append([
+            InlineKeyboardButton(text="➖", callback_data=CART.pack("dec", prod_id)),
+            InlineKeyboardButton(text=f"❌ {_clip(p.name, 32)}", callback_data=CART.pack("del", prod_id)),
+            InlineKeyboardButton(text="➕", callback_data=CART.pack("inc", prod_id)),
+        ])
+    text += f"\n<b>Итого: {total:.2f}₽</b>"
+    inline_keyboard.append([
+        InlineKeyboardButton(text="🗑 Очистить", callback_data=CART.pack("clear")),
+        InlineKeyboardButton(text="✅ Оформить заказ", callback_data=CART.pack("checkout")),
+    ])
+    return text, InlineKeyboardMarkup(inline_keyboard=inline_keyboard)
+
+
+async def _load_cart(db: Session, tg_id: int) -> Tuple[Dict[int, int], Dict[int, models.Product]]:
+    cart = await cart_store.load(db, tg_id)
+    products = await run_in_db(crud.get_products_by_ids, db, list(cart))
+    # Удалённые из каталога товары молча убираем из корзины
+    for prod_id in set(cart) - set(products):
+        cart = await cart_store.set_quantity(db, tg_id, prod_id, 0)
+    return cart, products
+
+
+@router.message(Command(commands=["cart"]))
+async def cmd_cart(message: Message, db: Session) -> None:
+    cart, products = await _load_cart(db, message.from_user.id)
+    text, kb = _render_cart(cart, products)
+    await message.reply(text, parse_mode="HTML", reply_markup=kb)
+
+
+async def _checkout_cart(callback: CallbackQuery, db: Session) -> None:
     tg_id = callback.from_user.id
+    cart = await cart_store.load(db, tg_id)
+    if not cart:
+        return await callback.answer("Корзина пуста.", show_alert=True)
     username = callback.from_user.username
     full_name = f"{callback.from_user.first_name} {callback.from_user.last_name or ''}".strip()
 
-    with next(get_db()) as db:
-        user = crud.get_or_create_user(db, tg_id, username, full_name)
-        order = crud.create_order(db, user.id)
+    try:
+        order_db, total_price = await run_in_db(
+            _checkout, db, tg_id, username, full_name, cart, _checkout_key(callback, cart)
+        )
+    except Exception as e:
+        return await callback.answer(f"❗️ Ошибка: {e}", show_alert=True)
+    cart_store.forget(tg_id)
+    # Остатки изменены атомарными UPDATE в обход ORM, поэтому сбрасываем страницы категорий явно
+    for category_id in {item.product.category_id for item in order_db.items}:
+        catalog_cache.invalidate_category(category_id)
+
+    text = f"✅ <b>Заказ #{order_db.id} оформлен!</b>\n\n"
+    for item in order_db.items:
+        text += f"{html.escape(item.product.name)} × {item.quantity} шт. — {item.unit_price:.2f}₽/шт.\n"
+    text += f"\n<b>Итого: {total_price:.2f}₽</b>\nСпасибо за покупку!"
+    await callback.answer()
+    # Подтверждение заказа обгоняет в очереди отправки ответы каталога
+    with send_priority(Priority.HIGH):
+        if callback.message:
+            with suppress(TelegramBadRequest):
+                await callback.message.edit_reply_markup(reply_markup=None)
+        await callback.bot.send_message(tg_id, text, parse_mode="HTML")
+
+
+@callbacks(CART)
+async def process_cart_callback(callback: CallbackQuery, cart_action: CartAction, db: Session) -> None:
+    action, prod_id = cart_action
+    tg_id = callback.from_user.id
+    if action == "checkout":
+        return await _checkout_cart(callback, db)
+    if action == "clear":
+        await cart_store.clear(db, tg_id)
+    elif action in ("inc", "dec", "del"):
+        if prod_id <= 0:
+            return await callback.answer("Неверные данные корзины.", show_alert=True)
+        cart = await cart_store.load(db, tg_id)
+        qty = cart.get(prod_id, 0)
+        qty = {"inc": qty + 1, "dec": qty - 1, "del": 0}[action]
         try:
-            item = crud.add_item_to_order(db, order.id, prod_id, qty)
-        except Exception as e:
-            return await callback.answer(f"❗️ Ошибка: {e}", show_alert=True)
-
-        order_db, total_price = crud.get_order_details(db, order.id)
-
-    text = (
-        f"✅ <b>Заказ #{order_db.id} оформлен!</b>\n\n"
-        f"Товар: <b>{item.product.name}</b>\n"
-        f"Количество: <b>{item.quantity}</b>\n"
-        f"Цена за шт.: <b>{item.unit_price:.2f}₽</b>\n\n"
-        f"<b>Итого: {total_price:.2f}₽</b>\n"
-        "Спасибо за покупку!"
-    )
+            await cart_store.set_quantity(db, tg_id, prod_id, qty)
+        except ValueError as e:
+            return await callback.answer(f"❗️ {e}", show_alert=True)
+    elif action != "show":
+        return await callback.answer("Неверные данные корзины.", show_alert=True)
+
+    cart, products = await _load_cart(db, tg_id)
+    text, kb = _render_cart(cart, products)
     await callback.answer()
-    await callback.message.answer(text, parse_mode="HTML")
+    if action == "show" or not callback.message:
+        return await callback.bot.send_message(tg_id, text, parse_mode="HTML", reply_markup=kb)
+    # Кнопки корзины редактируют уже показанное сообщение
+    with suppress(TelegramBadRequest):
+        await callback.message.edit_text(text, parse_mode="HTML", reply_markup=kb)
 
 
 @router.message(Command(commands=["orders"]))
-async def cmd_orders(message: Message) -> None:
+async def cmd_orders(message: Message, read_db: Session) -> None:
     tg_id = message.from_user.id
-    with next(get_db()) as db:
-        user = db.query(models.User).filter(models.User.telegram_id == tg_id).one_or_none()
-        if not user:
-            return await message.reply("Вы не зарегистрированы. Напишите /start.", parse_mode="HTML")
-        orders = crud.get_orders_by_user(db, user.id)
+    user = await user_cache.lookup(read_db, tg_id)
+    if not user:
+        return await message.reply("Вы не зарегистрированы. Напишите /start.", parse_mode="HTML")
+    orders, totals = await run_in_db(_load_orders, read_db, user.id)
 
     if not orders:
         return await message.reply("У вас нет заказов.", parse_mode="HTML")
@@ -130,13 +393,13 @@ async def cmd_orders(message: Message) -> None:
     text = "<b>Ваши заказы:</b>\n"
     for o in orders:
         ts = o.created_at.strftime("%Y-%m-%d %H:%M")
-        text += f"#{o.id}: <i>{o.status}</i>, {ts}\n"
+        text += f"#{o.id}: <i>{o.status}</i>, {ts} — {totals[o.id]:.2f}₽\n"
     text += "\nЧтобы посмотреть детали, введите /order <i>order_id</i>"
     await message.reply(text, parse_mode="HTML")
 
 
 @router.message(Command(commands=["order"]))
-async def cmd_order_details(message: Message) -> None:
+async def cmd_order_details(message: Message, read_db: Session) -> None:
     parts = message.text.split()
     if len(parts) != 2 or not parts[1].isdigit():
         return await message.reply("❗️ Использование: /order <i>order_id</i>", parse_mode="HTML")
@@ -144,23 +407,126 @@ async def cmd_order_details(message: Message) -> None:
     order_id = int(parts[1])
     tg_id = message.from_user.id
 
-    with next(get_db()) as db:
-        user = db.query(models.User).filter(models.User.telegram_id == tg_id).one_or_none()
-        if not user:
-            return await message.reply("Вы не зарегистрированы. Напишите /start.", parse_mode="HTML")
+    user = await user_cache.lookup(read_db, tg_id)
+    if not user:
+        return await message.reply("Вы не зарегистрированы. Напишите /start.", parse_mode="HTML")
 
-        try:
-            order, total_price = crud.get_order_details(db, order_id)
-        except Exception:
-            return await message.reply("❗️ Заказ не найден.", parse_mode="HTML")
+    try:
+        order, total_price = await run_in_db(crud.get_order_details, read_db, order_id)
+    except Exception:
+        return await message.reply("❗️ Заказ не найден.", parse_mode="HTML")
 
-        if order.user_id != user.id:
-            return await message.reply("❌ У вас нет доступа к этому заказу.", parse_mode="HTML")
+    if order.user_id != user.id:
+        return await message.reply("❌ У вас нет доступа к этому заказу.", parse_mode="HTML")
 
-        text = f"<b>Детали заказа #{order.id}:</b>\n"
-        for item in order.items:
-            text += f"{item.product.name} × {item.quantity} шт. — {item.unit_price:.2f}₽/шт.\n"
-        text += f"\n<b>Итого:</b> {total_price:.2f}₽\n"
-        text += f"Статус: <i>{order.status}</i>"
+    text = f"<b>Детали заказа #{order.id}:</b>\n"
+    for item in order.items:
+        text += f"{html.escape(item.product.name)} × {item.quantity} шт. — {item.unit_price:.2f}₽/шт.\n"
+    text += f"\n<b>Итого:</b> {total_price:.2f}₽\n"
+    text += f"Статус: <i>{order.status}</i>"
 
     await message.reply(text, parse_mode="HTML")
+
+
+# Текст запроса не влезает в 64 байта callback_data, поэтому страницы ссылаются на него по ключу
+_search_queries = TTLCache(maxsize=config.SEARCH_QUERY_CACHE_SIZE, ttl=config.SEARCH_QUERY_TTL)
+
+
+def _search_key(query: str) -> str:
+    key = hashlib.blake2s(query.encode(), digest_size=6).hexdigest()
+    _search_queries.set(key, query)
+    return key
+
+
+def _load_search_page(db: Session, query: str, offset: int) -> Tuple[List[models.Product], bool]:
+    size = config.CATALOG_PAGE_SIZE
+    products = crud.search_products(db, query, offset=offset, limit=size + 1)
+    return products[:size], len(products) > size
+
+
+def _render_search(
+        query: str, key: str, offset: int, products: List[models.Product], has_next: bool
+) -> Tuple[str, InlineKeyboardMarkup]:
+    text = f"<b>Результаты поиска «{html.escape(_clip(query))}»:</b>\n"
+    inline_keyboard = []
+    for p in products:
+        text += f"{p.id}. {html.escape(_clip(p.name))} — {p.price:.2f}₽ (в наличии: {p.quantity})\n"
+        btn = InlineKeyboardButton(text=f"🛒 {_clip(p.name)}", callback_data=BUY.pack(p.id))
+        inline_keyboard.append([btn])
+    nav = []
+    if offset > 0:
+        prev_offset = max(offset - config.CATALOG_PAGE_SIZE, 0)
+        nav.append(InlineKeyboardButton(text="◀️ Назад", callback_data=SEARCH.pack(key, prev_offset)))
+    if has_next:
+        next_offset = offset + config.CATALOG_PAGE_SIZE
+        nav.append(InlineKeyboardButton(text="Вперёд ▶️", callback_data=SEARCH.pack(key, next_offset)))
+    if nav:
+        inline_keyboard.append(nav)
+    inline_keyboard.append([_CART_BUTTON])
+    return text, InlineKeyboardMarkup(inline_keyboard=inline_keyboard)
+
+
+@router.message(Command(commands=["search"]))
+async def cmd_search(message: Message, read_db: Session) -> None:
+    parts = message.text.split(maxsplit=1)
+    query = parts[1].strip() if len(parts) == 2 else ""
+    if not crud.search_query(query):
+        return await message.reply("❗️ Использование: /search <i>запрос</i>", parse_mode="HTML")
+
+    products, has_next = await run_in_db(_load_search_page, read_db, query, 0)
+    if not products:
+        return await message.reply("Ничего не найдено.", parse_mode="HTML")
+
+    text, kb = _render_search(query, _search_key(query), 0, products, has_next)
+    with send_priority(Priority.LOW):
+        await message.reply(text, parse_mode="HTML", reply_markup=kb)
+
+
+@callbacks(SEARCH)
+async def process_search_callback(callback: CallbackQuery, page: SearchPage, read_db: Session) -> None:
+    key, offset = page
+    if offset < 0:
+        return await callback.answer("Неверные данные поиска.", show_alert=True)
+    query = _search_queries.get(key)
+    if query is None:
+        return await callback.answer("Поиск устарел, повторите /search.", show_alert=True)
+
+    products, has_next = await run_in_db(_load_search_page, read_db, query, offset)
+    if not products:
+        return await callback.answer("Больше ничего не найдено.", show_alert=True)
+
+    text, kb = _render_search(query, key, offset, products, has_next)
+    await callback.answer()
+    try:
+        with send_priority(Priority.LOW):
+            await callback.message.edit_text(text, parse_mode="HTML", reply_markup=kb)
+    except TelegramBadRequest:
+        pass
+
+
+@router.inline_query()
+async def inline_search(inline_query: InlineQuery, read_db: Session) -> None:
+    query = inline_query.query.strip()
+    offset = int(inline_query.offset) if inline_query.offset.isdigit() else 0
+    size = config.INLINE_RESULTS_LIMIT
+    products = []
+    if crud.search_query(query):
+        products = await run_in_db(crud.search_products, read_db, query, offset, size + 1)
+
+    results = [
+        InlineQueryResultArticle(
+            id=str(p.id),
+            title=p.name,
+            description=f"{p.price:.2f}₽ · в наличии: {p.quantity}",
+            input_message_content=InputTextMessageContent(
+                message_text=f"<b>{html.escape(p.name)}</b> — {p.price:.2f}₽",
+                parse_mode="HTML",
+            ),
+            reply_markup=InlineKeyboardMarkup(inline_keyboard=[[
+                InlineKeyboardButton(text=f"🛒 {_clip(p.name)}", callback_data=BUY.pack(p.id))
+            ]]),
+        )
+        for p in products[:size]
+    ]
+    next_offset = str(offset + size) if len(products) > size else ""
+    await inline_query.answer(results, cache_time=config.INLINE_CACHE_TIME, next_offset=next_offset)
@@ -0,0 +1,37 @@
+# middlewares/db.py
+
+from typing import Any, Awaitable, Callable, Dict, Optional
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from sqlalchemy.orm import sessionmaker
+from database.db import run_in_db
+
+
+# Одна сессия (и одна транзакция) на весь апдейт: коммит в конце, откат при ошибке
+class DbSessionMiddleware(BaseMiddleware):
+    def __init__(self, session_factory: sessionmaker, read_session_factory: Optional[sessionmaker] = None) -> None:
+        self.session_factory = session_factory
+        self.read_session_factory = read_session_factory
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any],
+    ) -> Any:
+        db = self.session_factory()
+        data["db"] = db
+        # Сессия для чтения каталога и истории заказов; без отдельного движка это та же сессия
+        read_db = self.read_session_factory() if self.read_session_factory else db
+        data["read_db"] = read_db
+        try:
+            result = await handler(event, data)
+            await run_in_db(db.commit)
+            return result
+        except Exception:
+            await run_in_db(db.rollback)
+            raise
+        finally:
+            await run_in_db(db.close)
+            if read_db is not db:
+                await run_in_db(read_db.close)
@@ -0,0 +1,84 @@
+# middlewares/idempotency.py
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Tuple
+from aiogram import BaseMiddleware, Bot
+from aiogram.exceptions import TelegramAPIError
+from aiogram.types import TelegramObject, Update
+import config
+from services.cache import TTLCache
+from services.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+DUPLICATES = registry.counter("bot_duplicate_updates", "Updates dropped as duplicates", ("kind",))
+
+
+# Внешний middleware на update, стоит перед сессией БД: повторно доставленные апдейты
+# (тот же update_id) и двойные нажатия (тот же пользователь и callback_data в коротком окне)
+# отбрасываются, не открывая транзакцию. Дубль нажатия ждёт завершения первого и просто
+# гасит «часики» на кнопке — результат пользователь уже получил от первого.
+class IdempotencyMiddleware(BaseMiddleware):
+    def __init__(
+            self,
+            update_ttl: float = config.IDEMPOTENCY_UPDATE_TTL,
+            callback_window: float = config.IDEMPOTENCY_CALLBACK_WINDOW,
+            callback_prefixes: Tuple[str, ...] = config.IDEMPOTENCY_CALLBACK_PREFIXES,
+            maxsize: int = config.IDEMPOTENCY_CACHE_SIZE,
+    ) -> None:
+        self.callback_prefixes = tuple(callback_prefixes)
+        self._updates = TTLCache(maxsize=maxsize, ttl=update_ttl)
+        self._callbacks = TTLCache(maxsize=maxsize, ttl=callback_window)
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any],
+    ) -> Any:
+        if not isinstance(event, Update):
+            return await handler(event, data)
+        if event.update_id in self._updates:
+            DUPLICATES.inc(kind="update")
+            return None
+        self._updates.set(event.update_id, True)
+        try:
+            return await self._handle(handler, event, data)
+        except Exception:
+            # Упавший апдейт может прийти снова (вебхук, перезапуск воркера) — это не дубль
+            self._updates.pop(event.update_id)
+            raise
+
+    async def _handle(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: Update,
+            data: Dict[str, Any],
+    ) -> Any:
+        callback = event.callback_query
+        if callback is None or not (callback.data or "").startswith(self.callback_prefixes):
+            return await handler(event, data)
+
+        key = (callback.from_user.id, callback.data)
+        first = self._callbacks.get(key)
+        if first is not None:
+            DUPLICATES.inc(kind="callback")
+            await asyncio.shield(first)
+            bot: Bot = data["bot"]
+            try:
+                await bot.answer_callback_query(callback.id)
+            except TelegramAPIError as e:
+                logger.debug("Duplicate callback %s not answered: %s", callback.id, e)
+            return None
+
+        done = asyncio.get_running_loop().create_future()
+        self._callbacks.set(key, done)
+        try:
+            return await handler(event, data)
+        except Exception:
+            # Неудачное нажатие можно сразу повторить
+            self._callbacks.pop(key)
+            raise
+        finally:
+            done.set_result(None)
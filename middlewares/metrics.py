@@ -0,0 +1,116 @@
+# middlewares/metrics.py
+
+import logging
+import re
+import time
+from typing import Any, Awaitable, Callable, Collection, Dict, FrozenSet, Optional
+from aiogram import BaseMiddleware, Bot, Router
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.filters import Command
+from aiogram.methods import Response, TelegramMethod
+from aiogram.types import TelegramObject, Update
+import config
+from services.callbacks import callback_name
+from services.metrics import (
+    TELEGRAM_REQUEST_DURATION,
+    TELEGRAM_REQUESTS,
+    UPDATE_DURATION,
+    UPDATES_IN_FLIGHT,
+)
+
+logger = logging.getLogger(__name__)
+
+# Маршрут callback — имя из таблицы callback (c1:3 -> show_cat); для незарегистрированных
+# данных — префикс без идентификаторов: show_cat_3_n15 -> show_cat, buy_7_1 -> buy
+_CALLBACK_PREFIX = re.compile(r"[A-Za-z]+(?:_[A-Za-z]+)*(?=_|$)")
+
+
+def registered_commands(router: Router) -> FrozenSet[str]:
+    # Команды из фильтров Command во всех вложенных роутерах: /start, /order, …
+    commands = set()
+    for sub_router in router.chain_tail:
+        for handler in sub_router.message.handlers:
+            for flt in handler.filters or ():
+                if isinstance(flt.callback, Command):
+                    commands.update(f"/{command}" for command in flt.callback.commands if isinstance(command, str))
+    return frozenset(commands)
+
+
+def update_route(update: Update, commands: Collection[str] = frozenset()) -> str:
+    message = update.message
+    if message is not None:
+        text = message.text or message.caption or ""
+        if text.startswith("/"):
+            # Имя команды — метка метрики, поэтому только известные боту: иначе каждая
+            # случайная «команда» от пользователя заводила бы новый временной ряд
+            command = text.split(maxsplit=1)[0].split("@", 1)[0].lower()
+            return command if command in commands else "unknown"
+        return "message"
+    callback = update.callback_query
+    if callback is not None:
+        name = callback_name(callback.data or "")
+        if name:
+            return f"callback:{name}"
+        match = _CALLBACK_PREFIX.match(callback.data or "")
+        return f"callback:{match.group(0)}" if match else "callback"
+    return update.event_type
+
+
+# Внешний middleware на update: время обработки по маршруту (включая коммит) и число апдейтов в работе
+class UpdateMetricsMiddleware(BaseMiddleware):
+    def __init__(self, router: Optional[Router] = None, slow_update_ms: float = config.METRICS_SLOW_UPDATE_MS) -> None:
+        self.router = router
+        self.slow_update = slow_update_ms / 1000
+        self._commands: Optional[FrozenSet[str]] = None
+
+    @property
+    def commands(self) -> FrozenSet[str]:
+        # Роутеры подключаются к Dispatcher после middleware, поэтому команды собираются на первом апдейте
+        if self._commands is None:
+            self._commands = registered_commands(self.router) if self.router is not None else frozenset()
+        return self._commands
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any],
+    ) -> Any:
+        route = update_route(event, self.commands) if isinstance(event, Update) else type(event).__name__
+        outcome = "ok"
+        UPDATES_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            outcome = "error"
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            UPDATES_IN_FLIGHT.dec()
+            UPDATE_DURATION.observe(elapsed, route=route, outcome=outcome)
+            if self.slow_update and elapsed >= self.slow_update:
+                logger.warning(
+                    "Slow update %s (%s): %.1f ms", getattr(event, "update_id", "?"), route, elapsed * 1000
+                )
+
+
+# Middleware сессии бота: счётчики и время исходящих вызовов Bot API
+class ApiMetricsMiddleware(BaseRequestMiddleware):
+    async def __call__(
+            self,
+            make_request: NextRequestMiddlewareType,
+            bot: Bot,
+            method: TelegramMethod,
+    ) -> Response:
+        name = method.__api_method__
+        started = time.perf_counter()
+        try:
+            response = await make_request(bot, method)
+        except Exception as e:
+            TELEGRAM_REQUESTS.inc(method=name, outcome=type(e).__name__)
+            raise
+        finally:
+            TELEGRAM_REQUEST_DURATION.observe(time.perf_counter() - started, method=name)
+        TELEGRAM_REQUESTS.inc(method=name, outcome="ok")
+        return response
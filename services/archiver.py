@@ -0,0 +1,82 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import List, Optional, Sequence
+from sqlalchemy.orm import sessionmaker
+import config
+from database import archive
+from database.db import SessionLocal, run_in_db
+from database.stock import commit_with_retry
+from services.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+ARCHIVED_ORDERS = registry.counter("archived_orders", "Orders moved to the archive tables")
+ARCHIVE_RUN_DURATION = registry.histogram(
+    "archive_run_duration_seconds", "Duration of one archival run", buckets=(0.1, 1, 10, 60, 600)
+)
+
+
+# Периодически переносит завершённые заказы в архив. Каждая пачка — отдельная транзакция
+# в своей сессии, между пачками пауза: покупки успевают взять блокировку записи.
+class OrderArchiver:
+    def __init__(
+            self,
+            interval: float = config.ARCHIVE_INTERVAL,
+            after_days: int = config.ARCHIVE_AFTER_DAYS,
+            statuses: Sequence[str] = config.ARCHIVE_STATUSES,
+            batch_size: int = config.ARCHIVE_BATCH_SIZE,
+            pause: float = config.ARCHIVE_BATCH_PAUSE,
+            session_factory: sessionmaker = SessionLocal,
+    ) -> None:
+        self.interval = interval
+        self.after_days = after_days
+        self.statuses = tuple(statuses)
+        self.batch_size = batch_size
+        self.pause = pause
+        self.session_factory = session_factory
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if self.interval > 0:
+            self._task = asyncio.create_task(self._schedule())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def run_once(self, after_days: Optional[int] = None) -> int:
+        days = self.after_days if after_days is None else after_days
+        before = datetime.utcnow() - timedelta(days=days)
+        # Ручной запуск и расписание не пересекаются: иначе они делили бы одни и те же пачки
+        async with self._lock:
+            started = asyncio.get_running_loop().time()
+            total, after_id = 0, 0
+            while True:
+                ids = await run_in_db(self._archive_batch, before, after_id)
+                total += len(ids)
+                ARCHIVED_ORDERS.inc(len(ids))
+                if len(ids) < self.batch_size:
+                    break
+                after_id = ids[-1]
+                await asyncio.sleep(self.pause)
+            ARCHIVE_RUN_DURATION.observe(asyncio.get_running_loop().time() - started)
+        if total:
+            logger.info("Archived %d orders older than %s", total, before)
+        return total
+
+    def _archive_batch(self, before: datetime, after_id: int) -> List[int]:
+        with self.session_factory() as db:
+            return commit_with_retry(db, archive.archive_orders, before, self.statuses, self.batch_size, after_id)
+
+    async def _schedule(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Order archival failed")
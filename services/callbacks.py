@@ -0,0 +1,164 @@
+import inspect
+import re
+from typing import (
+    Any, Awaitable, Callable, Dict, Generic, List, NamedTuple, Optional, Sequence, Tuple, Type, TypeVar, get_type_hints,
+)
+from aiogram import Router
+from aiogram.types import CallbackQuery
+
+P = TypeVar("P", bound=tuple)
+
+SEPARATOR = ":"
+# Предел callback_data в Telegram
+MAX_DATA_BYTES = 64
+
+# Заголовок (b1) или старый префикс (buy) -> имя маршрута, для меток метрик
+_names: Dict[str, str] = {}
+
+
+def callback_name(data: str) -> Optional[str]:
+    head = data.partition(SEPARATOR)[0]
+    return _names.get(head) or _names.get(head.partition("_")[0])
+
+
+# Компактная callback_data: <префикс><версия>:<поле>:<поле>…, например b1:7 или c1:3:n15.
+# Поля описывает NamedTuple с аннотациями int/str; хвостовые поля, равные значениям
+# по умолчанию, не пишутся. Новый набор полей — новая версия: кнопки со старым заголовком
+# остаются в истории чатов, поэтому старую версию не удаляют, пока она может прийти.
+# legacy — регулярка старого формата с подчёркиваниями (buy_7_1), группы идут по порядку полей.
+class CallbackCodec(Generic[P]):
+    def __init__(
+            self, name: str, prefix: str, payload: Type[P], version: int = 1, legacy: Optional[str] = None
+    ) -> None:
+        if not prefix.isalpha():
+            raise ValueError(f"Callback prefix must be letters only: {prefix!r}")
+        self.name = name
+        self.head = f"{prefix}{version}"
+        self.payload = payload
+        hints = get_type_hints(payload)
+        self._types = tuple(hints[f] for f in payload._fields)
+        self._defaults = payload._field_defaults
+        self._required = len(payload._fields) - len(self._defaults)
+        self.legacy = re.compile(legacy) if legacy else None
+        self.legacy_key = legacy.partition("_")[0] if legacy else None
+        _names[self.head] = name
+        if self.legacy_key:
+            _names[self.legacy_key] = name
+
+    def pack(self, *args: Any, **kwargs: Any) -> str:
+        values = list(self.payload(*args, **kwargs))
+        fields = self.payload._fields
+        while len(values) > self._required and values[-1] == self._defaults[fields[len(values) - 1]]:
+            values.pop()
+        parts = [self.head]
+        for value in values:
+            text = str(value)
+            if SEPARATOR in text:
+                raise ValueError(f"Callback field contains {SEPARATOR!r}: {text!r}")
+            parts.append(text)
+        data = SEPARATOR.join(parts)
+        if len(data.encode()) > MAX_DATA_BYTES:
+            raise ValueError(f"Callback data longer than {MAX_DATA_BYTES} bytes: {data!r}")
+        return data
+
+    def unpack(self, data: str) -> P:
+        head, *parts = data.split(SEPARATOR)
+        if head != self.head:
+            raise ValueError(f"Not a {self.name} callback: {data!r}")
+        return self._build(parts)
+
+    def unpack_legacy(self, data: str) -> P:
+        match = self.legacy.fullmatch(data) if self.legacy else None
+        if match is None:
+            raise ValueError(f"Not a legacy {self.name} callback: {data!r}")
+        return self._build(match.groups())
+
+    def _build(self, parts: Sequence[Optional[str]]) -> P:
+        if not self._required <= len(parts) <= len(self._types):
+            raise ValueError(f"Wrong number of fields for {self.name}: {len(parts)}")
+        values = []
+        for field, kind, raw in zip(self.payload._fields, self._types, parts):
+            values.append(self._defaults[field] if raw is None else kind(raw))
+        return self.payload(*values)
+
+
+class _Route(NamedTuple):
+    codec: CallbackCodec
+    handler: Callable[..., Awaitable[Any]]
+    # Имена аргументов, которые хендлер берёт из данных апдейта; None — берёт все (**kwargs)
+    params: Optional[frozenset]
+
+
+# Таблица маршрутов callback: заголовок данных -> хендлер, поиск за один словарный доступ
+# вместо перебора фильтров. Данные разбираются один раз, хендлер получает готовый payload:
+#   handler(callback, payload, **нужные_данные_апдейта)
+# В роутер aiogram таблица встаёт одним хендлером (attach), чужие callback пропускает дальше.
+class CallbackTable:
+    def __init__(self, invalid_text: str = "❗️ Кнопка устарела, откройте меню заново.") -> None:
+        self.invalid_text = invalid_text
+        self._routes: Dict[str, _Route] = {}
+        self._legacy: Dict[str, List[_Route]] = {}
+
+    def register(self, codec: CallbackCodec, handler: Callable[..., Awaitable[Any]]) -> None:
+        if codec.head in self._routes:
+            raise ValueError(f"Callback {codec.head!r} is already registered")
+        params = list(inspect.signature(handler).parameters.values())
+        if any(p.kind is p.VAR_KEYWORD for p in params):
+            names = None
+        else:
+            names = frozenset(p.name for p in params[2:])
+        route = _Route(codec, handler, names)
+        self._routes[codec.head] = route
+        if codec.legacy_key:
+            self._legacy.setdefault(codec.legacy_key, []).append(route)
+
+    def __call__(self, codec: CallbackCodec) -> Callable[[Callable[..., Awaitable[Any]]], Callable[..., Awaitable[Any]]]:
+        def decorator(handler: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+            self.register(codec, handler)
+            return handler
+        return decorator
+
+    def __len__(self) -> int:
+        return len(self._routes)
+
+    def resolve(self, data: Optional[str]) -> Optional[Tuple[_Route, Optional[Any]]]:
+        # (маршрут, payload); payload None — заголовок наш, но данные битые
+        if not data:
+            return None
+        head = data.partition(SEPARATOR)[0]
+        route = self._routes.get(head)
+        if route is not None:
+            try:
+                return route, route.codec.unpack(data)
+            except ValueError:
+                return route, None
+        for route in self._legacy.get(head.partition("_")[0], ()):
+            try:
+                return route, route.codec.unpack_legacy(data)
+            except ValueError:
+                continue
+        return None
+
+    async def dispatch(self, callback: CallbackQuery, **data: Any) -> Any:
+        resolved = self.resolve(callback.data)
+        if resolved is None:
+            return None
+        return await self._call(callback, resolved, data)
+
+    def attach(self, router: Router) -> None:
+        router.callback_query.register(self._handle, self._match)
+
+    def _match(self, callback: CallbackQuery) -> Any:
+        resolved = self.resolve(callback.data)
+        return {"callback_route": resolved} if resolved is not None else False
+
+    async def _handle(self, callback: CallbackQuery, callback_route: Tuple[_Route, Any], **data: Any) -> Any:
+        return await self._call(callback, callback_route, data)
+
+    async def _call(self, callback: CallbackQuery, resolved: Tuple[_Route, Any], data: Dict[str, Any]) -> Any:
+        route, payload = resolved
+        if payload is None:
+            return await callback.answer(self.invalid_text, show_alert=True)
+        if route.params is not None:
+            data = {name: value for name, value in data.items() if name in route.params}
+        return await route.handler(callback, payload, **data)
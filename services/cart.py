@@ -0,0 +1,71 @@
+from typing import Dict
+from sqlalchemy.orm import Session
+import config
+from database import crud
+from database.db import run_in_db
+from services.cache import TTLCache
+
+
+# Корзины живут в памяти процесса (telegram_id -> {product_id: quantity}) и вытесняются по TTL.
+# С CART_PERSIST=1 каждое изменение дублируется в таблицу cart_items короткой транзакцией,
+# и корзина переживает рестарт бота или вытеснение из кэша.
+class CartStore:
+    def __init__(
+            self,
+            maxsize: int = config.CART_CACHE_SIZE,
+            ttl: float = config.CART_TTL,
+            persist: bool = config.CART_PERSIST,
+            max_items: int = config.CART_MAX_ITEMS,
+            max_quantity: int = config.CART_MAX_QUANTITY,
+    ) -> None:
+        self.persist = persist
+        self.max_items = max_items
+        self.max_quantity = max_quantity
+        self._carts = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def load(self, db: Session, telegram_id: int) -> Dict[int, int]:
+        cart = self._carts.get(telegram_id)
+        if cart is None:
+            cart = await run_in_db(crud.get_cart_items, db, telegram_id) if self.persist else {}
+            # Пока читали из БД, корзину мог создать параллельный апдейт того же пользователя
+            cart = self._carts.get(telegram_id) or cart
+            self._carts.set(telegram_id, cart)
+        return dict(cart)
+
+    async def set_quantity(self, db: Session, telegram_id: int, product_id: int, quantity: int) -> Dict[int, int]:
+        cart = await self.load(db, telegram_id)
+        if quantity <= 0:
+            cart.pop(product_id, None)
+        elif product_id not in cart and len(cart) >= self.max_items:
+            raise ValueError(f"В корзине не больше {self.max_items} разных товаров.")
+        else:
+            cart[product_id] = min(quantity, self.max_quantity)
+        await self._store(db, telegram_id, cart)
+        return dict(cart)
+
+    async def add(self, db: Session, telegram_id: int, product_id: int, quantity: int = 1) -> Dict[int, int]:
+        cart = await self.load(db, telegram_id)
+        return await self.set_quantity(db, telegram_id, product_id, cart.get(product_id, 0) + quantity)
+
+    async def clear(self, db: Session, telegram_id: int) -> None:
+        await self._store(db, telegram_id, {})
+
+    def forget(self, telegram_id: int) -> None:
+        # После оформления заказа: строки cart_items уже удалены в транзакции заказа
+        self._carts.set(telegram_id, {})
+
+    async def _store(self, db: Session, telegram_id: int, cart: Dict[int, int]) -> None:
+        self._carts.set(telegram_id, cart)
+        if self.persist:
+            await run_in_db(self._save, db, telegram_id, dict(cart))
+
+    @staticmethod
+    def _save(db: Session, telegram_id: int, cart: Dict[int, int]) -> None:
+        crud.replace_cart_items(db, telegram_id, cart)
+        db.commit()
+
+    def reset(self) -> None:
+        self._carts.clear()
+
+
+cart_store = CartStore()
@@ -0,0 +1,92 @@
+import threading
+from collections import defaultdict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Set, Tuple
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+import config
+from database.models import Category, Product
+from services.cache import MISSING, TTLCache
+
+# Ключи кэша — кортежи, второй элемент которых id категории (None — список категорий).
+# Поколения защищают от гонки «прочитали из БД → инвалидация → положили устаревшее».
+CATEGORIES = None
+
+
+class CatalogCache:
+    def __init__(self, maxsize: int = config.CATALOG_CACHE_SIZE, ttl: float = config.CATALOG_CACHE_TTL) -> None:
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self._generations: Dict[Optional[int], int] = defaultdict(int)
+        self._epoch = 0
+        self._listeners: List[Callable[[str, Optional[int]], None]] = []
+
+    def version(self, category_id: Optional[int]) -> Tuple[int, int]:
+        with self._lock:
+            return self._epoch, self._generations[category_id]
+
+    def get(self, key: Tuple[Hashable, ...]) -> Any:
+        return self._entries.get(key, MISSING)
+
+    def put(self, key: Tuple[Hashable, ...], version: Tuple[int, int], value: Any) -> None:
+        with self._lock:
+            if version != (self._epoch, self._generations[key[1]]):
+                return
+            self._entries.set(key, value)
+
+    def subscribe(self, listener: Callable[[str, Optional[int]], None]) -> None:
+        # Слушатель получает каждую локальную инвалидацию: ("category", id) или ("all", None)
+        self._listeners.append(listener)
+
+    def invalidate_category(self, category_id: Optional[int], notify: bool = True) -> None:
+        with self._lock:
+            self._generations[category_id] += 1
+            self._entries.discard_where(lambda key: key[1] == category_id)
+        if notify:
+            self._notify("category", category_id)
+
+    def invalidate_all(self, notify: bool = True) -> None:
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+        if notify:
+            self._notify("all", None)
+
+    def apply(self, kind: str, category_id: Optional[int]) -> None:
+        # Инвалидация, пришедшая из другого процесса: применяем, но дальше не рассылаем
+        if kind == "all":
+            self.invalidate_all(notify=False)
+        else:
+            self.invalidate_category(category_id, notify=False)
+
+    def _notify(self, kind: str, category_id: Optional[int]) -> None:
+        for listener in self._listeners:
+            listener(kind, category_id)
+
+
+catalog_cache = CatalogCache()
+
+
+# Изменения каталога через ORM (админ-команды, crud.create_category) копятся в session.info
+# и сбрасывают кэш только после успешного коммита
+def _collect_changes(session: Session, flush_context: Any) -> None:
+    changed: Set[Optional[int]] = session.info.setdefault("catalog_changed", set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Category):
+            changed.update((CATEGORIES, obj.id))
+        elif isinstance(obj, Product):
+            changed.add(obj.category_id)
+            changed.update(inspect(obj).attrs.category_id.history.deleted)
+
+
+def _apply_changes(session: Session) -> None:
+    for category_id in session.info.pop("catalog_changed", ()):
+        catalog_cache.invalidate_category(category_id)
+
+
+def _discard_changes(session: Session) -> None:
+    session.info.pop("catalog_changed", None)
+
+
+event.listen(Session, "after_flush", _collect_changes)
+event.listen(Session, "after_commit", _apply_changes)
+event.listen(Session, "after_rollback", _discard_changes)
@@ -0,0 +1,170 @@
+import csv
+import itertools
+import json
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, IO, Iterator, List, Optional, Tuple
+from sqlalchemy.orm import Session
+import config
+from database.db import on_commit
+from database.models import Category, Product
+from services.catalog_cache import catalog_cache
+
+PRODUCT_FIELDS = ["id", "name", "description", "price", "quantity", "category"]
+CATEGORY_FIELDS = ["id", "name"]
+
+
+@dataclass
+class ProductRow:
+    id: Optional[int]
+    name: str
+    description: str
+    price: float
+    quantity: int
+    category: str
+
+
+@dataclass
+class ImportBatch:
+    rows: List[ProductRow] = field(default_factory=list)
+    errors: List[Tuple[int, str]] = field(default_factory=list)
+    lines: int = 0
+
+
+def detect_format(filename: str) -> str:
+    name = filename.lower()
+    if name.endswith(".csv"):
+        return "csv"
+    if name.endswith((".json", ".jsonl", ".ndjson")):
+        return "json"
+    raise ValueError("Поддерживаются файлы .csv, .json и .jsonl")
+
+
+def iter_records(fh: IO[str], fmt: str) -> Iterator[Tuple[int, Any]]:
+    if fmt == "csv":
+        reader = csv.DictReader(fh)
+        for record in reader:
+            yield reader.line_num, record
+        return
+    # JSON Lines читается построчно; JSON-массив (до 20 МБ по лимиту Telegram) — целиком
+    head = fh.readline()
+    if head.lstrip().startswith("["):
+        yield from enumerate(json.loads(head + fh.read()), start=1)
+        return
+    for number, line in enumerate(itertools.chain([head], fh), start=1):
+        if line.strip():
+            yield number, line
+
+
+def parse_row(record: Any) -> ProductRow:
+    if isinstance(record, str):
+        try:
+            record = json.loads(record)
+        except ValueError:
+            raise ValueError("неверный JSON")
+    if not isinstance(record, dict):
+        raise ValueError("строка должна быть объектом")
+    name = str(record.get("name") or "").strip()
+    category = str(record.get("category") or "").strip()
+    if not name:
+        raise ValueError("не указано название")
+    if not category:
+        raise ValueError("не указана категория")
+    raw_id = str(record.get("id") or "").strip()
+    try:
+        price = float(record.get("price"))
+        quantity = int(record.get("quantity"))
+        product_id = int(raw_id) if raw_id else None
+    except (TypeError, ValueError):
+        raise ValueError("неверные числовые поля")
+    if price < 0 or quantity < 0:
+        raise ValueError("цена и количество не могут быть отрицательными")
+    return ProductRow(product_id, name, str(record.get("description") or ""), price, quantity, category)
+
+
+def read_batches(fh: IO[str], fmt: str, batch_size: int = config.IMPORT_BATCH_SIZE) -> Iterator[ImportBatch]:
+    batch = ImportBatch()
+    try:
+        for number, record in iter_records(fh, fmt):
+            batch.lines = number
+            try:
+                batch.rows.append(parse_row(record))
+            except ValueError as e:
+                batch.errors.append((number, str(e)))
+            if len(batch.rows) >= batch_size:
+                yield batch
+                batch = ImportBatch(lines=number)
+    except (ValueError, csv.Error) as e:
+        batch.errors.append((batch.lines + 1, f"файл не разобран: {e}"))
+    yield batch
+
+
+def _category_ids(db: Session, names: List[str]) -> Dict[str, int]:
+    ids = dict(db.query(Category.name, Category.id).filter(Category.name.in_(names)).all())
+    for name in names:
+        if name not in ids:
+            category = Category(name=name)
+            db.add(category)
+            db.flush()
+            ids[name] = category.id
+    return ids
+
+
+def apply_batch(db: Session, rows: List[ProductRow]) -> Tuple[int, int]:
+    # Upsert пачкой: одно чтение существующих id и bulk insert/update вместо ORM-объектов
+    category_ids = _category_ids(db, sorted({row.category for row in rows}))
+    requested = [row.id for row in rows if row.id is not None]
+    existing = {pid for (pid,) in db.query(Product.id).filter(Product.id.in_(requested))} if requested else set()
+    inserts, updates = [], []
+    for row in rows:
+        values = {
+            "name": row.name,
+            "description": row.description,
+            "price": row.price,
+            "quantity": row.quantity,
+            "category_id": category_ids[row.category],
+        }
+        if row.id is None:
+            inserts.append(values)
+        elif row.id in existing:
+            updates.append({"id": row.id, **values})
+        else:
+            inserts.append({"id": row.id, **values})
+            existing.add(row.id)
+    if inserts:
+        db.bulk_insert_mappings(Product, inserts)
+    if updates:
+        db.bulk_update_mappings(Product, updates)
+    # bulk-операции идут мимо ORM-событий, поэтому каталог сбрасывается целиком после коммита
+    on_commit(db, catalog_cache.invalidate_all)
+    return len(inserts), len(updates)
+
+
+def export_products(db: Session, fh: IO[str], chunk_size: int = config.EXPORT_CHUNK_SIZE) -> int:
+    writer = csv.writer(fh)
+    writer.writerow(PRODUCT_FIELDS)
+    query = (
+        db.query(Product.id, Product.name, Product.description, Product.price, Product.quantity, Category.name)
+        .join(Category, Product.category_id == Category.id)
+        .order_by(Product.id)
+        .yield_per(chunk_size)
+    )
+    count = 0
+    for row in query:
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+def export_categories(db: Session, fh: IO[str], chunk_size: int = config.EXPORT_CHUNK_SIZE) -> int:
+    writer = csv.writer(fh)
+    writer.writerow(CATEGORY_FIELDS)
+    count = 0
+    for row in db.query(Category.id, Category.name).order_by(Category.id).yield_per(chunk_size):
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+def export_to_file(db: Session, exporter: Callable[[Session, IO[str]], int], path: str) -> int:
+    with open(path, "w", newline="", encoding="utf-8") as fh:
+        return exporter(db, fh)
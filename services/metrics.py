@@ -0,0 +1,310 @@
+import bisect
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from aiohttp import web
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from database.pool import pool_status
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    value = float(value)
+    if value == float("inf"):
+        return "+Inf"
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self) -> Iterable[Tuple[str, Sequence[str], Sequence[str], float]]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, names, values, value in self._samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(names, values)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def set(self, value: float, **labels: Any) -> None:
+        # Для накопительных значений, которые считаются вне реестра (статистика пула соединений)
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def value(self, **labels: Any) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield "_total", self.labelnames, key, value
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: Any) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def value(self, **labels: Any) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield "", self.labelnames, key, value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, *args: Any, buckets: Sequence[float] = DEFAULT_BUCKETS, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # По ключу меток: счётчики по бакетам (не накопительные), сумма, количество
+        self._values: Dict[LabelValues, List[Any]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def count(self, **labels: Any) -> int:
+        with self._lock:
+            entry = self._values.get(self._key(labels))
+            return entry[2] if entry else 0
+
+    def sum(self, **labels: Any) -> float:
+        with self._lock:
+            entry = self._values.get(self._key(labels))
+            return entry[1] if entry else 0.0
+
+    def _samples(self):
+        with self._lock:
+            items = sorted((key, (list(e[0]), e[1], e[2])) for key, e in self._values.items())
+        names = self.labelnames + ("le",)
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                yield "_bucket", names, key + (_format_value(bound),), cumulative
+            yield "_sum", self.labelnames, key, total
+            yield "_count", self.labelnames, key, count
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> Any:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+            self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets=buckets))
+
+    def collector(self, func: Callable[[], None]) -> None:
+        # Вызывается перед каждой выдачей метрик: снимает значения, которые копятся вне реестра
+        with self._lock:
+            self._collectors.append(func)
+
+    def render(self) -> str:
+        with self._lock:
+            collectors = list(self._collectors)
+        for collect in collectors:
+            collect()
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+UPDATES_IN_FLIGHT = registry.gauge("bot_updates_in_flight", "Updates currently being processed")
+UPDATE_DURATION = registry.histogram(
+    "bot_update_duration_seconds", "Update processing time by route", ("route", "outcome")
+)
+DB_QUERIES = registry.counter("db_queries", "SQL statements by issuing CRUD function", ("function",))
+DB_QUERY_DURATION = registry.histogram(
+    "db_query_duration_seconds", "SQL statement time by issuing CRUD function", ("function",)
+)
+TELEGRAM_REQUESTS = registry.counter(
+    "telegram_api_requests", "Outgoing Bot API calls by method and outcome", ("method", "outcome")
+)
+TELEGRAM_REQUEST_DURATION = registry.histogram(
+    "telegram_api_request_duration_seconds", "Outgoing Bot API call time", ("method",)
+)
+DB_POOL_SIZE = registry.gauge("db_pool_size", "Connections kept in the pool", ("pool",))
+DB_POOL_CHECKED_OUT = registry.gauge("db_pool_checked_out", "Connections currently checked out", ("pool",))
+DB_POOL_OVERFLOW = registry.gauge("db_pool_overflow", "Connections open above the pool size", ("pool",))
+DB_POOL_CHECKOUTS = registry.counter("db_pool_checkouts", "Connection checkouts", ("pool",))
+DB_POOL_TIMEOUTS = registry.counter("db_pool_timeouts", "Checkouts that hit the pool timeout", ("pool",))
+DB_POOL_WAIT = registry.counter("db_pool_wait_seconds", "Time spent waiting for a free connection", ("pool",))
+DB_POOL_HOLD = registry.counter("db_pool_hold_seconds", "Time connections stayed checked out", ("pool",))
+DB_POOL_WAIT_MAX = registry.gauge("db_pool_wait_max_seconds", "Longest wait for a free connection", ("pool",))
+DB_POOL_HOLD_MAX = registry.gauge("db_pool_hold_max_seconds", "Longest time a connection stayed checked out", ("pool",))
+
+
+# Имя функции database.crud, из которой выполняется запрос (ищем вверх по стеку)
+def _crud_caller(module: str = "database.crud") -> str:
+    frame = sys._getframe(2)
+    while frame is not None:
+        if frame.f_globals.get("__name__") == module:
+            return frame.f_code.co_name
+        frame = frame.f_back
+    return "other"
+
+
+def instrument_engine(engine: Engine) -> None:
+    if getattr(engine, "_metrics_instrumented", False):
+        return
+    engine._metrics_instrumented = True
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany) -> None:
+        conn.info.setdefault("query_started", []).append((time.perf_counter(), _crud_caller()))
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany) -> None:
+        stack = conn.info.get("query_started")
+        if not stack:
+            return
+        started, function = stack.pop()
+        DB_QUERIES.inc(function=function)
+        DB_QUERY_DURATION.observe(time.perf_counter() - started, function=function)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context) -> None:
+        stack = context.connection.info.get("query_started") if context.connection is not None else None
+        if stack:
+            stack.pop()
+
+
+def instrument_pool(engine: Engine, pool: str) -> None:
+    # Статистика TimedQueuePool снимается при каждой выдаче /metrics: среднее ожидание —
+    # rate(db_pool_wait_seconds_total) / rate(db_pool_checkouts_total)
+    if getattr(engine, "_pool_metrics_instrumented", False):
+        return
+    engine._pool_metrics_instrumented = True
+
+    def collect() -> None:
+        status = pool_status(engine)
+        if "size" in status:
+            DB_POOL_SIZE.set(status["size"], pool=pool)
+            DB_POOL_CHECKED_OUT.set(status["checked_out"], pool=pool)
+            DB_POOL_OVERFLOW.set(max(status["overflow"], 0), pool=pool)
+        if "checkouts" in status:
+            DB_POOL_CHECKOUTS.set(status["checkouts"], pool=pool)
+            DB_POOL_TIMEOUTS.set(status["timeouts"], pool=pool)
+            DB_POOL_WAIT.set(status["wait_total_seconds"], pool=pool)
+            DB_POOL_HOLD.set(status["hold_total_seconds"], pool=pool)
+            DB_POOL_WAIT_MAX.set(status["wait_max_seconds"], pool=pool)
+            DB_POOL_HOLD_MAX.set(status["hold_max_seconds"], pool=pool)
+
+    registry.collector(collect)
+
+
+async def _metrics_handler(request: web.Request) -> web.Response:
+    return web.Response(text=registry.render(), content_type="text/plain", charset="utf-8")
+
+
+def add_metrics_route(app: web.Application, path: str = "/metrics") -> None:
+    app.router.add_get(path, _metrics_handler)
+
+
+class MetricsServer:
+    def __init__(self, host: str, port: int) -> None:
+        self.host = host
+        self.port = port
+        self._runner: Optional[web.AppRunner] = None
+
+    async def start(self) -> None:
+        app = web.Application()
+        add_metrics_route(app)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
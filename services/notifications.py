@@ -0,0 +1,104 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Iterable, List, Optional
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError
+import config
+from services.metrics import registry
+from services.send_queue import Priority, send_priority
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATIONS = registry.counter("notifications", "Customer notifications by outcome", ("outcome",))
+NOTIFICATION_QUEUE = registry.gauge("notification_queue_size", "Notifications waiting to be sent")
+
+STATUS_TITLES = {
+    "pending": "ожидает оплаты",
+    "paid": "оплачен",
+    "shipped": "отправлен",
+    "delivered": "доставлен",
+    "cancelled": "отменён",
+    "expired": "отменён: не оплачен вовремя",
+}
+
+
+@dataclass(frozen=True)
+class Notification:
+    chat_id: int
+    text: str
+
+
+def order_status_notification(telegram_id: int, order_id: int, status: str) -> Notification:
+    title = STATUS_TITLES.get(status, status)
+    return Notification(telegram_id, f"📦 Статус вашего заказа <b>#{order_id}</b>: <i>{title}</i>")
+
+
+# Фоновая рассылка: хендлер только ставит пачку в очередь, а ограниченный пул воркеров
+# отправляет её параллельно. Лимиты Telegram соблюдает планировщик отправки бота.
+class NotificationWorker:
+    def __init__(self, concurrency: int = config.NOTIFY_CONCURRENCY) -> None:
+        self.concurrency = concurrency
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._workers: List[asyncio.Task] = []
+        self._bot: Optional[Bot] = None
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    async def start(self, bot: Bot) -> None:
+        self._bot = bot
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+
+    async def stop(self, timeout: float = config.NOTIFY_SHUTDOWN_TIMEOUT) -> None:
+        if self._queue is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Dropping %d unsent notifications on shutdown", self._queue.qsize())
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+
+    def _put_many(self, notifications: List[Notification]) -> None:
+        # Пачку поставили из потока, а до event loop она дошла уже после stop()
+        if self._queue is None:
+            logger.warning("Notification worker stopped, %d notifications dropped", len(notifications))
+            return
+        for notification in notifications:
+            self._queue.put_nowait(notification)
+        NOTIFICATION_QUEUE.set(self._queue.qsize())
+
+    def enqueue(self, notifications: Iterable[Notification]) -> int:
+        # Можно вызывать из потоков пула БД (колбэки on_commit): очередь трогаем только из event loop
+        batch = list(notifications)
+        if self._queue is None:
+            logger.warning("Notification worker is not running, %d notifications dropped", len(batch))
+            return 0
+        self._loop.call_soon_threadsafe(self._put_many, batch)
+        return len(batch)
+
+    async def _work(self) -> None:
+        while True:
+            notification = await self._queue.get()
+            try:
+                with send_priority(Priority.LOW):
+                    await self._bot.send_message(notification.chat_id, notification.text, parse_mode="HTML")
+                NOTIFICATIONS.inc(outcome="sent")
+            except TelegramAPIError as e:
+                # Пользователь заблокировал бота и т.п. — рассылку из-за одного чата не останавливаем
+                NOTIFICATIONS.inc(outcome="failed")
+                logger.info("Notification to %s failed: %s", notification.chat_id, e)
+            except Exception:
+                NOTIFICATIONS.inc(outcome="failed")
+                logger.exception("Notification to %s failed", notification.chat_id)
+            finally:
+                self._queue.task_done()
+                NOTIFICATION_QUEUE.set(self._queue.qsize())
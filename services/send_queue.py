@@ -0,0 +1,223 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional, Tuple
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import Response, TelegramMethod
+import config
+from services.cache import TTLCache
+from services.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+SEND_WAIT = registry.histogram(
+    "telegram_send_wait_seconds", "Time outgoing messages spent waiting for rate-limit tokens", ("priority",)
+)
+SEND_RETRY_AFTER = registry.counter("telegram_retry_after", "429 RetryAfter responses by method", ("method",))
+SEND_COALESCED = registry.counter("telegram_edits_coalesced", "Message edits superseded by a newer edit")
+
+# Лимиты Telegram распространяются только на сообщения; answerCallbackQuery, getUpdates и т.п. идут без очереди
+_LIMITED_PREFIXES = ("send", "edit", "copy", "forward")
+
+
+class Priority(IntEnum):
+    HIGH = 0     # подтверждения заказов и всё, что пользователь ждёт после действия
+    NORMAL = 1
+    LOW = 2      # каталог, поиск, массовые уведомления
+
+
+_priority: ContextVar[Priority] = ContextVar("send_priority", default=Priority.NORMAL)
+
+
+@contextmanager
+def send_priority(priority: Priority) -> Iterator[None]:
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._clock = clock
+        self._updated = clock()
+        self._paused_until = 0.0
+
+    def _refill(self) -> float:
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        return now
+
+    def delay(self) -> float:
+        now = self._refill()
+        if now < self._paused_until:
+            return self._paused_until - now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        self._refill()
+        self.tokens -= 1
+
+    def pause(self, seconds: float) -> None:
+        now = self._refill()
+        self._paused_until = max(self._paused_until, now + seconds)
+        self.tokens = 0
+
+
+@dataclass
+class _ChatLane:
+    bucket: TokenBucket
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+
+@dataclass
+class _PendingEdit:
+    future: "asyncio.Future[Any]"
+    superseded_by: Optional["_PendingEdit"] = None
+
+
+# Планировщик исходящих сообщений поверх сессии бота: токен-бакеты на чат и глобальный,
+# приоритетная очередь за глобальными токенами, обработка RetryAfter и схлопывание правок
+class SendScheduler(BaseRequestMiddleware):
+    def __init__(
+            self,
+            global_rate: float = config.SEND_GLOBAL_RATE,
+            chat_rate: float = config.SEND_CHAT_RATE,
+            chat_burst: float = config.SEND_CHAT_BURST,
+            group_rate: float = config.SEND_GROUP_RATE,
+            max_retries: int = config.SEND_MAX_RETRIES,
+    ) -> None:
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.max_retries = max_retries
+        self._lanes = TTLCache(maxsize=config.SEND_CHAT_LANES, ttl=300)
+        self._waiting: List[Tuple[int, int, "asyncio.Future[None]"]] = []
+        self._sequence = itertools.count()
+        self._granter: Optional[asyncio.Task] = None
+        self._edits: Dict[Hashable, _PendingEdit] = {}
+
+    def _lane(self, chat_id: Any) -> _ChatLane:
+        lane = self._lanes.get(chat_id)
+        if lane is None:
+            # В группах лимит заметно ниже, чем в личных чатах
+            is_group = isinstance(chat_id, str) or (isinstance(chat_id, int) and chat_id < 0)
+            rate = self.group_rate if is_group else self.chat_rate
+            lane = _ChatLane(TokenBucket(rate, self.chat_burst if not is_group else 1))
+            self._lanes.set(chat_id, lane)
+        return lane
+
+    async def _grant_loop(self) -> None:
+        try:
+            while self._waiting:
+                delay = self.global_bucket.delay()
+                if delay:
+                    await asyncio.sleep(delay)
+                    continue
+                _, _, future = heapq.heappop(self._waiting)
+                if future.done():
+                    continue
+                self.global_bucket.take()
+                future.set_result(None)
+        finally:
+            self._granter = None
+
+    async def _global_token(self, priority: Priority) -> None:
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiting, (priority, next(self._sequence), future))
+        if self._granter is None:
+            self._granter = asyncio.create_task(self._grant_loop())
+        await future
+
+    async def __call__(
+            self,
+            make_request: NextRequestMiddlewareType,
+            bot: Bot,
+            method: TelegramMethod,
+    ) -> Response:
+        name = method.__api_method__
+        chat_id = getattr(method, "chat_id", None)
+        if not name.startswith(_LIMITED_PREFIXES) or chat_id is None:
+            return await make_request(bot, method)
+
+        edit: Optional[_PendingEdit] = None
+        edit_key = None
+        message_id = getattr(method, "message_id", None)
+        if name.startswith("edit") and message_id is not None:
+            # Схлопываются только правки одним методом: editMessageReplyMarkup не заменяет текст
+            edit_key = (chat_id, message_id, name)
+            edit = _PendingEdit(asyncio.get_running_loop().create_future())
+            previous = self._edits.get(edit_key)
+            if previous is not None:
+                previous.superseded_by = edit
+            self._edits[edit_key] = edit
+
+        try:
+            result = await self._send(make_request, bot, method, chat_id, edit)
+        except asyncio.CancelledError:
+            if edit is not None:
+                edit.future.cancel()
+            raise
+        except Exception as e:
+            if edit is not None and not edit.future.done():
+                edit.future.set_exception(e)
+                edit.future.exception()  # помечаем как полученное, чтобы asyncio не ругался
+            raise
+        finally:
+            if edit is not None and self._edits.get(edit_key) is edit:
+                del self._edits[edit_key]
+        if edit is not None and not edit.future.done():
+            edit.future.set_result(result)
+        return result
+
+    async def _send(
+            self,
+            make_request: NextRequestMiddlewareType,
+            bot: Bot,
+            method: TelegramMethod,
+            chat_id: Any,
+            edit: Optional[_PendingEdit],
+    ) -> Response:
+        priority = _priority.get()
+        lane = self._lane(chat_id)
+        started = time.perf_counter()
+        attempt = 0
+        async with lane.lock:
+            while True:
+                delay = lane.bucket.delay()
+                if delay:
+                    await asyncio.sleep(delay)
+                    continue
+                # Пока ждали очереди, пришла более свежая правка того же сообщения: отправит она
+                if edit is not None and edit.superseded_by is not None:
+                    break
+                await self._global_token(priority)
+                lane.bucket.take()
+                if attempt == 0:
+                    SEND_WAIT.observe(time.perf_counter() - started, priority=priority.name.lower())
+                try:
+                    return await make_request(bot, method)
+                except TelegramRetryAfter as e:
+                    attempt += 1
+                    SEND_RETRY_AFTER.inc(method=method.__api_method__)
+                    if attempt > self.max_retries:
+                        raise
+                    logger.warning("Flood control in chat %s, retry in %s s", chat_id, e.retry_after)
+                    lane.bucket.pause(e.retry_after)
+        # Ждём результат новой правки уже без блокировки чата, иначе она не сможет отправиться
+        SEND_COALESCED.inc()
+        return await edit.superseded_by.future
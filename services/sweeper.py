@@ -0,0 +1,90 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy.orm import sessionmaker
+import config
+from database import expiry
+from database.db import SessionLocal, run_in_db
+from database.stock import commit_with_retry
+from services.catalog_cache import catalog_cache
+from services.metrics import registry
+from services.notifications import NotificationWorker, order_status_notification
+
+logger = logging.getLogger(__name__)
+
+EXPIRED_ORDERS = registry.counter("expired_orders", "Pending orders expired by the sweeper")
+RESTOCKED_UNITS = registry.counter("restocked_units", "Product units returned to stock from expired orders")
+EXPIRY_RUN_DURATION = registry.histogram(
+    "order_expiry_run_duration_seconds", "Duration of one order expiry run", buckets=(0.01, 0.1, 1, 10, 60)
+)
+
+
+# Периодически снимает неоплаченные заказы старше TTL и возвращает их товары на склад.
+# Как и архивация, работает пачками: каждая — отдельная транзакция в своей сессии.
+class OrderSweeper:
+    def __init__(
+            self,
+            interval: float = config.ORDER_EXPIRY_INTERVAL,
+            ttl: float = config.ORDER_EXPIRY_TTL,
+            batch_size: int = config.ORDER_EXPIRY_BATCH_SIZE,
+            pause: float = config.ORDER_EXPIRY_BATCH_PAUSE,
+            session_factory: sessionmaker = SessionLocal,
+            notifier: Optional[NotificationWorker] = None,
+    ) -> None:
+        self.interval = interval
+        self.ttl = ttl
+        self.batch_size = batch_size
+        self.pause = pause
+        self.session_factory = session_factory
+        self.notifier = notifier
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if self.interval > 0:
+            self._task = asyncio.create_task(self._schedule())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def run_once(self) -> int:
+        before = datetime.utcnow() - timedelta(seconds=self.ttl)
+        started = asyncio.get_running_loop().time()
+        orders = units = 0
+        while True:
+            batch = await run_in_db(self._expire_batch, before)
+            orders += len(batch.orders)
+            units += batch.units
+            EXPIRED_ORDERS.inc(len(batch.orders))
+            RESTOCKED_UNITS.inc(batch.units)
+            if len(batch.orders) < self.batch_size:
+                break
+            await asyncio.sleep(self.pause)
+        EXPIRY_RUN_DURATION.observe(asyncio.get_running_loop().time() - started)
+        if orders:
+            logger.info("Expired %d pending orders older than %s, restocked %d units", orders, before, units)
+        return orders
+
+    def _expire_batch(self, before: datetime) -> expiry.ExpiredBatch:
+        with self.session_factory() as db:
+            batch = commit_with_retry(db, expiry.expire_orders, before, self.batch_size)
+        # Остатки изменены UPDATE в обход ORM, поэтому страницы категорий сбрасываем явно
+        for category_id in batch.category_ids:
+            catalog_cache.invalidate_category(category_id)
+        if self.notifier is not None and batch.orders:
+            self.notifier.enqueue(
+                order_status_notification(telegram_id, order_id, "expired") for order_id, telegram_id in batch.orders
+            )
+        return batch
+
+    async def _schedule(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Order expiry failed")
@@ -0,0 +1,92 @@
+from dataclasses import dataclass
+from typing import Optional
+from sqlalchemy.orm import Session
+import config
+from database import crud
+from database.db import on_commit, run_in_db
+from database.models import User
+from services.cache import TTLCache
+
+
+@dataclass(frozen=True)
+class UserProfile:
+    id: int
+    telegram_id: int
+    username: Optional[str]
+    full_name: Optional[str]
+    is_admin: bool
+
+    @classmethod
+    def from_model(cls, user: User) -> "UserProfile":
+        return cls(user.id, user.telegram_id, user.username, user.full_name, bool(user.is_admin))
+
+
+# Кэш пользователей по telegram_id. В кэш попадают только закоммиченные данные:
+# новые и изменённые профили публикуются через on_commit.
+class UserCache:
+    def __init__(self, maxsize: int = config.USER_CACHE_SIZE, ttl: float = config.USER_CACHE_TTL) -> None:
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, telegram_id: int) -> Optional[UserProfile]:
+        return self._entries.get(telegram_id)
+
+    def put(self, profile: UserProfile) -> UserProfile:
+        self._entries.set(profile.telegram_id, profile)
+        return profile
+
+    def invalidate(self, telegram_id: int) -> None:
+        self._entries.pop(telegram_id)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def prime(self, db: Session, limit: int = config.WARMUP_USERS) -> int:
+        # Прогрев после рестарта: недавние покупатели, скорее всего, и напишут первыми
+        users = crud.get_recent_buyers(db, limit)
+        for user in users:
+            self.put(UserProfile.from_model(user))
+        return len(users)
+
+    def _fresh(self, telegram_id: int, username: Optional[str], full_name: Optional[str]) -> Optional[UserProfile]:
+        profile = self.get(telegram_id)
+        if profile and profile.username == username and profile.full_name == full_name:
+            return profile
+        return None
+
+    def resolve(self, db: Session, telegram_id: int, username: Optional[str], full_name: Optional[str]) -> UserProfile:
+        # Синхронный вариант для кода, который уже работает в пуле потоков БД
+        profile = self._fresh(telegram_id, username, full_name)
+        if profile:
+            return profile
+        profile = UserProfile.from_model(crud.get_or_create_user(db, telegram_id, username, full_name))
+        on_commit(db, lambda: self.put(profile))
+        return profile
+
+    def _resolve_and_commit(
+            self, db: Session, telegram_id: int, username: Optional[str], full_name: Optional[str]
+    ) -> UserProfile:
+        profile = self.resolve(db, telegram_id, username, full_name)
+        db.commit()
+        return profile
+
+    async def ensure(
+            self, db: Session, telegram_id: int, username: Optional[str], full_name: Optional[str],
+            commit: bool = False,
+    ) -> UserProfile:
+        profile = self._fresh(telegram_id, username, full_name)
+        if profile:
+            return profile
+        resolve = self._resolve_and_commit if commit else self.resolve
+        return await run_in_db(resolve, db, telegram_id, username, full_name)
+
+    async def lookup(self, db: Session, telegram_id: int) -> Optional[UserProfile]:
+        profile = self.get(telegram_id)
+        if profile:
+            return profile
+        user = await run_in_db(crud.get_user_by_telegram_id, db, telegram_id)
+        if user is None:
+            return None
+        return self.put(UserProfile.from_model(user))
+
+
+user_cache = UserCache()
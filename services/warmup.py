@@ -0,0 +1,100 @@
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from sqlalchemy.orm import Session, sessionmaker
+import config
+from database.db import run_in_db
+from services.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+STARTUP_PHASE_SECONDS = registry.gauge("bot_startup_phase_seconds", "Duration of startup phases", ("phase",))
+
+
+# Отчёт о старте: длительность фаз (сборка приложения, миграции, прогрев) и время до готовности.
+# Пишется в лог одной строкой и в метрики, чтобы рестарты при деплое было видно на графиках.
+class StartupReport:
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+
+    def record(self, name: str, seconds: float, count: Optional[int] = None) -> None:
+        self.phases[name] = seconds
+        if count is not None:
+            self.counts[name] = count
+        STARTUP_PHASE_SECONDS.set(seconds, phase=name)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def mark(self, name: str) -> None:
+        # Время от начала сборки приложения
+        self.record(name, time.perf_counter() - self.started)
+
+    def summary(self) -> str:
+        parts = []
+        for name, seconds in self.phases.items():
+            count = f" ({self.counts[name]})" if name in self.counts else ""
+            parts.append(f"{name}={seconds * 1000:.0f}ms{count}")
+        return " ".join(parts)
+
+    def log(self, stage: str) -> None:
+        logger.info("Startup %s: %s", stage, self.summary())
+
+
+# Прогрев после рестарта: шаги (sync-функции от сессии, возвращают число прогретых записей)
+# выполняются по очереди в пуле потоков БД. Кэши приложения заполняются сразу, а запросы
+# заодно поднимают страницы SQLite в кэш ОС (и mmap), так что первые апдейты не ждут диска.
+class Warmup:
+    def __init__(
+            self,
+            session_factory: sessionmaker,
+            report: StartupReport,
+            wait: float = config.WARMUP_WAIT,
+    ) -> None:
+        self.session_factory = session_factory
+        self.report = report
+        self.wait = wait
+        self.steps: List[Tuple[str, Callable[[Session], int]]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def add(self, name: str, step: Callable[[Session], int]) -> None:
+        self.steps.append((name, step))
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+        if self.wait > 0:
+            # Не дождались — прогрев продолжается в фоне, бот уже принимает апдейты
+            await asyncio.wait({self._task}, timeout=self.wait)
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    def _call(self, step: Callable[[Session], int]) -> int:
+        with self.session_factory() as db:
+            return step(db)
+
+    async def _run(self) -> None:
+        started = time.perf_counter()
+        for name, step in self.steps:
+            step_started = time.perf_counter()
+            try:
+                count = await run_in_db(self._call, step)
+            except Exception:
+                logger.exception("Warmup step %s failed", name)
+                continue
+            self.report.record(f"warmup.{name}", time.perf_counter() - step_started, count)
+        self.report.record("warmup", time.perf_counter() - started)
+        self.report.log("warmup")
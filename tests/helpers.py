@@ -0,0 +1,37 @@
+from contextlib import contextmanager
+from typing import Iterator, List
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryCounter:
+    def __init__(self) -> None:
+        self.statements: List[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        self.statements.append(statement)
+
+
+@contextmanager
+def count_queries(engine: Engine) -> Iterator[QueryCounter]:
+    counter = QueryCounter()
+    event.listen(engine, "before_cursor_execute", counter)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", counter)
+
+
+class QueryCountMixin:
+    @contextmanager
+    def assertMaxQueries(self, engine: Engine, limit: int) -> Iterator[QueryCounter]:
+        with count_queries(engine) as counter:
+            yield counter
+        if counter.count > limit:
+            self.fail(
+                f"Expected at most {limit} queries, got {counter.count}:\n" + "\n".join(counter.statements)
+            )
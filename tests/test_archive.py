@@ -0,0 +1,151 @@
+import unittest
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from database import migrations, sales
+from database.archive import archive_orders
+from database.crud import (
+    add_items_to_order,
+    create_category,
+    create_order,
+    create_product,
+    get_or_create_user,
+    get_order_details,
+    get_order_totals,
+    get_orders_by_user,
+    update_order_statuses,
+)
+from database.models import ArchivedOrder, ArchivedOrderItem, DailySales, Order, OrderItem
+from services.archiver import OrderArchiver
+
+
+class ArchiveTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.engine = create_engine(
+            "sqlite://", future=True, poolclass=StaticPool, connect_args={"check_same_thread": False}
+        )
+        migrations.upgrade(self.engine)
+        self.factory = sessionmaker(bind=self.engine, autoflush=False, expire_on_commit=False)
+        self.db = self.factory()
+        self.user = get_or_create_user(self.db, 1, "buyer", "Buyer")
+        category = create_category(self.db, "Книги")
+        self.book = create_product(self.db, "Книга", "", 10.0, 1000, category.id)
+        self.now = datetime.utcnow()
+
+    def tearDown(self) -> None:
+        self.db.close()
+        self.engine.dispose()
+
+    def _order(self, days_ago: int, status: str, quantity: int = 1) -> int:
+        order = create_order(self.db, self.user.id)
+        order.created_at = self.now - timedelta(days=days_ago)
+        self.db.flush()
+        add_items_to_order(self.db, order.id, {self.book.id: quantity})
+        update_order_statuses(self.db, [order.id], status)
+        self.db.commit()
+        return order.id
+
+
+class TestArchiveOrders(ArchiveTestCase):
+    def test_moves_only_old_terminal_orders(self) -> None:
+        old_done = self._order(400, "delivered", 2)
+        old_cancelled = self._order(300, "cancelled")
+        old_pending = self._order(300, "pending")
+        recent_done = self._order(1, "delivered")
+        newest = self._order(0, "pending")
+
+        ids = archive_orders(self.db, self.now - timedelta(days=180), ("delivered", "cancelled"), limit=10)
+        self.db.commit()
+
+        self.assertEqual(ids, [old_done, old_cancelled])
+        self.assertEqual(
+            sorted(order_id for order_id, in self.db.query(Order.id)), [old_pending, recent_done, newest]
+        )
+        self.assertEqual(self.db.query(OrderItem).filter(OrderItem.order_id.in_(ids)).count(), 0)
+        archived = self.db.get(ArchivedOrder, old_done)
+        self.assertEqual((archived.status, archived.user_id), ("delivered", self.user.id))
+        self.assertEqual([(i.product_id, i.quantity, i.unit_price) for i in archived.items], [(self.book.id, 2, 10.0)])
+
+    def test_batches_resume_after_cursor(self) -> None:
+        ids = [self._order(200, "delivered") for _ in range(5)]
+        self._order(0, "pending")
+        before = self.now - timedelta(days=100)
+
+        first = archive_orders(self.db, before, ("delivered",), limit=2)
+        second = archive_orders(self.db, before, ("delivered",), limit=2, after_id=first[-1])
+        rest = archive_orders(self.db, before, ("delivered",), limit=2, after_id=second[-1])
+        self.assertEqual(first + second + rest, ids)
+        self.assertEqual(archive_orders(self.db, before, ("delivered",), limit=2), [])
+
+    def test_newest_order_is_never_archived(self) -> None:
+        # Иначе SQLite выдал бы следующему заказу тот же id, что уже лежит в архиве
+        only = self._order(400, "delivered")
+        self.assertEqual(archive_orders(self.db, self.now, ("delivered",), limit=10), [])
+        self.assertIsNotNone(self.db.get(Order, only))
+
+    def test_rollup_survives_archival_and_rebuild(self) -> None:
+        self._order(400, "delivered", 3)
+        self._order(400, "cancelled", 5)
+        self._order(0, "paid", 1)
+        before = sorted((r.day, r.quantity, r.revenue) for r in self.db.query(DailySales))
+
+        archive_orders(self.db, self.now - timedelta(days=180), ("delivered", "cancelled"), limit=10)
+        self.db.commit()
+        self.assertEqual(sorted((r.day, r.quantity, r.revenue) for r in self.db.query(DailySales)), before)
+
+        sales.rebuild_daily_sales(self.db.connection())
+        rebuilt = sorted((r.day, r.quantity, r.revenue) for r in self.db.query(DailySales) if r.quantity)
+        self.assertEqual(rebuilt, [row for row in before if row[1]])
+
+
+class TestArchiveFallthrough(ArchiveTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.old = self._order(400, "delivered", 3)
+        self.old_pending = self._order(500, "pending")
+        self.recent = self._order(0, "paid", 1)
+        archive_orders(self.db, self.now - timedelta(days=180), ("delivered",), limit=10)
+        self.db.commit()
+        self.db.expunge_all()
+
+    def test_order_details_fall_through_to_archive(self) -> None:
+        order, total = get_order_details(self.db, self.old)
+        self.assertIsInstance(order, ArchivedOrder)
+        self.assertEqual(total, 30.0)
+        self.assertEqual(order.items[0].product.name, "Книга")
+        order, total = get_order_details(self.db, self.recent)
+        self.assertIsInstance(order, Order)
+        self.assertEqual(total, 10.0)
+
+    def test_user_history_merges_archive_by_date(self) -> None:
+        orders = get_orders_by_user(self.db, self.user.id)
+        self.assertEqual([o.id for o in orders], [self.recent, self.old, self.old_pending])
+        self.assertEqual([o.id for o in get_orders_by_user(self.db, self.user.id, include_archived=False)],
+                         [self.recent, self.old_pending])
+        self.assertEqual(get_order_totals(self.db, [o.id for o in orders]),
+                         {self.recent: 10.0, self.old: 30.0, self.old_pending: 10.0})
+
+    def test_archived_orders_are_read_only_for_status_updates(self) -> None:
+        self.assertEqual(update_order_statuses(self.db, [self.old], "cancelled"), ([], [self.old], []))
+
+
+class TestOrderArchiver(ArchiveTestCase, unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        ArchiveTestCase.setUp(self)
+
+    async def test_run_once_archives_in_batches(self) -> None:
+        ids = [self._order(200, "delivered") for _ in range(5)]
+        self._order(0, "pending")
+        archiver = OrderArchiver(interval=0, after_days=100, batch_size=2, pause=0, session_factory=self.factory)
+
+        self.assertEqual(await archiver.run_once(), 5)
+        self.assertEqual(sorted(order_id for order_id, in self.db.query(ArchivedOrder.id)), ids)
+        self.assertEqual(self.db.query(ArchivedOrderItem).count(), 5)
+        self.assertEqual(await archiver.run_once(), 0)
+        # Явный возраст из команды перекрывает настройку
+        self.assertEqual(await archiver.run_once(after_days=1000), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import json
+import os
+import tempfile
+import unittest
+from benchmarks import callbacks
+from benchmarks.runner import compare, main
+from benchmarks.stats import percentile
+from benchmarks.seed import Scale
+
+
+class TestBenchmarkRunner(unittest.TestCase):
+    def test_tiny_run_writes_json_report(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            output = os.path.join(tmpdir, "report.json")
+            code = main([
+                "--users", "5", "--categories", "2", "--products", "10", "--orders", "10",
+                "--iterations", "3", "--warmup", "1", "--output", output,
+            ])
+            self.assertEqual(code, 0)
+            with open(output, encoding="utf-8") as fh:
+                report = json.load(fh)
+
+            self.assertEqual(report["meta"]["scale"], Scale(5, 2, 10, 10).as_dict())
+            for name in ("crud.get_products", "crud.get_orders_by_user", "crud.get_order_details",
+                         "crud.add_item_to_order", "handler./start", "handler.show_cat", "handler.buy"):
+                self.assertEqual(report["results"][name]["ops"], 3)
+                self.assertGreater(report["results"][name]["ops_per_sec"], 0)
+
+            # Сравнение с самим собой — регрессий нет
+            self.assertEqual(main([
+                "--users", "5", "--categories", "2", "--products", "10", "--orders", "10",
+                "--iterations", "3", "--warmup", "1", "--output", output + ".2",
+                "--baseline", output, "--tolerance", "100",
+            ]), 0)
+
+    def test_compare_flags_drops_beyond_tolerance(self) -> None:
+        baseline = {"results": {"a": {"ops_per_sec": 100.0}, "b": {"ops_per_sec": 100.0}}}
+        report = {"results": {"a": {"ops_per_sec": 70.0}, "b": {"ops_per_sec": 90.0}, "c": {"ops_per_sec": 1.0}}}
+        regressions = compare(report, baseline, tolerance=0.2)
+        self.assertEqual(len(regressions), 1)
+        self.assertTrue(regressions[0].startswith("a:"))
+
+    def test_callback_dispatch_cost_does_not_grow_with_routes(self) -> None:
+        report = callbacks.run([1, 100], batches=3)
+        for name in ("filters[1]", "filters[100]", "table[1]", "table[100]"):
+            self.assertEqual(report["results"][f"callback.{name}"]["ops"], 300)
+        # Цепочка фильтров дорожает в десятки раз, таблица — нет
+        self.assertLess(report["growth"]["table"], 3)
+        self.assertGreater(report["growth"]["filters"], report["growth"]["table"] * 3)
+
+    def test_percentile_nearest_rank(self) -> None:
+        samples = [float(i) for i in range(1, 101)]
+        self.assertEqual(percentile(samples, 50), 50.0)
+        self.assertEqual(percentile(samples, 99), 99.0)
+        self.assertEqual(percentile([5.0], 90), 5.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
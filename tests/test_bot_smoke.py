@@ -1,7 +1,11 @@
+import os
+import subprocess
+import sys
+import tempfile
 import unittest
 from aiogram import Bot, Dispatcher
 import config
-from bot import dp, bot as telegram_bot
+from bot import create_app
 
 
 class TestBotInitialization(unittest.TestCase):
@@ -10,11 +14,30 @@ class TestBotInitialization(unittest.TestCase):
         self.assertNotEqual(config.TOKEN, "ENTER_YOUR_TOKEN_HERE")
 
     def test_dispatcher_instance(self) -> None:
+        _, dp = create_app()
         self.assertIsInstance(dp, Dispatcher)
 
     def test_bot_instance(self) -> None:
+        telegram_bot, _ = create_app()
         self.assertIsInstance(telegram_bot, Bot)
 
+    def test_app_is_built_once(self) -> None:
+        self.assertIs(create_app(), create_app())
+
+    def test_notifier_stops_after_its_producers(self) -> None:
+        _, dp = create_app()
+        owners = [type(getattr(h.callback, "__self__", None)).__name__ for h in dp.shutdown.handlers]
+        self.assertLess(owners.index("OrderSweeper"), owners.index("NotificationWorker"))
+        self.assertLess(owners.index("OrderArchiver"), owners.index("NotificationWorker"))
+
+    def test_building_app_does_not_touch_database(self) -> None:
+        # Миграции — на старте Dispatcher, а не при импорте: файл БД ещё не должен появиться
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "shop.db")
+            env = dict(os.environ, DATABASE_URL=f"sqlite:///{path}", METRICS_PORT="0")
+            subprocess.run([sys.executable, "-c", "import bot; bot.create_app()"], env=env, check=True, timeout=60)
+            self.assertFalse(os.path.exists(path))
+
 
 if __name__ == "__main__":
     unittest.main()
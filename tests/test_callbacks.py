@@ -0,0 +1,147 @@
+import unittest
+from typing import NamedTuple
+from aiogram import Bot, Dispatcher, Router
+from aiogram.types import CallbackQuery, Update
+from benchmarks.runner import NullSession
+from handlers import user_handlers
+from services.callbacks import CallbackCodec, CallbackTable, callback_name
+
+
+class Page(NamedTuple):
+    item_id: int
+    cursor: str = ""
+    size: int = 10
+
+
+PAGE = CallbackCodec("test_page", "tp", Page, legacy=r"testpage_(\d+)(?:_([np]\d+))?")
+
+
+class RecordingSession(NullSession):
+    def __init__(self) -> None:
+        super().__init__()
+        self.calls = []
+
+    async def make_request(self, bot, method, timeout=None):
+        self.calls.append(method)
+        return await super().make_request(bot, method, timeout)
+
+
+def _callback(data: str, bot: Bot = None) -> CallbackQuery:
+    return CallbackQuery.model_validate(
+        {"id": "7", "from": {"id": 1, "is_bot": False, "first_name": "A"}, "chat_instance": "1", "data": data},
+        context={"bot": bot},
+    )
+
+
+class TestCallbackCodec(unittest.TestCase):
+    def test_pack_omits_trailing_defaults(self) -> None:
+        self.assertEqual(PAGE.pack(5), "tp1:5")
+        self.assertEqual(PAGE.pack(5, "n9"), "tp1:5:n9")
+        self.assertEqual(PAGE.pack(5, size=20), "tp1:5::20")
+
+    def test_unpack_round_trip_and_types(self) -> None:
+        for page in (Page(5), Page(5, "n9"), Page(5, "", 20)):
+            self.assertEqual(PAGE.unpack(PAGE.pack(*page)), page)
+        self.assertIsInstance(PAGE.unpack("tp1:5").item_id, int)
+
+    def test_unpack_rejects_malformed(self) -> None:
+        for data in ("tp1", "tp1:x", "tp1:1:n:2:3", "tp2:1", "zz1:1"):
+            with self.assertRaises(ValueError):
+                PAGE.unpack(data)
+
+    def test_pack_rejects_separator_and_long_data(self) -> None:
+        with self.assertRaises(ValueError):
+            PAGE.pack(1, "a:b")
+        with self.assertRaises(ValueError):
+            PAGE.pack(1, "x" * 64)
+
+    def test_legacy_format(self) -> None:
+        self.assertEqual(PAGE.unpack_legacy("testpage_3"), Page(3))
+        self.assertEqual(PAGE.unpack_legacy("testpage_3_p15"), Page(3, "p15"))
+        with self.assertRaises(ValueError):
+            PAGE.unpack_legacy("testpage_3_x")
+
+    def test_callback_name_for_metrics(self) -> None:
+        self.assertEqual(callback_name("tp1:5"), "test_page")
+        self.assertEqual(callback_name("testpage_5"), "test_page")
+        self.assertEqual(callback_name(user_handlers.BUY.pack(7)), "buy")
+        self.assertIsNone(callback_name("unknown_1"))
+
+
+class TestCallbackTable(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.table = CallbackTable()
+        self.seen = []
+
+        @self.table(PAGE)
+        async def on_page(callback: CallbackQuery, page: Page, db) -> str:
+            self.seen.append((page, db))
+            return "page"
+
+    async def test_dispatch_parses_once_and_passes_only_declared_data(self) -> None:
+        result = await self.table.dispatch(_callback("tp1:4:n8"), db="db", read_db="read", bot=None)
+        self.assertEqual(result, "page")
+        self.assertEqual(self.seen, [(Page(4, "n8"), "db")])
+        await self.table.dispatch(_callback("testpage_4"), db="db")
+        self.assertEqual(self.seen[-1], (Page(4), "db"))
+
+    async def test_unknown_data_is_not_ours(self) -> None:
+        self.assertIsNone(self.table.resolve("b9:1"))
+        self.assertIsNone(self.table.resolve(None))
+        self.assertIsNone(await self.table.dispatch(_callback("other")))
+
+    async def test_malformed_data_answers_alert(self) -> None:
+        bot = Bot(token="123456:ABCdef", session=RecordingSession())
+        await self.table.dispatch(_callback("tp1:oops", bot), db="db")
+        self.assertEqual(self.seen, [])
+        (method,) = bot.session.calls
+        self.assertEqual(method.callback_query_id, "7")
+        self.assertTrue(method.show_alert)
+
+    def test_duplicate_registration_fails(self) -> None:
+        with self.assertRaises(ValueError):
+            self.table.register(PAGE, lambda callback, page: None)
+
+    async def test_router_falls_through_for_foreign_callbacks(self) -> None:
+        router = Router()
+        self.table.attach(router)
+        fallback = []
+
+        @router.callback_query()
+        async def other(callback: CallbackQuery) -> None:
+            fallback.append(callback.data)
+
+        dp = Dispatcher()
+        dp.include_router(router)
+        bot = Bot(token="123456:ABCdef", session=NullSession())
+        for update_id, data in enumerate(("tp1:1", "foreign_1")):
+            update = Update.model_validate({"update_id": update_id, "callback_query": {
+                "id": "1", "from": {"id": 1, "is_bot": False, "first_name": "A"}, "chat_instance": "1", "data": data,
+            }})
+            await dp.feed_update(bot, update, db="db")
+        self.assertEqual(self.seen, [(Page(1), "db")])
+        self.assertEqual(fallback, ["foreign_1"])
+
+
+class TestUserCallbacks(unittest.TestCase):
+    def test_buttons_use_compact_format(self) -> None:
+        self.assertEqual(user_handlers.BUY.pack(7), "b1:7")
+        self.assertEqual(user_handlers.SHOW_CATEGORY.pack(3, "n15"), "c1:3:n15")
+        self.assertEqual(user_handlers.CART.pack("inc", 5), "k1:inc:5")
+        self.assertEqual(user_handlers.SEARCH.pack("ab12cd", 0), "s1:ab12cd")
+
+    def test_buttons_from_old_messages_still_resolve(self) -> None:
+        table = user_handlers.callbacks
+        for data, payload in (
+                ("buy_7_1", user_handlers.AddToCart(7, 1)),
+                ("show_cat_3_n15", user_handlers.CategoryPage(3, "n15")),
+                ("cart_checkout", user_handlers.CartAction("checkout")),
+                ("cart_del_5", user_handlers.CartAction("del", 5)),
+                ("search_ab12cd_10", user_handlers.SearchPage("ab12cd", 10)),
+        ):
+            route, parsed = table.resolve(data)
+            self.assertEqual(parsed, payload)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+from unittest import mock
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from database import migrations
+from database.crud import create_category, create_product, get_cart_items
+from database.models import Order, OrderItem, Product
+from handlers import user_handlers
+from services.cart import CartStore
+from services.user_cache import user_cache
+
+
+class TestCartStore(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.engine = create_engine(
+            "sqlite://", future=True, poolclass=StaticPool, connect_args={"check_same_thread": False}
+        )
+        migrations.upgrade(self.engine)
+        self.factory = sessionmaker(bind=self.engine, autoflush=False, expire_on_commit=False)
+        with self.factory() as db:
+            cat = create_category(db, "Книги")
+            self.product_ids = [create_product(db, f"Книга {i}", "", 10.0 + i, 5, cat.id).id for i in range(3)]
+            db.commit()
+
+    def tearDown(self) -> None:
+        user_cache.clear()
+        self.engine.dispose()
+
+    async def test_quantities_are_merged_and_limited(self) -> None:
+        store = CartStore(maxsize=10, ttl=60, persist=False, max_items=2, max_quantity=3)
+        with self.factory() as db:
+            await store.add(db, 1, self.product_ids[0])
+            cart = await store.add(db, 1, self.product_ids[0], 5)
+            self.assertEqual(cart, {self.product_ids[0]: 3})
+            await store.add(db, 1, self.product_ids[1])
+            with self.assertRaises(ValueError):
+                await store.add(db, 1, self.product_ids[2])
+            cart = await store.set_quantity(db, 1, self.product_ids[0], 0)
+            self.assertEqual(cart, {self.product_ids[1]: 1})
+            self.assertEqual(await store.load(db, 2), {})
+
+    async def test_persistent_cart_survives_eviction(self) -> None:
+        store = CartStore(maxsize=10, ttl=60, persist=True)
+        with self.factory() as db:
+            await store.add(db, 1, self.product_ids[0], 2)
+            await store.add(db, 1, self.product_ids[1])
+            self.assertFalse(db.in_transaction())
+        store.reset()
+        with self.factory() as db:
+            self.assertEqual(await store.load(db, 1), {self.product_ids[0]: 2, self.product_ids[1]: 1})
+            await store.clear(db, 1)
+            self.assertEqual(get_cart_items(db, 1), {})
+
+    async def test_checkout_creates_one_order_and_clears_cart(self) -> None:
+        store = CartStore(maxsize=10, ttl=60, persist=True)
+        with self.factory() as db:
+            await store.add(db, 1, self.product_ids[0], 2)
+            await store.add(db, 1, self.product_ids[2])
+            items = await store.load(db, 1)
+            with mock.patch.object(user_handlers, "cart_store", store):
+                order, total = user_handlers._checkout(db, 1, "reader", "Reader", items)
+            self.assertEqual(total, 2 * 10.0 + 12.0)
+            self.assertEqual(get_cart_items(db, 1), {})
+            self.assertEqual(db.query(Order).count(), 1)
+            self.assertEqual(db.query(OrderItem).count(), 2)
+            self.assertEqual(db.query(Product.quantity).filter(Product.id == self.product_ids[0]).scalar(), 3)
+
+    async def test_repeated_checkout_with_same_key_returns_existing_order(self) -> None:
+        items = {self.product_ids[0]: 2}
+        with self.factory() as db:
+            first, _ = user_handlers._checkout(db, 1, "reader", "Reader", items, "checkout:1:abc")
+            again, total = user_handlers._checkout(db, 1, "reader", "Reader", items, "checkout:1:abc")
+            self.assertEqual(again.id, first.id)
+            self.assertEqual(total, 20.0)
+            self.assertEqual(db.query(Order).count(), 1)
+            self.assertEqual(db.query(Product.quantity).filter(Product.id == self.product_ids[0]).scalar(), 3)
+
+    async def test_checkout_with_insufficient_stock_changes_nothing(self) -> None:
+        items = {self.product_ids[0]: 1, self.product_ids[1]: 50}
+        with self.factory() as db:
+            with self.assertRaises(ValueError):
+                user_handlers._checkout(db, 1, "reader", "Reader", items)
+            self.assertEqual(db.query(Order).count(), 0)
+            self.assertEqual(db.query(Product.quantity).filter(Product.id == self.product_ids[0]).scalar(), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import unittest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from database.models import Base, Product
+from database.crud import create_category, create_product, update_product, delete_product
+from handlers.user_handlers import _render_category
+from services.cache import MISSING, TTLCache
+from services.catalog_cache import CATEGORIES, catalog_cache
+
+
+class FakeTimer:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestTTLCache(unittest.TestCase):
+    def test_expires_after_ttl(self) -> None:
+        timer = FakeTimer()
+        cache = TTLCache(maxsize=10, ttl=5, timer=timer)
+        cache.set("a", 1)
+        timer.now = 4.9
+        self.assertEqual(cache.get("a"), 1)
+        timer.now = 5.0
+        self.assertIsNone(cache.get("a"))
+
+    def test_evicts_least_recently_used(self) -> None:
+        cache = TTLCache(maxsize=2, ttl=None)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+        self.assertIn("c", cache)
+
+
+class TestCatalogCacheInvalidation(unittest.TestCase):
+    def setUp(self) -> None:
+        catalog_cache.invalidate_all()
+        self.engine = create_engine("sqlite:///:memory:", echo=False, future=True)
+        Base.metadata.create_all(bind=self.engine)
+        self.db = Session(self.engine)
+        self.electronics = create_category(self.db, "Electronics")
+        self.books = create_category(self.db, "Books")
+        self.laptop = create_product(self.db, "Laptop", "", 1000.0, 5, self.electronics.id)
+        self.db.commit()
+        self._fill()
+
+    def tearDown(self) -> None:
+        self.db.close()
+        self.engine.dispose()
+        catalog_cache.invalidate_all()
+
+    def _fill(self) -> None:
+        for category_id in (CATEGORIES, self.electronics.id, self.books.id):
+            key = ("page", category_id)
+            catalog_cache.put(key, catalog_cache.version(category_id), "rendered")
+
+    def _cached(self, category_id) -> bool:
+        return catalog_cache.get(("page", category_id)) is not MISSING
+
+    def test_create_category_invalidates_list_after_commit(self) -> None:
+        create_category(self.db, "Games")
+        self.assertTrue(self._cached(CATEGORIES))
+        self.db.commit()
+        self.assertFalse(self._cached(CATEGORIES))
+        self.assertTrue(self._cached(self.electronics.id))
+
+    def test_product_update_invalidates_old_and_new_category(self) -> None:
+        update_product(self.db, self.laptop.id, category_id=self.books.id)
+        self.db.commit()
+        self.assertFalse(self._cached(self.electronics.id))
+        self.assertFalse(self._cached(self.books.id))
+        self.assertTrue(self._cached(CATEGORIES))
+
+    def test_delete_product_invalidates_its_category_only(self) -> None:
+        delete_product(self.db, self.laptop.id)
+        self.db.commit()
+        self.assertFalse(self._cached(self.electronics.id))
+        self.assertTrue(self._cached(self.books.id))
+
+    def test_rollback_keeps_cache(self) -> None:
+        create_product(self.db, "Novel", "", 10.0, 1, self.books.id)
+        self.db.rollback()
+        self.assertTrue(self._cached(self.books.id))
+
+    def test_stale_put_is_dropped(self) -> None:
+        version = catalog_cache.version(self.books.id)
+        catalog_cache.invalidate_category(self.books.id)
+        catalog_cache.put(("page", self.books.id), version, "stale")
+        self.assertFalse(self._cached(self.books.id))
+
+
+
+class TestRenderCategory(unittest.TestCase):
+    def test_product_names_are_escaped(self) -> None:
+        product = Product(id=7, name="Чай <Эрл Грей> & мята", price=5.0, quantity=3)
+        text, keyboard = _render_category(1, [product], has_prev=False, has_next=False)
+        self.assertIn("7. Чай &lt;Эрл Грей&gt; &amp; мята — 5.00₽", text)
+        # Текст кнопки не разбирается как HTML
+        self.assertEqual(keyboard.inline_keyboard[0][0].text, "🛒 Чай <Эрл Грей> & мята")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import csv
+import io
+import unittest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from database.models import Base, Category, Product
+from database.crud import create_category, create_product
+from services import catalog_io
+
+
+class TestCatalogImport(unittest.TestCase):
+    def setUp(self) -> None:
+        self.engine = create_engine("sqlite:///:memory:", echo=False, future=True)
+        Base.metadata.create_all(bind=self.engine)
+        self.db = Session(self.engine)
+        self.category = create_category(self.db, "Electronics")
+        self.product = create_product(self.db, "Laptop", "", 1000.0, 5, self.category.id)
+        self.db.commit()
+
+    def tearDown(self) -> None:
+        self.db.close()
+        self.engine.dispose()
+
+    def _batches(self, text: str, fmt: str, batch_size: int = 2):
+        return list(catalog_io.read_batches(io.StringIO(text), fmt, batch_size=batch_size))
+
+    def test_csv_rows_are_batched_and_validated(self) -> None:
+        text = (
+            "id,name,description,price,quantity,category\n"
+            ",Phone,Smart,500,3,Electronics\n"
+            ",Novel,,10,7,Books\n"
+            ",Broken,,abc,1,Books\n"
+            ",Tablet,,300,2,Electronics\n"
+        )
+        batches = self._batches(text, "csv")
+        self.assertEqual([len(b.rows) for b in batches], [2, 1])
+        self.assertEqual(sum((b.errors for b in batches), []), [(4, "неверные числовые поля")])
+
+    def test_json_lines_and_array(self) -> None:
+        lines = '{"name": "Phone", "price": 1, "quantity": 1, "category": "A"}\nnot json\n'
+        batches = self._batches(lines, "json")
+        self.assertEqual(len(batches[0].rows), 1)
+        self.assertEqual(batches[-1].errors, [(2, "неверный JSON")])
+        array = '[{"name": "Phone", "price": 1, "quantity": 1, "category": "A"}]'
+        self.assertEqual(self._batches(array, "json")[0].rows[0].name, "Phone")
+
+    def test_apply_batch_upserts_and_creates_categories(self) -> None:
+        rows = [
+            catalog_io.ProductRow(self.product.id, "Laptop Pro", "", 1200.0, 9, "Electronics"),
+            catalog_io.ProductRow(None, "Novel", "", 10.0, 7, "Books"),
+        ]
+        created, updated = catalog_io.apply_batch(self.db, rows)
+        self.db.commit()
+        self.assertEqual((created, updated), (1, 1))
+        laptop = self.db.query(Product).filter(Product.id == self.product.id).one()
+        self.db.refresh(laptop)
+        self.assertEqual((laptop.name, laptop.quantity), ("Laptop Pro", 9))
+        books = self.db.query(Category).filter(Category.name == "Books").one()
+        self.assertEqual(self.db.query(Product).filter(Product.category_id == books.id).count(), 1)
+
+    def test_export_round_trip(self) -> None:
+        out = io.StringIO()
+        count = catalog_io.export_products(self.db, out, chunk_size=1)
+        self.assertEqual(count, 1)
+        rows = list(csv.DictReader(io.StringIO(out.getvalue())))
+        self.assertEqual(rows[0]["name"], "Laptop")
+        self.assertEqual(rows[0]["category"], "Electronics")
+        reimported = self._batches(out.getvalue(), "csv")
+        self.assertEqual(reimported[0].rows[0].id, self.product.id)
+
+    def test_detect_format(self) -> None:
+        self.assertEqual(catalog_io.detect_format("Catalog.CSV"), "csv")
+        self.assertEqual(catalog_io.detect_format("items.jsonl"), "json")
+        with self.assertRaises(ValueError):
+            catalog_io.detect_format("items.xlsx")
+
+
+if __name__ == "__main__":
+    unittest.main()
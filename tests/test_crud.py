@@ -1,5 +1,6 @@
 import unittest
 from sqlalchemy import create_engine
+from sqlalchemy.exc import NoResultFound
 from sqlalchemy.orm import Session
 from database.models import Base
 from database.crud import (
@@ -12,14 +13,19 @@ from database.crud import (
     delete_product,
     create_order,
     add_item_to_order,
+    add_items_to_order,
     get_orders_by_user,
     get_order_details,
     update_order_status,
+    update_order_statuses,
+    get_order_totals,
 )
+from database import crud
 from database.models import User, Category, Product, Order, OrderItem
+from tests.helpers import QueryCountMixin
 
 
-class TestCRUD(unittest.TestCase):
+class TestCRUD(QueryCountMixin, unittest.TestCase):
     def setUp(self) -> None:
         self.engine = create_engine("sqlite:///:memory:", echo=False, future=True)
         Base.metadata.create_all(bind=self.engine)
@@ -48,6 +54,13 @@ class TestCRUD(unittest.TestCase):
         self.assertEqual(user_updated.username, "newname")
         self.assertEqual(user_updated.full_name, "New Name")
 
+    def test_get_or_create_user_unchanged_skips_write(self) -> None:
+        self.db.commit()
+        with self.assertMaxQueries(self.engine, 1) as counter:
+            user = get_or_create_user(self.db, telegram_id=12345, username="testuser", full_name="Test User")
+        self.assertEqual(user.id, self.user.id)
+        self.assertFalse(any(s.startswith("UPDATE") for s in counter.statements))
+
     def test_create_and_get_all_categories(self) -> None:
         cat2 = create_category(self.db, name="Books")
         cats = get_all_categories(self.db)
@@ -66,6 +79,32 @@ class TestCRUD(unittest.TestCase):
         by_cat = get_products(self.db, category_id=self.category.id)
         self.assertEqual(len(by_cat), 1)
 
+    def test_get_products_keyset_pages(self) -> None:
+        for i in range(24):
+            create_product(self.db, name=f"Item {i:02d}", description="", price=1.0, quantity=1,
+                           category_id=self.category.id)
+        expected = [p.id for p in get_products(self.db, category_id=self.category.id)]
+        pages = []
+        after_id = None
+        while True:
+            page = get_products(self.db, category_id=self.category.id, after_id=after_id, limit=10)
+            if not page:
+                break
+            pages.append([p.id for p in page])
+            after_id = page[-1].id
+        self.assertEqual([len(p) for p in pages], [10, 10, 5])
+        self.assertEqual(sum(pages, []), expected)
+        back = get_products(self.db, category_id=self.category.id, before_id=pages[2][0], limit=10)
+        self.assertEqual([p.id for p in back], pages[1])
+
+    def test_get_products_same_name_tie_break(self) -> None:
+        twins = [create_product(self.db, name="Laptop", description="", price=1.0, quantity=1,
+                                category_id=self.category.id) for _ in range(2)]
+        first = get_products(self.db, category_id=self.category.id, limit=1)
+        self.assertEqual(first[0].id, self.product.id)
+        rest = get_products(self.db, category_id=self.category.id, after_id=self.product.id, limit=10)
+        self.assertEqual([p.id for p in rest], [t.id for t in twins])
+
     def test_create_product_invalid_category(self) -> None:
         with self.assertRaises(ValueError):
             create_product(self.db, name="Phone", description="Smartphone", price=500.0, quantity=10, category_id=999)
@@ -84,6 +123,12 @@ class TestCRUD(unittest.TestCase):
         prod = self.db.query(Product).filter(Product.id == self.product.id).one_or_none()
         self.assertIsNone(prod)
 
+    def test_crud_flushes_without_commit(self) -> None:
+        cat = create_category(self.db, name="Books")
+        self.assertIsNotNone(cat.id)
+        self.db.rollback()
+        self.assertEqual([c.name for c in get_all_categories(self.db)], [])
+
     def test_order_workflow(self) -> None:
         order = create_order(self.db, self.user.id)
         self.assertIsNotNone(order.id)
@@ -98,6 +143,82 @@ class TestCRUD(unittest.TestCase):
         updated_order = update_order_status(self.db, order.id, new_status="paid")
         self.assertEqual(updated_order.status, "paid")
 
+    def test_update_order_statuses_bulk(self) -> None:
+        other = get_or_create_user(self.db, telegram_id=777, username="other", full_name="Other", is_admin=False)
+        orders = [create_order(self.db, user.id) for user in (self.user, other, self.user)]
+        update_order_status(self.db, orders[2].id, new_status="shipped")
+        ids = [o.id for o in orders] + [999]
+        original_chunk = crud._IN_CHUNK
+        crud._IN_CHUNK = 2
+        try:
+            changed, missing, final = update_order_statuses(self.db, ids, "shipped")
+        finally:
+            crud._IN_CHUNK = original_chunk
+        self.assertEqual(sorted(changed), [(orders[0].id, 12345), (orders[1].id, 777)])
+        self.assertEqual((missing, final), ([999], []))
+        self.db.expire_all()
+        self.assertEqual({o.status for o in self.db.query(Order).all()}, {"shipped"})
+
+    def test_update_order_statuses_rejects_unknown_status(self) -> None:
+        order = create_order(self.db, self.user.id)
+        with self.assertRaises(ValueError):
+            update_order_statuses(self.db, [order.id], "lost")
+
+    def _make_orders(self, count: int, items_per_order: int) -> None:
+        products = [
+            create_product(self.db, name=f"Item {i}", description="", price=10.0 + i, quantity=100,
+                           category_id=self.category.id)
+            for i in range(items_per_order)
+        ]
+        for _ in range(count):
+            order = create_order(self.db, self.user.id)
+            for p in products:
+                add_item_to_order(self.db, order.id, p.id, quantity=2)
+        self.db.expunge_all()
+
+    def test_get_order_details_fixed_query_count(self) -> None:
+        self._make_orders(count=1, items_per_order=5)
+        order_id = self.db.query(Order.id).scalar()
+        with self.assertMaxQueries(self.engine, 2):
+            order, total = get_order_details(self.db, order_id)
+            names = [item.product.name for item in order.items]
+        self.assertEqual(len(names), 5)
+        self.assertAlmostEqual(total, sum(2 * (10.0 + i) for i in range(5)))
+
+    def test_get_orders_by_user_fixed_query_count(self) -> None:
+        self._make_orders(count=4, items_per_order=3)
+        with self.assertMaxQueries(self.engine, 3):
+            orders = get_orders_by_user(self.db, self.user.id)
+            names = [item.product.name for o in orders for item in o.items]
+        self.assertEqual(len(orders), 4)
+        self.assertEqual(len(names), 12)
+
+    def test_get_order_totals(self) -> None:
+        self._make_orders(count=2, items_per_order=2)
+        empty = create_order(self.db, self.user.id)
+        order_ids = [o.id for o in get_orders_by_user(self.db, self.user.id)]
+        totals = get_order_totals(self.db, order_ids)
+        self.assertEqual(totals[empty.id], 0.0)
+        self.assertEqual(sorted(totals.values()), [0.0, 42.0, 42.0])
+
+    def test_get_order_details_missing(self) -> None:
+        with self.assertRaises(NoResultFound):
+            get_order_details(self.db, 999)
+
+    def test_add_items_to_order_batch(self) -> None:
+        mouse = create_product(self.db, name="Mouse", description="", price=20.0, quantity=10,
+                               category_id=self.category.id)
+        order = create_order(self.db, self.user.id)
+        items = add_items_to_order(self.db, order.id, {self.product.id: 2, mouse.id: 3})
+        self.assertEqual([(i.product_id, i.quantity, i.unit_price) for i in items],
+                         [(self.product.id, 2, 1000.0), (mouse.id, 3, 20.0)])
+        self.db.expire_all()
+        self.assertEqual(self.db.get(Product, mouse.id).quantity, 7)
+        with self.assertRaises(NoResultFound):
+            add_items_to_order(self.db, order.id, {999: 1})
+        with self.assertRaises(ValueError):
+            add_items_to_order(self.db, order.id, {mouse.id: 100})
+
     def test_add_item_insufficient_quantity(self) -> None:
         order = create_order(self.db, self.user.id)
         with self.assertRaises(ValueError):
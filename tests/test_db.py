@@ -0,0 +1,114 @@
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import unittest
+from sqlalchemy import exc
+from sqlalchemy.orm import Session
+from database.db import create_db_engine, run_db, run_in_db
+from database.models import Base
+from database.pool import pool_status
+from services.metrics import DB_POOL_CHECKED_OUT, DB_POOL_TIMEOUTS, instrument_pool, registry
+
+
+class TestDbExecutor(unittest.IsolatedAsyncioTestCase):
+    async def test_run_db_passes_session_from_executor_thread(self) -> None:
+        def probe(db: Session, value: int):
+            return isinstance(db, Session), threading.current_thread().name, value
+
+        is_session, thread_name, value = await run_db(probe, 42)
+        self.assertTrue(is_session)
+        self.assertTrue(thread_name.startswith("db"))
+        self.assertEqual(value, 42)
+
+    async def test_blocking_calls_do_not_block_event_loop(self) -> None:
+        ticks = 0
+
+        async def ticker() -> None:
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        task = asyncio.create_task(ticker())
+        await asyncio.gather(*(run_in_db(time.sleep, 0.2) for _ in range(4)))
+        task.cancel()
+        self.assertGreater(ticks, 5)
+
+
+class TestEngineProfile(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.url = f"sqlite:///{os.path.join(self.tmpdir.name, 'shop.db')}"
+        self.engine = create_db_engine(self.url, pool_size=2, max_overflow=0, pool_timeout=0.1)
+        Base.metadata.create_all(bind=self.engine)
+
+    def tearDown(self) -> None:
+        self.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def test_sqlite_pragmas_applied_on_connect(self) -> None:
+        with self.engine.connect() as conn:
+            pragma = lambda name: conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+            self.assertEqual(pragma("journal_mode"), "wal")
+            self.assertEqual(pragma("synchronous"), 1)  # NORMAL
+            self.assertEqual(pragma("busy_timeout"), 5000)
+            self.assertEqual(pragma("cache_size"), -8192)
+            self.assertEqual(pragma("query_only"), 0)
+
+    def test_readonly_engine_rejects_writes(self) -> None:
+        read_engine = create_db_engine(self.url, readonly=True)
+        try:
+            with read_engine.connect() as conn:
+                self.assertEqual(conn.exec_driver_sql("SELECT count(*) FROM categories").scalar(), 0)
+                with self.assertRaises(exc.OperationalError):
+                    conn.exec_driver_sql("INSERT INTO categories (name) VALUES ('x')")
+        finally:
+            read_engine.dispose()
+
+    def test_pool_stats_track_checkouts_and_timeouts(self) -> None:
+        first = self.engine.connect()
+        second = self.engine.connect()
+        with self.assertRaises(exc.TimeoutError):
+            self.engine.connect()
+        first.close()
+        second.close()
+
+        stats = pool_status(self.engine)
+        self.assertEqual(stats["size"], 2)
+        self.assertEqual(stats["checked_out"], 0)
+        self.assertGreaterEqual(stats["checkouts"], 2)
+        self.assertEqual(stats["timeouts"], 1)
+        self.assertGreater(stats["hold_total_seconds"], 0)
+
+    def test_pool_stats_exported_to_metrics(self) -> None:
+        instrument_pool(self.engine, "profile_test")
+        held = self.engine.connect()
+        self.engine.connect().close()
+        with self.assertRaises(exc.TimeoutError):
+            with self.engine.connect():
+                self.engine.connect()
+
+        text = registry.render()
+        self.assertEqual(DB_POOL_CHECKED_OUT.value(pool="profile_test"), 1)
+        self.assertEqual(DB_POOL_TIMEOUTS.value(pool="profile_test"), 1)
+        self.assertIn('db_pool_size{pool="profile_test"} 2', text)
+        self.assertIn('db_pool_checkouts_total{pool="profile_test"}', text)
+        self.assertIn('db_pool_wait_seconds_total{pool="profile_test"}', text)
+        held.close()
+        registry.render()
+        self.assertEqual(DB_POOL_CHECKED_OUT.value(pool="profile_test"), 0)
+
+    def test_memory_database_shares_single_connection(self) -> None:
+        memory = create_db_engine("sqlite://")
+        try:
+            Base.metadata.create_all(bind=memory)
+            with memory.connect() as conn:
+                self.assertEqual(conn.exec_driver_sql("SELECT count(*) FROM products").scalar(), 0)
+        finally:
+            memory.dispose()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,228 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from database import migrations, sales
+from database.crud import (
+    add_items_to_order,
+    create_category,
+    create_order,
+    create_product,
+    get_or_create_user,
+    update_order_status,
+    update_order_statuses,
+)
+from database.expiry import expire_orders
+from database.models import DailySales, Order, Product
+from services.cache import MISSING
+from services.catalog_cache import catalog_cache
+from services.sweeper import EXPIRED_ORDERS, RESTOCKED_UNITS, OrderSweeper
+
+
+class ExpiryTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.engine = create_engine(
+            "sqlite://", future=True, poolclass=StaticPool, connect_args={"check_same_thread": False}
+        )
+        migrations.upgrade(self.engine)
+        self.factory = sessionmaker(bind=self.engine, autoflush=False, expire_on_commit=False)
+        self.db = self.factory()
+        self.user = get_or_create_user(self.db, 42, "buyer", "Buyer")
+        self.books = create_category(self.db, "Книги")
+        self.games = create_category(self.db, "Игры")
+        self.book = create_product(self.db, "Книга", "", 10.0, 100, self.books.id)
+        self.game = create_product(self.db, "Игра", "", 50.0, 100, self.games.id)
+        self.db.commit()
+        self.now = datetime.utcnow()
+
+    def tearDown(self) -> None:
+        catalog_cache.invalidate_all()
+        self.db.close()
+        self.engine.dispose()
+
+    def _order(self, hours_ago: int, items: dict, status: str = "pending") -> int:
+        order = create_order(self.db, self.user.id)
+        order.created_at = self.now - timedelta(hours=hours_ago)
+        self.db.flush()
+        add_items_to_order(self.db, order.id, items)
+        if status != "pending":
+            update_order_statuses(self.db, [order.id], status)
+        self.db.commit()
+        return order.id
+
+    def _stock(self) -> tuple:
+        self.db.expire_all()
+        return self.db.get(Product, self.book.id).quantity, self.db.get(Product, self.game.id).quantity
+
+
+class TestExpireOrders(ExpiryTestCase):
+    def test_expires_old_pending_orders_and_restocks(self) -> None:
+        old = self._order(48, {self.book.id: 3, self.game.id: 1})
+        older = self._order(72, {self.book.id: 2})
+        fresh = self._order(1, {self.book.id: 5})
+        paid = self._order(72, {self.game.id: 4}, status="paid")
+        self.assertEqual(self._stock(), (90, 95))
+
+        batch = expire_orders(self.db, self.now - timedelta(hours=24), limit=10)
+        self.db.commit()
+
+        self.assertEqual(batch.orders, [(older, 42), (old, 42)])
+        self.assertEqual(batch.units, 6)
+        self.assertEqual(batch.category_ids, {self.books.id, self.games.id})
+        self.assertEqual(self._stock(), (95, 96))
+        statuses = dict(self.db.query(Order.id, Order.status))
+        self.assertEqual(statuses, {old: "expired", older: "expired", fresh: "pending", paid: "paid"})
+        # Повторный проход ничего не возвращает на склад второй раз
+        self.assertEqual(expire_orders(self.db, self.now, limit=10).orders, [(fresh, 42)])
+        self.assertEqual(self._stock(), (100, 96))
+
+    def test_expired_orders_are_final(self) -> None:
+        expired = self._order(48, {self.book.id: 3})
+        expire_orders(self.db, self.now - timedelta(hours=24), limit=10)
+        self.db.commit()
+        self.assertEqual(self._stock(), (100, 100))
+
+        # Возврат в pending привёл бы к повторной просрочке и второму возврату на склад
+        self.assertEqual(update_order_statuses(self.db, [expired], "pending"), ([], [], [expired]))
+        with self.assertRaises(ValueError):
+            update_order_status(self.db, expired, "paid")
+        self.db.commit()
+        self.assertEqual(expire_orders(self.db, self.now, limit=10).orders, [])
+        self.assertEqual(self._stock(), (100, 100))
+        self.assertEqual(self.db.get(Order, expired).status, "expired")
+
+        # Вручную «expired» не ставится: товары такого заказа не вернулись бы на склад
+        pending = self._order(1, {self.book.id: 2})
+        with self.assertRaises(ValueError):
+            update_order_statuses(self.db, [pending], "expired")
+        with self.assertRaises(ValueError):
+            update_order_status(self.db, pending, "expired")
+        self.assertEqual(self._stock(), (98, 100))
+
+    def test_batch_limit_takes_oldest_first(self) -> None:
+        ids = [self._order(100 - i, {self.book.id: 1}) for i in range(5)]
+        before = self.now - timedelta(hours=24)
+        first = expire_orders(self.db, before, limit=2)
+        second = expire_orders(self.db, before, limit=2)
+        rest = expire_orders(self.db, before, limit=2)
+        self.assertEqual([order_id for order_id, _ in first.orders + second.orders + rest.orders], ids)
+        self.assertEqual(len(rest.orders), 1)
+
+    def test_expired_orders_leave_sales_rollup(self) -> None:
+        self._order(48, {self.book.id: 3})
+        self._order(48, {self.book.id: 1}, status="paid")
+        expire_orders(self.db, self.now - timedelta(hours=24), limit=10)
+        self.db.commit()
+        self.assertEqual([(r.quantity, r.revenue) for r in self.db.query(DailySales)], [(1, 10.0)])
+        sales.rebuild_daily_sales(self.db.connection())
+        self.assertEqual([(r.quantity, r.revenue) for r in self.db.query(DailySales)], [(1, 10.0)])
+
+
+class TestConcurrentStatusWriters(unittest.TestCase):
+    # Два соединения к одному файлу: второй писатель вклинивается перед UPDATE первого
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.engine = create_engine(
+            f"sqlite:///{os.path.join(self.tmpdir.name, 'shop.db')}", future=True, connect_args={"timeout": 0.05}
+        )
+        migrations.upgrade(self.engine)
+        self.factory = sessionmaker(bind=self.engine, autoflush=False, expire_on_commit=False)
+        with self.factory() as db:
+            user = get_or_create_user(db, 42, "buyer", "Buyer")
+            category = create_category(db, "Книги")
+            self.book = create_product(db, "Книга", "", 10.0, 10, category.id).id
+            order = create_order(db, user.id)
+            order.created_at = datetime.utcnow() - timedelta(days=2)
+            db.flush()
+            add_items_to_order(db, order.id, {self.book: 3})
+            self.order = order.id
+            db.commit()
+        self.before = datetime.utcnow() - timedelta(days=1)
+
+    def tearDown(self) -> None:
+        catalog_cache.invalidate_all()
+        self.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def _before_order_update(self, interleave) -> list:
+        outcome = []
+
+        def hook(conn, cursor, statement, parameters, context, executemany) -> None:
+            if statement.startswith("UPDATE orders") and not outcome:
+                try:
+                    outcome.append(interleave())
+                except exc.OperationalError as e:
+                    outcome.append(e)
+
+        event.listen(self.engine, "before_cursor_execute", hook)
+        self.addCleanup(event.remove, self.engine, "before_cursor_execute", hook)
+        return outcome
+
+    def _state(self) -> tuple:
+        with self.factory() as db:
+            return db.get(Order, self.order).status, db.get(Product, self.book).quantity
+
+    def _commit(self, func, *args):
+        with self.factory() as db:
+            result = func(db, *args)
+            db.commit()
+            return result
+
+    def test_sweeper_cannot_expire_order_being_paid(self) -> None:
+        outcome = self._before_order_update(lambda: self._commit(expire_orders, self.before, 10))
+        self._commit(update_order_statuses, [self.order], "paid")
+        self.assertIsInstance(outcome[0], exc.OperationalError)
+        self.assertEqual(self._state(), ("paid", 7))
+        self.assertEqual(self._commit(expire_orders, self.before, 10).orders, [])
+        self.assertEqual(self._state(), ("paid", 7))
+
+    def test_admin_cannot_revive_order_being_expired(self) -> None:
+        outcome = self._before_order_update(lambda: self._commit(update_order_statuses, [self.order], "paid"))
+        self.assertEqual(len(self._commit(expire_orders, self.before, 10).orders), 1)
+        self.assertIsInstance(outcome[0], exc.OperationalError)
+        self.assertEqual(self._state(), ("expired", 10))
+        self.assertEqual(self._commit(update_order_statuses, [self.order], "paid"), ([], [], [self.order]))
+        with self.assertRaises(ValueError):
+            self._commit(update_order_status, self.order, "paid")
+        self.assertEqual(self._state(), ("expired", 10))
+
+
+class FakeNotifier:
+    def __init__(self) -> None:
+        self.sent = []
+
+    def enqueue(self, notifications) -> int:
+        batch = list(notifications)
+        self.sent.extend(batch)
+        return len(batch)
+
+
+class TestOrderSweeper(ExpiryTestCase, unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        ExpiryTestCase.setUp(self)
+
+    async def test_run_once_sweeps_in_batches_and_reports(self) -> None:
+        ids = [self._order(48, {self.book.id: 2}) for _ in range(5)]
+        self._order(1, {self.game.id: 1})
+        notifier = FakeNotifier()
+        sweeper = OrderSweeper(
+            interval=0, ttl=86400, batch_size=2, pause=0, session_factory=self.factory, notifier=notifier
+        )
+        key = ("category", self.books.id, "")
+        catalog_cache.put(key, catalog_cache.version(self.books.id), "cached page")
+        orders_before, units_before = EXPIRED_ORDERS.value(), RESTOCKED_UNITS.value()
+
+        self.assertEqual(await sweeper.run_once(), 5)
+        self.assertEqual(self._stock(), (100, 99))
+        self.assertEqual((EXPIRED_ORDERS.value() - orders_before, RESTOCKED_UNITS.value() - units_before), (5, 10))
+        self.assertEqual([n.chat_id for n in notifier.sent], [42] * 5)
+        self.assertIn(f"#{ids[0]}", notifier.sent[0].text)
+        self.assertIs(catalog_cache.get(key), MISSING)
+        self.assertEqual(await sweeper.run_once(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import asyncio
+import random
+import unittest
+from aiogram import Bot, Dispatcher, F, Router
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.filters import Command
+from aiogram.types import CallbackQuery, Message
+from benchmarks.seed import SeededShop
+from tools.fake_api import FakeBotAPI
+from tools.loadgen import Traffic, parse_mix, run_load
+
+
+class TestFakeApiPolling(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.api = FakeBotAPI()
+        api_url = await self.api.start()
+        self.bot = Bot(token="123456:ABCdef", session=AiohttpSession(api=TelegramAPIServer.from_base(api_url)))
+        router = Router()
+
+        @router.message(Command("start", "categories"))
+        async def on_command(message: Message) -> None:
+            await message.answer("ok")
+
+        @router.callback_query(F.data.startswith("c1:") | F.data.startswith("b1:"))
+        async def on_callback(callback: CallbackQuery) -> None:
+            await callback.answer()
+
+        self.dp = Dispatcher()
+        self.dp.include_router(router)
+        self.polling = asyncio.create_task(self.dp.start_polling(self.bot, handle_signals=False, polling_timeout=1))
+
+    async def asyncTearDown(self) -> None:
+        await self.dp.stop_polling()
+        await self.polling
+        await self.bot.session.close()
+        await self.api.stop()
+
+    async def test_get_updates_delivers_in_order(self) -> None:
+        reply = self.api.expect("sendMessage", 7)
+        update_id = await self.api.push_update({"message": {
+            "message_id": 1, "date": 0, "text": "/start",
+            "chat": {"id": 7, "type": "private"}, "from": {"id": 7, "is_bot": False, "first_name": "U"},
+        }})
+        self.assertEqual(update_id, 1)
+        params = await asyncio.wait_for(reply, 5)
+        self.assertEqual(params["text"], "ok")
+
+    async def test_load_run_reports_every_request(self) -> None:
+        shop = SeededShop(user_ids=[1, 2], telegram_ids=[11, 12, 13], category_ids=[1, 2],
+                          product_ids=[1, 2, 3], order_ids=[])
+        traffic = Traffic(shop, random.Random(1))
+        report = await run_load(self.api, traffic, shop.telegram_ids, actions_per_user=4,
+                                mix=parse_mix("categories=1,show_cat=1,buy=1"), concurrency=2, timeout=5)
+
+        self.assertEqual(report["requests"], 15)
+        self.assertEqual(report["completed"], 15)
+        self.assertEqual(report["timeouts"], {})
+        self.assertEqual(report["actions"]["start"]["ops"], 3)
+        self.assertGreater(report["throughput_rps"], 0)
+
+
+class TestParseMix(unittest.TestCase):
+    def test_parses_weights_and_rejects_unknown(self) -> None:
+        self.assertEqual(parse_mix("start=1,buy=2.5"), {"start": 1.0, "buy": 2.5})
+        with self.assertRaises(ValueError):
+            parse_mix("start=1,refund=1")
+
+
+if __name__ == "__main__":
+    unittest.main()
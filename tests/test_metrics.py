@@ -0,0 +1,156 @@
+import unittest
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+from aiogram import Router
+from aiogram.filters import Command
+from aiogram.methods import GetMe
+from aiogram.types import Update
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from database.models import Base
+from database.crud import create_category, get_all_categories
+from middlewares.metrics import ApiMetricsMiddleware, UpdateMetricsMiddleware, registered_commands, update_route
+from services.metrics import (
+    DB_QUERIES,
+    TELEGRAM_REQUESTS,
+    UPDATE_DURATION,
+    UPDATES_IN_FLIGHT,
+    Registry,
+    add_metrics_route,
+    instrument_engine,
+)
+
+
+def _update(**payload) -> Update:
+    return Update.model_validate({"update_id": 1, **payload})
+
+
+def _message(text: str) -> dict:
+    return {"message_id": 1, "date": 0, "chat": {"id": 1, "type": "private"}, "text": text}
+
+
+def _router(*commands: str) -> Router:
+    parent, child = Router(), Router()
+    child.message.register(lambda message: None, Command(commands=list(commands)))
+    parent.include_router(child)
+    return parent
+
+
+def _callback(data: str) -> dict:
+    return {"id": "1", "from": {"id": 1, "is_bot": False, "first_name": "A"}, "chat_instance": "1", "data": data}
+
+
+class TestRegistry(unittest.TestCase):
+    def test_renders_prometheus_text(self) -> None:
+        registry = Registry()
+        counter = registry.counter("hits", "Hits", ("route",))
+        histogram = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+        counter.inc(route="/start")
+        counter.inc(2, route="/start")
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+
+        text = registry.render()
+        self.assertIn("# TYPE hits counter", text)
+        self.assertIn('hits_total{route="/start"} 3', text)
+        self.assertIn('latency_seconds_bucket{le="0.1"} 1', text)
+        self.assertIn('latency_seconds_bucket{le="1"} 2', text)
+        self.assertIn('latency_seconds_bucket{le="+Inf"} 2', text)
+        self.assertIn("latency_seconds_count 2", text)
+
+    def test_same_name_returns_existing_metric(self) -> None:
+        registry = Registry()
+        self.assertIs(registry.counter("x", "X"), registry.counter("x", "X"))
+
+
+class TestUpdateRoute(unittest.TestCase):
+    def test_routes(self) -> None:
+        commands = registered_commands(_router("start", "order"))
+        self.assertEqual(commands, {"/start", "/order"})
+        self.assertEqual(update_route(_update(message=_message("/order 5")), commands), "/order")
+        self.assertEqual(update_route(_update(message=_message("/start@shop_bot")), commands), "/start")
+        self.assertEqual(update_route(_update(message=_message("hello"))), "message")
+        self.assertEqual(update_route(_update(callback_query=_callback("show_cat_3_n15"))), "callback:show_cat")
+        self.assertEqual(update_route(_update(callback_query=_callback("buy_7_1"))), "callback:buy")
+        self.assertEqual(update_route(_update(callback_query=_callback("search_ab12cd_10"))), "callback:search")
+
+    def test_unregistered_commands_share_one_label(self) -> None:
+        commands = registered_commands(_router("start"))
+        self.assertEqual(update_route(_update(message=_message("/zzz1")), commands), "unknown")
+        self.assertEqual(update_route(_update(message=_message("/zzz2 x")), commands), "unknown")
+        self.assertEqual(update_route(_update(message=_message("/start"))), "unknown")
+
+
+class TestUpdateMetricsMiddleware(unittest.IsolatedAsyncioTestCase):
+    async def test_records_duration_and_in_flight(self) -> None:
+        middleware = UpdateMetricsMiddleware(_router("metrics_probe"), slow_update_ms=0)
+        update = _update(message=_message("/metrics_probe"))
+        seen = []
+
+        async def handler(event, data):
+            seen.append(UPDATES_IN_FLIGHT.value())
+            return "ok"
+
+        before = UPDATE_DURATION.count(route="/metrics_probe", outcome="ok")
+        self.assertEqual(await middleware(handler, update, {}), "ok")
+        self.assertEqual(UPDATE_DURATION.count(route="/metrics_probe", outcome="ok"), before + 1)
+        self.assertEqual(seen[0] - UPDATES_IN_FLIGHT.value(), 1)
+
+    async def test_logs_slow_updates(self) -> None:
+        middleware = UpdateMetricsMiddleware(_router("slow_probe"), slow_update_ms=0.001)
+        update = _update(message=_message("/slow_probe"))
+
+        async def handler(event, data):
+            raise RuntimeError("boom")
+
+        with self.assertLogs("middlewares.metrics", "WARNING"):
+            with self.assertRaises(RuntimeError):
+                await middleware(handler, update, {})
+        self.assertEqual(UPDATE_DURATION.count(route="/slow_probe", outcome="error"), 1)
+
+
+class TestApiMetricsMiddleware(unittest.IsolatedAsyncioTestCase):
+    async def test_counts_calls_and_errors(self) -> None:
+        middleware = ApiMetricsMiddleware()
+        before = TELEGRAM_REQUESTS.value(method="getMe", outcome="ok")
+
+        async def ok(bot, method):
+            return "response"
+
+        async def fail(bot, method):
+            raise ConnectionError
+
+        self.assertEqual(await middleware(ok, None, GetMe()), "response")
+        with self.assertRaises(ConnectionError):
+            await middleware(fail, None, GetMe())
+        self.assertEqual(TELEGRAM_REQUESTS.value(method="getMe", outcome="ok"), before + 1)
+        self.assertGreaterEqual(TELEGRAM_REQUESTS.value(method="getMe", outcome="ConnectionError"), 1)
+
+
+class TestSqlInstrumentation(unittest.TestCase):
+    def test_queries_attributed_to_crud_function(self) -> None:
+        engine = create_engine("sqlite:///:memory:", future=True)
+        Base.metadata.create_all(bind=engine)
+        instrument_engine(engine)
+        instrument_engine(engine)
+        before = DB_QUERIES.value(function="get_all_categories")
+        with Session(engine) as db:
+            create_category(db, "Books")
+            get_all_categories(db)
+        self.assertEqual(DB_QUERIES.value(function="get_all_categories"), before + 1)
+        self.assertGreaterEqual(DB_QUERIES.value(function="create_category"), 1)
+        engine.dispose()
+
+
+class TestMetricsEndpoint(unittest.IsolatedAsyncioTestCase):
+    async def test_serves_registry(self) -> None:
+        app = web.Application()
+        add_metrics_route(app)
+        async with TestClient(TestServer(app)) as client:
+            response = await client.get("/metrics")
+            self.assertEqual(response.status, 200)
+            self.assertIn("bot_update_duration_seconds", await response.text())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,165 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+from aiogram.types import Update
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from database.models import Base, Category, Product
+from database.crud import create_category, create_product, get_or_create_user
+from handlers.admin_handlers import cmd_update_product
+from middlewares.db import DbSessionMiddleware
+from middlewares.idempotency import IdempotencyMiddleware
+from services.user_cache import user_cache
+
+
+class TestDbSessionMiddleware(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.engine = create_engine(
+            "sqlite://", future=True, poolclass=StaticPool, connect_args={"check_same_thread": False}
+        )
+        Base.metadata.create_all(bind=self.engine)
+        self.factory = sessionmaker(bind=self.engine, autoflush=False, expire_on_commit=False)
+        self.middleware = DbSessionMiddleware(self.factory)
+
+    def tearDown(self) -> None:
+        self.engine.dispose()
+
+    def _category_names(self):
+        with self.factory() as db:
+            return [c.name for c in db.query(Category).all()]
+
+    async def test_commits_once_after_handler(self) -> None:
+        async def handler(event, data):
+            create_category(data["db"], "Books")
+            create_category(data["db"], "Games")
+            return "ok"
+
+        result = await self.middleware(handler, object(), {})
+        self.assertEqual(result, "ok")
+        self.assertEqual(sorted(self._category_names()), ["Books", "Games"])
+
+    async def test_rolls_back_on_error(self) -> None:
+        async def handler(event, data):
+            create_category(data["db"], "Books")
+            raise RuntimeError("boom")
+
+        with self.assertRaises(RuntimeError):
+            await self.middleware(handler, object(), {})
+        self.assertEqual(self._category_names(), [])
+
+    async def test_handler_that_catches_error_does_not_commit_partial_changes(self) -> None:
+        with self.factory() as db:
+            get_or_create_user(db, 777, "admin", "Admin", is_admin=True)
+            product_id = create_product(db, "Книга", "", 10.0, 5, create_category(db, "Books").id).id
+            db.commit()
+        self.addCleanup(user_cache.clear)
+        replies = []
+
+        async def reply(text, **kwargs):
+            replies.append(text)
+
+        # Название и цена меняются в сессии до проверки категории, которой нет
+        message = SimpleNamespace(
+            from_user=SimpleNamespace(id=777), text=f"/update_product {product_id}|Новая||99.0||404", reply=reply
+        )
+
+        async def handler(event, data):
+            return await cmd_update_product(event, data["db"])
+
+        await self.middleware(handler, message, {})
+        self.assertIn("Ошибка при обновлении", replies[0])
+        with self.factory() as db:
+            product = db.get(Product, product_id)
+            self.assertEqual((product.name, product.price), ("Книга", 10.0))
+
+    async def test_read_session_defaults_to_write_session(self) -> None:
+        async def handler(event, data):
+            return data["read_db"] is data["db"]
+
+        self.assertTrue(await self.middleware(handler, object(), {}))
+
+    async def test_separate_read_session_is_closed(self) -> None:
+        middleware = DbSessionMiddleware(self.factory, self.factory)
+        seen = {}
+
+        async def handler(event, data):
+            seen.update(data)
+            return data["read_db"] is not data["db"]
+
+        self.assertTrue(await middleware(handler, object(), {}))
+        self.assertFalse(seen["read_db"].in_transaction())
+
+
+class FakeBot:
+    def __init__(self) -> None:
+        self.answered = []
+
+    async def answer_callback_query(self, callback_query_id: str) -> bool:
+        self.answered.append(callback_query_id)
+        return True
+
+
+def _callback_update(update_id: int, data: str, user_id: int = 1) -> Update:
+    return Update.model_validate({"update_id": update_id, "callback_query": {
+        "id": str(update_id), "from": {"id": user_id, "is_bot": False, "first_name": "A"},
+        "chat_instance": "1", "data": data,
+    }})
+
+
+class TestIdempotencyMiddleware(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.bot = FakeBot()
+        self.calls = []
+        self.middleware = IdempotencyMiddleware(update_ttl=60, callback_window=60, callback_prefixes=("cart_checkout",))
+
+    async def _handler(self, event, data):
+        self.calls.append(event.update_id)
+        await asyncio.sleep(0.01)
+        return "handled"
+
+    def _feed(self, update: Update):
+        return self.middleware(self._handler, update, {"bot": self.bot})
+
+    async def test_redelivered_update_is_dropped(self) -> None:
+        update = _callback_update(1, "show_cat_1")
+        self.assertEqual(await self._feed(update), "handled")
+        self.assertIsNone(await self._feed(update))
+        self.assertEqual(self.calls, [1])
+
+    async def test_double_tap_waits_for_first_and_is_answered(self) -> None:
+        results = await asyncio.gather(
+            self._feed(_callback_update(1, "cart_checkout")), self._feed(_callback_update(2, "cart_checkout"))
+        )
+        self.assertEqual(results, ["handled", None])
+        self.assertEqual(self.calls, [1])
+        self.assertEqual(self.bot.answered, ["2"])
+        # Другой пользователь и не перечисленные префиксы не схлопываются
+        await self._feed(_callback_update(3, "cart_checkout", user_id=2))
+        await self._feed(_callback_update(4, "cart_inc_1"))
+        await self._feed(_callback_update(5, "cart_inc_1"))
+        self.assertEqual(self.calls, [1, 3, 4, 5])
+
+    async def test_failed_callback_can_be_retried(self) -> None:
+        async def failing(event, data):
+            raise RuntimeError("boom")
+
+        with self.assertRaises(RuntimeError):
+            await self.middleware(failing, _callback_update(1, "cart_checkout"), {"bot": self.bot})
+        self.assertEqual(await self._feed(_callback_update(2, "cart_checkout")), "handled")
+
+    async def test_failed_update_can_be_redelivered(self) -> None:
+        async def failing(event, data):
+            raise RuntimeError("boom")
+
+        for update in (_callback_update(10, "show_cat_1"), _callback_update(11, "cart_checkout")):
+            with self.assertRaises(RuntimeError):
+                await self.middleware(failing, update, {"bot": self.bot})
+            self.assertEqual(await self._feed(update), "handled")
+            # Успешно обработанный апдейт дальше отбрасывается как дубль
+            self.assertIsNone(await self._feed(update))
+        self.assertEqual(self.calls, [10, 11])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+from sqlalchemy import create_engine
+from database import migrations
+
+LEGACY_SCHEMA = [
+    "CREATE TABLE users (id INTEGER NOT NULL, telegram_id INTEGER NOT NULL, username VARCHAR, "
+    "full_name VARCHAR, is_admin BOOLEAN NOT NULL, PRIMARY KEY (id), UNIQUE (telegram_id))",
+    "CREATE TABLE categories (id INTEGER NOT NULL, name VARCHAR NOT NULL, PRIMARY KEY (id), UNIQUE (name))",
+    "CREATE TABLE products (id INTEGER NOT NULL, name VARCHAR NOT NULL, description VARCHAR, "
+    "price FLOAT NOT NULL, quantity INTEGER NOT NULL, category_id INTEGER NOT NULL, PRIMARY KEY (id), "
+    "FOREIGN KEY(category_id) REFERENCES categories (id))",
+    "CREATE TABLE orders (id INTEGER NOT NULL, user_id INTEGER NOT NULL, created_at DATETIME NOT NULL, "
+    "status VARCHAR NOT NULL, PRIMARY KEY (id), FOREIGN KEY(user_id) REFERENCES users (id))",
+    "CREATE TABLE order_items (id INTEGER NOT NULL, order_id INTEGER NOT NULL, product_id INTEGER NOT NULL, "
+    "quantity INTEGER NOT NULL, unit_price FLOAT NOT NULL, PRIMARY KEY (id), "
+    "FOREIGN KEY(order_id) REFERENCES orders (id), FOREIGN KEY(product_id) REFERENCES products (id))",
+    "INSERT INTO categories (id, name) VALUES (1, 'Electronics')",
+    "INSERT INTO products (id, name, price, quantity, category_id) VALUES (1, 'Laptop', 1000.0, 5, 1)",
+]
+
+
+class TestMigrations(unittest.TestCase):
+    def setUp(self) -> None:
+        self.engine = create_engine("sqlite:///:memory:", echo=False, future=True)
+
+    def tearDown(self) -> None:
+        self.engine.dispose()
+
+    def _indexes(self):
+        with self.engine.connect() as conn:
+            rows = conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'index'").fetchall()
+        return {r[0] for r in rows}
+
+    def _plan(self, sql: str) -> str:
+        with self.engine.connect() as conn:
+            return " ".join(r[-1] for r in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + sql).fetchall())
+
+    def test_fresh_database_gets_latest_version(self) -> None:
+        version = migrations.upgrade(self.engine)
+        self.assertEqual(version, len(migrations.MIGRATIONS))
+        self.assertIn("ix_orders_user_id_created_at", self._indexes())
+
+    def test_legacy_database_is_upgraded_in_place(self) -> None:
+        with self.engine.connect() as conn:
+            for statement in LEGACY_SCHEMA:
+                conn.exec_driver_sql(statement)
+            conn.commit()
+        migrations.upgrade(self.engine)
+        self.assertTrue({
+            "ix_products_category_id_name", "ix_orders_user_id_created_at", "ix_order_items_order_id",
+            "ix_orders_idempotency_key",
+        } <= self._indexes())
+        with self.engine.connect() as conn:
+            self.assertEqual(conn.exec_driver_sql("SELECT name FROM products").scalar(), "Laptop")
+
+    def test_upgrade_is_idempotent(self) -> None:
+        first = migrations.upgrade(self.engine)
+        self.assertEqual(migrations.upgrade(self.engine), first)
+
+    def test_hot_queries_use_indexes(self) -> None:
+        migrations.upgrade(self.engine)
+        self.assertIn(
+            "ix_products_category_id_name",
+            self._plan("SELECT * FROM products WHERE category_id = 1 ORDER BY name"),
+        )
+        self.assertIn(
+            "ix_orders_user_id_created_at",
+            self._plan("SELECT * FROM orders WHERE user_id = 1 ORDER BY created_at DESC"),
+        )
+        self.assertIn("ix_order_items_order_id", self._plan("SELECT * FROM order_items WHERE order_id = 1"))
+
+
+if __name__ == "__main__":
+    unittest.main()
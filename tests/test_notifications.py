@@ -0,0 +1,87 @@
+import asyncio
+import threading
+import unittest
+from aiogram.exceptions import TelegramForbiddenError
+from aiogram.methods import SendMessage
+from handlers.admin_handlers import _parse_order_ids
+from services.notifications import NOTIFICATIONS, NotificationWorker, order_status_notification
+
+
+class FakeBot:
+    def __init__(self, delay: float = 0.01) -> None:
+        self.delay = delay
+        self.sent = []
+        self.active = 0
+        self.max_active = 0
+
+    async def send_message(self, chat_id: int, text: str, **kwargs) -> None:
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            if chat_id < 0:
+                raise TelegramForbiddenError(
+                    method=SendMessage(chat_id=chat_id, text=text), message="bot was blocked by the user"
+                )
+            self.sent.append((chat_id, text))
+        finally:
+            self.active -= 1
+
+
+class TestNotificationWorker(unittest.IsolatedAsyncioTestCase):
+    async def test_sends_concurrently_within_bound(self) -> None:
+        bot = FakeBot()
+        worker = NotificationWorker(concurrency=3)
+        await worker.start(bot)
+        worker.enqueue(order_status_notification(i, i, "shipped") for i in range(10))
+        await worker.stop(timeout=5)
+        self.assertEqual(len(bot.sent), 10)
+        self.assertEqual(bot.max_active, 3)
+        self.assertIn("отправлен", bot.sent[0][1])
+
+    async def test_enqueue_from_another_thread(self) -> None:
+        bot = FakeBot(delay=0)
+        worker = NotificationWorker(concurrency=2)
+        await worker.start(bot)
+        thread = threading.Thread(target=worker.enqueue, args=([order_status_notification(1, 5, "paid")],))
+        thread.start()
+        thread.join()
+        await asyncio.sleep(0.05)
+        await worker.stop(timeout=5)
+        self.assertEqual(bot.sent, [(1, order_status_notification(1, 5, "paid").text)])
+
+    async def test_failed_send_does_not_stop_worker(self) -> None:
+        bot = FakeBot(delay=0)
+        worker = NotificationWorker(concurrency=1)
+        await worker.start(bot)
+        before = NOTIFICATIONS.value(outcome="failed")
+        worker.enqueue([order_status_notification(-1, 1, "paid"), order_status_notification(2, 2, "paid")])
+        await worker.stop(timeout=5)
+        self.assertEqual([chat_id for chat_id, _ in bot.sent], [2])
+        self.assertEqual(NOTIFICATIONS.value(outcome="failed"), before + 1)
+
+    async def test_batch_arriving_after_stop_is_dropped(self) -> None:
+        worker = NotificationWorker(concurrency=1)
+        await worker.start(FakeBot(delay=0))
+        await worker.stop(timeout=5)
+        # enqueue из потока пула БД успел до stop(), а колбэк в event loop выполняется после
+        worker._put_many([order_status_notification(1, 1, "paid")])
+        self.assertEqual(worker.pending, 0)
+
+    async def test_enqueue_before_start_is_dropped(self) -> None:
+        worker = NotificationWorker()
+        self.assertEqual(worker.enqueue([order_status_notification(1, 1, "paid")]), 0)
+
+
+class TestParseOrderIds(unittest.TestCase):
+    def test_lists_and_ranges(self) -> None:
+        self.assertEqual(_parse_order_ids("3, 1,2 5-7 6", limit=100), [1, 2, 3, 5, 6, 7])
+
+    def test_invalid_input(self) -> None:
+        for raw in ("", "abc", "5-3", "1-1000"):
+            with self.assertRaises(ValueError):
+                _parse_order_ids(raw, limit=100)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import unittest
+from datetime import date, datetime, timedelta
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+from database import migrations, sales
+from database.crud import (
+    add_item_to_order,
+    add_items_to_order,
+    create_category,
+    create_order,
+    create_product,
+    get_or_create_user,
+    update_order_status,
+    update_order_statuses,
+)
+from database.models import DailySales
+from handlers.admin_handlers import _render_stats
+
+
+class TestDailySales(unittest.TestCase):
+    def setUp(self) -> None:
+        self.engine = create_engine("sqlite://", future=True, poolclass=StaticPool)
+        migrations.upgrade(self.engine)
+        self.db = Session(self.engine)
+        self.user = get_or_create_user(self.db, 1, "buyer", "Buyer")
+        books = create_category(self.db, "Книги")
+        games = create_category(self.db, "Игры")
+        self.book = create_product(self.db, "Книга", "", 10.0, 100, books.id)
+        self.game = create_product(self.db, "Игра", "", 50.0, 3, games.id)
+        self.today = datetime.utcnow().date()
+
+    def tearDown(self) -> None:
+        self.db.close()
+        self.engine.dispose()
+
+    def _rollup(self):
+        return sorted(
+            (row.day, row.product_id, row.quantity, row.revenue) for row in self.db.query(DailySales).all()
+        )
+
+    def test_order_items_update_rollup(self) -> None:
+        first = create_order(self.db, self.user.id)
+        add_item_to_order(self.db, first.id, self.book.id, 2)
+        second = create_order(self.db, self.user.id)
+        add_items_to_order(self.db, second.id, {self.book.id: 1, self.game.id: 1})
+        self.assertEqual(self._rollup(), [(self.today, self.book.id, 3, 30.0), (self.today, self.game.id, 1, 50.0)])
+
+    def test_cancellation_is_subtracted_and_restored(self) -> None:
+        order = create_order(self.db, self.user.id)
+        add_items_to_order(self.db, order.id, {self.book.id: 2, self.game.id: 1})
+        update_order_statuses(self.db, [order.id], "cancelled")
+        self.assertEqual(self._rollup(), [(self.today, self.book.id, 0, 0.0), (self.today, self.game.id, 0, 0.0)])
+        update_order_status(self.db, order.id, "cancelled")
+        update_order_status(self.db, order.id, "paid")
+        self.assertEqual(self._rollup(), [(self.today, self.book.id, 2, 20.0), (self.today, self.game.id, 1, 50.0)])
+
+    def test_rebuild_matches_incremental(self) -> None:
+        for status in ("paid", "cancelled", "shipped"):
+            order = create_order(self.db, self.user.id)
+            add_items_to_order(self.db, order.id, {self.book.id: 1, self.game.id: 1})
+            update_order_status(self.db, order.id, status)
+        incremental = self._rollup()
+        self.db.flush()
+        sales.rebuild_daily_sales(self.db.connection())
+        self.assertEqual(self._rollup(), incremental)
+
+    def test_reports(self) -> None:
+        order = create_order(self.db, self.user.id)
+        add_items_to_order(self.db, order.id, {self.book.id: 4, self.game.id: 2})
+        old = create_order(self.db, self.user.id)
+        old.created_at = datetime.utcnow() - timedelta(days=30)
+        add_item_to_order(self.db, old.id, self.book.id, 10)
+        since = self.today - timedelta(days=6)
+
+        self.assertEqual(sales.revenue_by_day(self.db, since), [(self.today, 6, 140.0)])
+        self.assertEqual(sales.revenue_by_category(self.db, since), [("Игры", 2, 100.0), ("Книги", 4, 40.0)])
+        self.assertEqual(sales.top_products(self.db, since, 1), [(self.game.id, "Игра", 2, 100.0)])
+        self.assertEqual(sales.low_stock(self.db, 5, 10), [(self.game.id, "Игра", 1)])
+
+        text = _render_stats(7, since, *[
+            sales.revenue_by_day(self.db, since), sales.revenue_by_category(self.db, since),
+            sales.top_products(self.db, since, 5), sales.low_stock(self.db, 5, 5),
+        ])
+        self.assertIn("Выручка: <b>140.00₽</b>", text)
+        self.assertIn("Заканчиваются", text)
+
+    def test_reports_read_rollup_not_order_items(self) -> None:
+        with self.engine.connect() as conn:
+            plan = " ".join(
+                row[-1] for row in conn.exec_driver_sql(
+                    "EXPLAIN QUERY PLAN SELECT * FROM products WHERE quantity <= 5 ORDER BY quantity"
+                ).fetchall()
+            )
+        self.assertIn("ix_products_quantity", plan)
+        since = date(2000, 1, 1)
+        statements = []
+
+        def capture(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(self.engine, "before_cursor_execute", capture)
+        try:
+            sales.revenue_by_category(self.db, since)
+            sales.top_products(self.db, since, 5)
+        finally:
+            event.remove(self.engine, "before_cursor_execute", capture)
+        self.assertFalse([s for s in statements if "order_items" in s])
+
+
+if __name__ == "__main__":
+    unittest.main()
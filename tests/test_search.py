@@ -0,0 +1,70 @@
+import unittest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+from database import migrations
+from database.crud import (
+    create_category,
+    create_product,
+    delete_product,
+    search_products,
+    search_query,
+    update_product,
+)
+from database.stock import reserve_stock
+from services import catalog_io
+
+
+class TestProductSearch(unittest.TestCase):
+    def setUp(self) -> None:
+        self.engine = create_engine("sqlite://", future=True, poolclass=StaticPool)
+        migrations.upgrade(self.engine)
+        self.db = Session(self.engine)
+        self.cat = create_category(self.db, "Ноутбуки")
+        self.laptop = create_product(self.db, "Ноутбук Lenovo", "Игровой", 1000.0, 5, self.cat.id)
+        self.mouse = create_product(self.db, "Мышь", "Беспроводная, для ноутбука", 20.0, 5, self.cat.id)
+
+    def tearDown(self) -> None:
+        self.db.close()
+        self.engine.dispose()
+
+    def _names(self, query: str, **kwargs) -> list:
+        return [p.name for p in search_products(self.db, query, **kwargs)]
+
+    def test_prefix_match_ranks_name_above_description(self) -> None:
+        self.assertEqual(self._names("ноут"), ["Ноутбук Lenovo", "Мышь"])
+        self.assertEqual(self._names("LENOVO игр"), ["Ноутбук Lenovo"])
+
+    def test_index_follows_update_and_delete(self) -> None:
+        update_product(self.db, self.mouse.id, name="Мышь Logitech", description="")
+        self.assertEqual(self._names("logi"), ["Мышь Logitech"])
+        self.assertEqual(self._names("беспроводная"), [])
+        delete_product(self.db, self.laptop.id)
+        self.assertEqual(self._names("ноут"), [])
+
+    def test_stock_changes_keep_index_intact(self) -> None:
+        self.assertTrue(reserve_stock(self.db, self.laptop.id, 2))
+        self.assertEqual(self._names("lenovo"), ["Ноутбук Lenovo"])
+
+    def test_bulk_import_is_indexed(self) -> None:
+        rows = [catalog_io.ProductRow(None, "Планшет Huawei", "", 300.0, 3, "Планшеты")]
+        catalog_io.apply_batch(self.db, rows)
+        self.assertEqual(self._names("huaw"), ["Планшет Huawei"])
+
+    def test_pagination(self) -> None:
+        for i in range(5):
+            create_product(self.db, f"Кабель {i}", "", 1.0, 1, self.cat.id)
+        first = self._names("кабель", limit=3)
+        second = self._names("кабель", offset=3, limit=3)
+        self.assertEqual(len(first), 3)
+        self.assertEqual(len(second), 2)
+        self.assertFalse(set(first) & set(second))
+
+    def test_query_syntax_is_neutralised(self) -> None:
+        self.assertEqual(search_query('lenovo" OR NEAR(*'), '"lenovo"* "or"* "near"*')
+        self.assertIsNone(search_query("  !!! "))
+        self.assertEqual(search_products(self.db, "***"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+import asyncio
+import time
+import unittest
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import AnswerCallbackQuery, EditMessageReplyMarkup, EditMessageText, SendMessage
+from services.send_queue import Priority, SendScheduler, TokenBucket, send_priority
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_refill_and_pause(self) -> None:
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2, capacity=2, clock=clock)
+        bucket.take()
+        bucket.take()
+        self.assertAlmostEqual(bucket.delay(), 0.5)
+        clock.now = 0.5
+        self.assertEqual(bucket.delay(), 0.0)
+        bucket.pause(3)
+        self.assertAlmostEqual(bucket.delay(), 3.0)
+        clock.now = 4.0
+        self.assertEqual(bucket.delay(), 0.0)
+
+
+class TestSendScheduler(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.sent = []
+
+    async def _make_request(self, bot, method):
+        self.sent.append(method)
+        return f"sent:{getattr(method, 'text', '')}"
+
+    async def test_priority_lane_goes_first_when_global_limit_is_hit(self) -> None:
+        scheduler = SendScheduler(global_rate=20, chat_rate=100, chat_burst=100)
+        scheduler.global_bucket.tokens = 0
+
+        async def send(chat_id: int, text: str, priority: Priority) -> None:
+            with send_priority(priority):
+                await scheduler(self._make_request, None, SendMessage(chat_id=chat_id, text=text))
+
+        low = [asyncio.create_task(send(i, f"catalog{i}", Priority.LOW)) for i in range(3)]
+        await asyncio.sleep(0)
+        high = asyncio.create_task(send(99, "order", Priority.HIGH))
+        await asyncio.gather(high, *low)
+        self.assertEqual(self.sent[0].text, "order")
+
+    async def test_per_chat_bucket_spaces_messages(self) -> None:
+        scheduler = SendScheduler(global_rate=1000, chat_rate=20, chat_burst=1)
+        started = time.perf_counter()
+        for i in range(3):
+            await scheduler(self._make_request, None, SendMessage(chat_id=1, text=str(i)))
+        self.assertGreaterEqual(time.perf_counter() - started, 0.09)
+        self.assertEqual([m.text for m in self.sent], ["0", "1", "2"])
+
+    async def test_retry_after_is_retried(self) -> None:
+        scheduler = SendScheduler(global_rate=1000, chat_rate=1000, chat_burst=10)
+        attempts = []
+
+        async def flaky(bot, method):
+            attempts.append(method)
+            if len(attempts) == 1:
+                raise TelegramRetryAfter(method=method, message="Too Many Requests", retry_after=0)
+            return "ok"
+
+        self.assertEqual(await scheduler(flaky, None, SendMessage(chat_id=1, text="x")), "ok")
+        self.assertEqual(len(attempts), 2)
+
+    async def test_retry_after_gives_up_after_max_retries(self) -> None:
+        scheduler = SendScheduler(global_rate=1000, chat_rate=1000, chat_burst=10, max_retries=1)
+
+        async def always_flooded(bot, method):
+            raise TelegramRetryAfter(method=method, message="Too Many Requests", retry_after=0)
+
+        with self.assertRaises(TelegramRetryAfter):
+            await scheduler(always_flooded, None, SendMessage(chat_id=1, text="x"))
+
+    async def test_duplicate_edits_are_coalesced(self) -> None:
+        scheduler = SendScheduler(global_rate=1000, chat_rate=20, chat_burst=1)
+        scheduler._lane(1).bucket.tokens = 0
+
+        def edit(text: str):
+            return scheduler(self._make_request, None, EditMessageText(chat_id=1, message_id=5, text=text))
+
+        results = await asyncio.gather(edit("10%"), edit("50%"), edit("100%"))
+        self.assertEqual([m.text for m in self.sent], ["100%"])
+        self.assertEqual(results, ["sent:100%"] * 3)
+
+    async def test_edits_with_different_methods_are_not_coalesced(self) -> None:
+        scheduler = SendScheduler(global_rate=1000, chat_rate=20, chat_burst=1)
+        scheduler._lane(1).bucket.tokens = 0
+
+        await asyncio.gather(
+            scheduler(self._make_request, None, EditMessageText(chat_id=1, message_id=5, text="Корзина")),
+            scheduler(self._make_request, None, EditMessageReplyMarkup(chat_id=1, message_id=5)),
+        )
+        self.assertEqual([m.__api_method__ for m in self.sent], ["editMessageText", "editMessageReplyMarkup"])
+
+    async def test_non_message_methods_bypass_queue(self) -> None:
+        scheduler = SendScheduler(global_rate=1, chat_rate=1, chat_burst=1)
+        scheduler.global_bucket.tokens = 0
+        result = await asyncio.wait_for(
+            scheduler(self._make_request, None, AnswerCallbackQuery(callback_query_id="1")), 0.5
+        )
+        self.assertEqual(result, "sent:None")
+
+
+if __name__ == "__main__":
+    unittest.main()
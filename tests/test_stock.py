@@ -0,0 +1,106 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import Session, sessionmaker
+from database.models import Base, OrderItem, Product
+from database.crud import get_or_create_user, create_category, create_product, create_order, add_item_to_order
+from database.stock import commit_with_retry, locked_products, reserve_stock, ProductLockTable
+
+
+def _buy(db: Session, user_id: int, product_id: int) -> OrderItem:
+    order = create_order(db, user_id)
+    return add_item_to_order(db, order.id, product_id, 1)
+
+
+class TestReserveStock(unittest.TestCase):
+    def setUp(self) -> None:
+        self.engine = create_engine("sqlite:///:memory:", echo=False, future=True)
+        Base.metadata.create_all(bind=self.engine)
+        self.db = Session(self.engine)
+        cat = create_category(self.db, "Electronics")
+        self.product = create_product(self.db, "Laptop", "", 1000.0, 2, cat.id)
+
+    def tearDown(self) -> None:
+        self.db.close()
+        self.engine.dispose()
+
+    def test_reserve_decrements_when_enough(self) -> None:
+        self.assertTrue(reserve_stock(self.db, self.product.id, 2))
+        self.db.refresh(self.product)
+        self.assertEqual(self.product.quantity, 0)
+
+    def test_reserve_refuses_oversell(self) -> None:
+        self.assertFalse(reserve_stock(self.db, self.product.id, 3))
+        self.db.refresh(self.product)
+        self.assertEqual(self.product.quantity, 2)
+
+    def test_lock_table_reuses_lock_per_product(self) -> None:
+        table = ProductLockTable()
+        with table.hold([2, 1, 2]):
+            self.assertTrue(table._lock_for(1).locked())
+            self.assertTrue(table._lock_for(2).locked())
+        self.assertFalse(table._lock_for(1).locked())
+
+
+class TestConcurrentPurchases(unittest.TestCase):
+    STOCK = 300
+    BUYS = 2000
+    WORKERS = 16
+
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        url = f"sqlite:///{os.path.join(self.tmpdir.name, 'shop.db')}"
+        self.engine = create_engine(url, future=True, connect_args={"check_same_thread": False, "timeout": 1})
+        Base.metadata.create_all(bind=self.engine)
+        self.factory = sessionmaker(bind=self.engine, autoflush=False, expire_on_commit=False)
+        with self.factory() as db:
+            self.user_id = get_or_create_user(db, 1, "buyer", "Buyer").id
+            cat = create_category(db, "Hot")
+            self.product_id = create_product(db, "Hot item", "", 10.0, self.STOCK, cat.id).id
+            db.commit()
+
+    def tearDown(self) -> None:
+        self.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def _stress(self, use_locks: bool) -> float:
+        sold = 0
+        sold_guard = threading.Lock()
+
+        def attempt(_: int) -> None:
+            nonlocal sold
+            with self.factory() as db:
+                try:
+                    with locked_products([self.product_id], enabled=use_locks):
+                        commit_with_retry(db, _buy, self.user_id, self.product_id, attempts=50)
+                except ValueError:
+                    return
+            with sold_guard:
+                sold += 1
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.WORKERS) as pool:
+            list(pool.map(attempt, range(self.BUYS)))
+        elapsed = time.perf_counter() - started
+
+        with self.factory() as db:
+            remaining = db.query(Product.quantity).filter(Product.id == self.product_id).scalar()
+            sold_in_db = db.query(func.coalesce(func.sum(OrderItem.quantity), 0)).scalar()
+        self.assertEqual(sold, self.STOCK)
+        self.assertEqual(sold_in_db, self.STOCK)
+        self.assertEqual(remaining, 0)
+        return self.BUYS / elapsed
+
+    def test_no_oversell_without_locks(self) -> None:
+        self.assertGreater(self._stress(use_locks=False), 50)
+
+    def test_no_oversell_with_product_locks(self) -> None:
+        self.assertGreater(self._stress(use_locks=True), 50)
+
+
+if __name__ == "__main__":
+    unittest.main()
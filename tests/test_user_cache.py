@@ -0,0 +1,70 @@
+import unittest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from database.models import Base, User
+from database.crud import get_or_create_user
+from services.user_cache import UserCache
+from tests.helpers import count_queries
+
+
+class TestUserCache(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.engine = create_engine(
+            "sqlite://", future=True, poolclass=StaticPool, connect_args={"check_same_thread": False}
+        )
+        Base.metadata.create_all(bind=self.engine)
+        self.factory = sessionmaker(bind=self.engine, autoflush=False, expire_on_commit=False)
+        self.cache = UserCache(maxsize=100, ttl=60)
+
+    def tearDown(self) -> None:
+        self.engine.dispose()
+
+    async def test_ensure_caches_only_after_commit(self) -> None:
+        with self.factory() as db:
+            profile = await self.cache.ensure(db, 1, "alice", "Alice")
+            self.assertIsNone(self.cache.get(1))
+            db.commit()
+        self.assertEqual(self.cache.get(1), profile)
+
+        with self.factory() as db, count_queries(self.engine) as counter:
+            again = await self.cache.ensure(db, 1, "alice", "Alice")
+        self.assertEqual(again, profile)
+        self.assertEqual(counter.count, 0)
+
+    async def test_ensure_with_commit_releases_write_immediately(self) -> None:
+        with self.factory() as db:
+            profile = await self.cache.ensure(db, 1, "alice", "Alice", commit=True)
+            self.assertFalse(db.in_transaction())
+            self.assertEqual(self.cache.get(1), profile)
+
+    async def test_rollback_does_not_poison_cache(self) -> None:
+        with self.factory() as db:
+            await self.cache.ensure(db, 1, "alice", "Alice")
+            db.rollback()
+        self.assertIsNone(self.cache.get(1))
+
+    async def test_changed_profile_is_written_and_refreshed(self) -> None:
+        with self.factory() as db:
+            await self.cache.ensure(db, 1, "alice", "Alice")
+            db.commit()
+            renamed = await self.cache.ensure(db, 1, "alice2", "Alice B")
+            db.commit()
+        self.assertEqual(self.cache.get(1), renamed)
+        with self.factory() as db:
+            self.assertEqual(db.query(User.username).filter(User.telegram_id == 1).scalar(), "alice2")
+
+    async def test_lookup_and_invalidate(self) -> None:
+        with self.factory() as db:
+            self.assertIsNone(await self.cache.lookup(db, 7))
+            get_or_create_user(db, 7, "admin", "Admin", is_admin=True)
+            db.commit()
+            profile = await self.cache.lookup(db, 7)
+        self.assertTrue(profile.is_admin)
+        self.assertIs(self.cache.get(7), profile)
+        self.cache.invalidate(7)
+        self.assertIsNone(self.cache.get(7))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from database import migrations
+from database.crud import create_category, create_order, create_product, get_or_create_user
+from handlers.user_handlers import prime_catalog
+from services.cache import MISSING
+from services.catalog_cache import CATEGORIES, catalog_cache
+from services.user_cache import user_cache
+from services.warmup import StartupReport, Warmup
+
+
+class TestWarmup(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.engine = create_engine(
+            "sqlite://", future=True, poolclass=StaticPool, connect_args={"check_same_thread": False}
+        )
+        migrations.upgrade(self.engine)
+        self.factory = sessionmaker(bind=self.engine, autoflush=False, expire_on_commit=False)
+        with self.factory() as db:
+            self.categories = [create_category(db, name).id for name in ("Книги", "Игры", "Музыка")]
+            create_product(db, "Книга", "", 10.0, 5, self.categories[0])
+            for telegram_id in (1, 2, 3):
+                user = get_or_create_user(db, telegram_id, f"user{telegram_id}", None)
+                if telegram_id != 2:
+                    create_order(db, user.id)
+            db.commit()
+        catalog_cache.invalidate_all()
+        user_cache.clear()
+
+    def tearDown(self) -> None:
+        catalog_cache.invalidate_all()
+        user_cache.clear()
+        self.engine.dispose()
+
+    async def test_primes_catalog_and_recent_buyers(self) -> None:
+        report = StartupReport()
+        warmup = Warmup(self.factory, report, wait=5)
+        warmup.add("catalog", lambda db: prime_catalog(db, max_categories=2))
+        warmup.add("users", user_cache.prime)
+        await warmup.start()
+
+        self.assertIsNot(catalog_cache.get(("categories", CATEGORIES)), MISSING)
+        self.assertIsNot(catalog_cache.get(("category", self.categories[0], "")), MISSING)
+        self.assertIsNot(catalog_cache.get(("category", self.categories[1], "")), MISSING)
+        self.assertIs(catalog_cache.get(("category", self.categories[2], "")), MISSING)
+        # Пользователь без заказов в прогрев не попадает
+        self.assertIsNotNone(user_cache.get(1))
+        self.assertIsNone(user_cache.get(2))
+        self.assertIsNotNone(user_cache.get(3))
+        self.assertEqual(report.counts, {"warmup.catalog": 3, "warmup.users": 2})
+        self.assertIn("warmup", report.phases)
+        await warmup.stop()
+
+    async def test_failed_step_does_not_stop_warmup(self) -> None:
+        def broken(db):
+            raise RuntimeError("boom")
+
+        report = StartupReport()
+        warmup = Warmup(self.factory, report, wait=5)
+        warmup.add("broken", broken)
+        warmup.add("users", user_cache.prime)
+        with self.assertLogs("services.warmup", "ERROR"):
+            await warmup.start()
+        self.assertEqual(report.counts, {"warmup.users": 2})
+        self.assertNotIn("warmup.broken", report.phases)
+        await warmup.stop()
+
+
+class TestStartupReport(unittest.TestCase):
+    def test_summary_lists_phases_with_counts(self) -> None:
+        report = StartupReport()
+        report.record("migrations", 0.012)
+        report.record("warmup.users", 0.5, 40)
+        self.assertEqual(report.summary(), "migrations=12ms warmup.users=500ms (40)")
+
+
+if __name__ == "__main__":
+    unittest.main()
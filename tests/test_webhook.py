@@ -0,0 +1,108 @@
+import asyncio
+import unittest
+from aiohttp import ClientSession, web
+from aiogram import Bot, Dispatcher, Router
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.filters import Command
+from aiogram.types import Message
+from tools.fake_api import FakeBotAPI
+from webhook import UPDATE_LIMITER, build_webhook_app
+
+SECRET = "s3cret"
+
+
+def make_update(update_id: int, text: str) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": 100 + update_id, "type": "private"},
+            "from": {"id": 100 + update_id, "is_bot": False, "first_name": "User"},
+            "text": text,
+            "entities": [{"type": "bot_command", "offset": 0, "length": len(text)}],
+        },
+    }
+
+
+class TestWebhookMode(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.api = FakeBotAPI()
+        api_url = await self.api.start()
+        self.bot = Bot(
+            token="123456:ABCdef",
+            session=AiohttpSession(api=TelegramAPIServer.from_base(api_url)),
+        )
+        self.active = 0
+        self.peak = 0
+        self.delay = 0.05
+        router = Router()
+
+        @router.message(Command("ping"))
+        async def ping(message: Message) -> None:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            await asyncio.sleep(self.delay)
+            self.active -= 1
+            await message.answer("pong")
+
+        dp = Dispatcher()
+        dp.include_router(router)
+        self.active_at_shutdown = None
+
+        async def on_shutdown() -> None:
+            self.active_at_shutdown = self.active
+
+        dp.shutdown.register(on_shutdown)
+        self.app = build_webhook_app(self.bot, dp, path="/webhook", secret=SECRET, max_concurrency=2)
+        self.runner = web.AppRunner(self.app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        host, port = self.runner.addresses[0][:2]
+        self.webhook_url = f"http://{host}:{port}/webhook"
+        await self.bot.set_webhook(self.webhook_url, secret_token=SECRET)
+
+    async def asyncTearDown(self) -> None:
+        await self.runner.cleanup()
+        await self.api.stop()
+
+    async def test_update_is_processed_end_to_end(self) -> None:
+        self.assertEqual(self.api.webhook["url"], self.webhook_url)
+        status = await self.api.deliver(make_update(1, "/ping"))
+        self.assertEqual(status, 200)
+        sent = await self.api.wait_for("sendmessage")
+        self.assertEqual(sent[0]["text"], "pong")
+        self.assertEqual(int(sent[0]["chat_id"]), 101)
+
+    async def test_wrong_secret_is_rejected(self) -> None:
+        async with ClientSession() as session:
+            async with session.post(
+                    self.webhook_url, json=make_update(2, "/ping"),
+                    headers={"X-Telegram-Bot-Api-Secret-Token": "wrong"},
+            ) as response:
+                self.assertEqual(response.status, 401)
+        self.assertEqual(self.api.calls_of("sendmessage"), [])
+
+    async def test_concurrency_is_limited(self) -> None:
+        statuses = await asyncio.gather(*(self.api.deliver(make_update(i, "/ping")) for i in range(10)))
+        self.assertEqual(statuses, [200] * 10)
+        self.assertEqual(len(self.api.calls_of("sendmessage")), 10)
+        self.assertLessEqual(self.peak, 2)
+        self.assertEqual(self.app[UPDATE_LIMITER].in_flight, 0)
+
+
+    async def test_shutdown_drains_in_flight_updates(self) -> None:
+        self.delay = 0.5
+        delivery = asyncio.create_task(self.api.deliver(make_update(3, "/ping")))
+        while not self.active:
+            await asyncio.sleep(0.005)
+        await self.runner.cleanup()
+        self.assertEqual(self.active_at_shutdown, 0)
+        self.assertEqual(await delivery, 200)
+        self.assertEqual(len(self.api.calls_of("sendmessage")), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest import mock
+from aiogram import Bot, Dispatcher, F
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+import config
+from tools.fake_api import FakeBotAPI
+from workers import UserOrderedRunner, WorkerPool, poll_updates, shard_key, worker_env
+
+
+def _message(update_id: int, user_id: int, text: str) -> dict:
+    return {"update_id": update_id, "message": {
+        "message_id": update_id, "date": 0, "text": text,
+        "chat": {"id": user_id, "type": "private"},
+        "from": {"id": user_id, "is_bot": False, "first_name": "User"},
+    }}
+
+
+class TestShardKey(unittest.TestCase):
+    def test_user_then_chat_then_update_id(self) -> None:
+        self.assertEqual(shard_key(_message(1, 42, "hi")), 42)
+        callback = {"update_id": 2, "callback_query": {"id": "1", "from": {"id": 7}, "data": "x"}}
+        self.assertEqual(shard_key(callback), 7)
+        self.assertEqual(shard_key({"update_id": 3, "channel_post": {"chat": {"id": -100}}}), -100)
+        self.assertEqual(shard_key({"update_id": 4}), 4)
+
+
+class TestWorkerEnv(unittest.TestCase):
+    def test_global_send_rate_is_split_between_workers(self) -> None:
+        with mock.patch.object(config, "SEND_GLOBAL_RATE", 30.0), mock.patch.object(config, "METRICS_PORT", 9100):
+            envs = [worker_env(index, 4) for index in range(4)]
+        self.assertEqual(envs[1], {"WORKER_INDEX": "1", "SEND_GLOBAL_RATE": "7.5", "METRICS_PORT": "9102"})
+        # Вместе воркеры не превышают общий лимит Telegram
+        self.assertAlmostEqual(sum(float(env["SEND_GLOBAL_RATE"]) for env in envs), 30.0)
+
+
+class TestUserOrderedRunner(unittest.IsolatedAsyncioTestCase):
+    async def test_same_user_in_order_other_users_in_parallel(self) -> None:
+        runner = UserOrderedRunner(limit=10)
+        log = []
+
+        def job(name: str, delay: float):
+            async def run() -> None:
+                log.append(f"start {name}")
+                await asyncio.sleep(delay)
+                log.append(f"end {name}")
+            return run
+
+        runner.submit(1, job("a1", 0.05))
+        runner.submit(1, job("a2", 0))
+        runner.submit(2, job("b1", 0))
+        await runner.join()
+        self.assertLess(log.index("end a1"), log.index("start a2"))
+        self.assertLess(log.index("end b1"), log.index("end a1"))
+
+
+class TestWorkerPool(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.api = FakeBotAPI()
+        url = await self.api.start()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.environ["WORKER_TEST_API_URL"] = url
+        os.environ["WORKER_TEST_DIR"] = self.tmp.name
+        self.pool = WorkerPool(processes=2, app_module="tests.worker_app", check_interval=0.1)
+        await self.pool.start()
+
+    async def asyncTearDown(self) -> None:
+        await self.pool.stop(timeout=10)
+        await self.api.stop()
+        self.tmp.cleanup()
+
+    async def _reply(self, chat_id: int, timeout: float = 30) -> str:
+        return (await asyncio.wait_for(self.api.expect("sendMessage", chat_id), timeout))["text"]
+
+    async def test_updates_are_sharded_by_user(self) -> None:
+        replies = [self.api.expect("sendMessage", user_id) for user_id in (10, 11)]
+        self.pool.submit(_message(1, 10, "a"))
+        self.pool.submit(_message(2, 11, "b"))
+        texts = [(await asyncio.wait_for(reply, 30))["text"] for reply in replies]
+        self.assertEqual(texts, ["a@0", "b@1"])
+        for _ in range(100):
+            if not self.pool.pending:
+                break
+            await asyncio.sleep(0.05)
+        self.assertEqual(self.pool.pending, 0)
+
+    async def test_crashed_worker_is_restarted_and_update_replayed(self) -> None:
+        reply = self.api.expect("sendMessage", 20)
+        self.pool.submit(_message(1, 20, "/crash"))
+        self.assertEqual((await asyncio.wait_for(reply, 60))["text"], "recovered")
+
+    async def test_catalog_invalidation_reaches_other_workers(self) -> None:
+        reply = self.api.expect("sendMessage", 40)
+        self.pool.submit(_message(1, 40, "/invalidate 7"))
+        self.assertEqual((await asyncio.wait_for(reply, 30))["text"], "invalidated")
+        # Пользователь 41 обслуживается вторым воркером, его кэш сбрасывается через фронт
+        for update_id in range(2, 100):
+            reply = self.api.expect("sendMessage", 41)
+            self.pool.submit(_message(update_id, 41, "/generation 7"))
+            if (await asyncio.wait_for(reply, 30))["text"] == "1":
+                break
+            await asyncio.sleep(0.1)
+        else:
+            self.fail("Invalidation was not broadcast to the other worker")
+
+    async def test_polling_front(self) -> None:
+        bot = Bot(token="123456:ABCdef", session=AiohttpSession(
+            api=TelegramAPIServer.from_base(os.environ["WORKER_TEST_API_URL"])
+        ))
+        dp = Dispatcher()
+        dp.message.register(lambda message: None, F.text)
+        poller = asyncio.create_task(poll_updates(bot, dp, self.pool, polling_timeout=1))
+        try:
+            reply = self.api.expect("sendMessage", 31)
+            await self.api.push_update({"message": _message(0, 31, "polled")["message"]})
+            self.assertEqual((await asyncio.wait_for(reply, 30))["text"], "polled@1")
+        finally:
+            poller.cancel()
+            await asyncio.gather(poller, return_exceptions=True)
+            await bot.session.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+# Минимальное приложение для тестов режима воркеров: импортируется в дочерних процессах
+import os
+from typing import Tuple
+from aiogram import Bot, Dispatcher, F
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.types import Message
+from services.catalog_cache import catalog_cache
+
+
+async def crash(message: Message) -> None:
+    # Первый раз роняем процесс целиком, после перезапуска апдейт должен прийти снова
+    marker = os.path.join(os.environ["WORKER_TEST_DIR"], "crashed")
+    if not os.path.exists(marker):
+        open(marker, "w").close()
+        os._exit(1)
+    await message.answer("recovered")
+
+
+async def invalidate(message: Message) -> None:
+    catalog_cache.invalidate_category(int(message.text.split()[1]))
+    await message.answer("invalidated")
+
+
+async def generation(message: Message) -> None:
+    await message.answer(str(catalog_cache.version(int(message.text.split()[1]))[1]))
+
+
+async def echo(message: Message) -> None:
+    await message.answer(f"{message.text}@{os.environ['WORKER_INDEX']}")
+
+
+def create_app() -> Tuple[Bot, Dispatcher]:
+    bot = Bot(
+        token="123456:ABCdef",
+        session=AiohttpSession(api=TelegramAPIServer.from_base(os.environ["WORKER_TEST_API_URL"])),
+    )
+    dp = Dispatcher()
+    dp.message.register(crash, F.text == "/crash")
+    dp.message.register(invalidate, F.text.startswith("/invalidate"))
+    dp.message.register(generation, F.text.startswith("/generation"))
+    dp.message.register(echo)
+    return bot, dp
@@ -0,0 +1,153 @@
+# tools/fake_api.py
+
+import asyncio
+import json
+import time
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+from aiohttp import ClientSession, web
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "FakeShopBot", "username": "fake_shop_bot"}
+
+
+# Локальная замена Telegram Bot API: бот направляется сюда через TELEGRAM_API_URL,
+# а все исходящие вызовы записываются для проверок в тестах и нагрузочных прогонах
+class FakeBotAPI:
+    def __init__(self, record_calls: bool = True) -> None:
+        # Для нагрузочных прогонов вызовы можно не копить, а ждать ответы через expect()
+        self.record_calls = record_calls
+        self.calls: List[Tuple[str, Dict[str, Any]]] = []
+        self.webhook: Optional[Dict[str, Any]] = None
+        self.url = ""
+        self._message_id = 0
+        self._changed = asyncio.Condition()
+        self._update_id = 0
+        self._updates: List[Dict[str, Any]] = []
+        self._updates_ready = asyncio.Condition()
+        self._waiters: Dict[Tuple[str, Hashable], "asyncio.Future[Dict[str, Any]]"] = {}
+        self._runner: Optional[web.AppRunner] = None
+        self.app = web.Application()
+        self.app.router.add_post("/bot{token}/{method}", self._handle)
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        host, port = self._runner.addresses[0][:2]
+        self.url = f"http://{host}:{port}"
+        return self.url
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def calls_of(self, method: str) -> List[Dict[str, Any]]:
+        return [params for name, params in self.calls if name == method]
+
+    async def wait_for(self, method: str, count: int = 1, timeout: float = 5.0) -> List[Dict[str, Any]]:
+        async with self._changed:
+            await asyncio.wait_for(
+                self._changed.wait_for(lambda: len(self.calls_of(method)) >= count), timeout
+            )
+        return self.calls_of(method)
+
+    async def deliver(self, update: Dict[str, Any]) -> int:
+        # Доставка апдейта на зарегистрированный вебхук, как это делает Telegram
+        if not self.webhook:
+            raise RuntimeError("Webhook is not set")
+        headers = {}
+        if self.webhook.get("secret_token"):
+            headers["X-Telegram-Bot-Api-Secret-Token"] = self.webhook["secret_token"]
+        async with ClientSession() as session:
+            async with session.post(self.webhook["url"], json=update, headers=headers) as response:
+                await response.read()
+                return response.status
+
+    async def push_update(self, update: Dict[str, Any]) -> int:
+        # Очередь для getUpdates (long polling)
+        async with self._updates_ready:
+            # Номер выдаём под блокировкой, иначе апдейты попадут в очередь не по порядку и потеряются
+            self._update_id += 1
+            self._updates.append({"update_id": self._update_id, **update})
+            self._updates_ready.notify_all()
+        return self._update_id
+
+    def expect(self, method: str, key: Hashable) -> "asyncio.Future[Dict[str, Any]]":
+        # Future, который завершится при вызове method с chat_id/callback_query_id == key
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[(method.lower(), key)] = future
+        return future
+
+    async def _get_updates(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        offset = int(params.get("offset") or 0)
+        limit = int(params.get("limit") or 100)
+        timeout = float(params.get("timeout") or 0)
+        async with self._updates_ready:
+            # Подтверждённые (update_id < offset) апдейты Telegram больше не отдаёт
+            self._updates = [u for u in self._updates if u["update_id"] >= offset]
+            if not self._updates and timeout:
+                try:
+                    await asyncio.wait_for(self._updates_ready.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+            return self._updates[:limit]
+
+    def _resolve_waiter(self, method: str, params: Dict[str, Any]) -> None:
+        if not self._waiters:
+            return
+        for field in ("chat_id", "callback_query_id"):
+            if field in params:
+                value = params[field]
+                key = int(value) if field == "chat_id" else value
+                future = self._waiters.pop((method, key), None)
+                if future is not None and not future.done():
+                    future.set_result(params)
+                return
+
+    def _next_message(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        self._message_id += 1
+        return {
+            "message_id": int(params.get("message_id") or self._message_id),
+            "date": int(time.time()),
+            "chat": {"id": int(params.get("chat_id", 0)), "type": "private"},
+            "from": BOT_USER,
+            "text": params.get("text", ""),
+        }
+
+    def _result(self, method: str, params: Dict[str, Any]) -> Any:
+        if method == "getme":
+            return BOT_USER
+        if method == "setwebhook":
+            self.webhook = params
+            return True
+        if method == "deletewebhook":
+            self.webhook = None
+            return True
+        if method == "getwebhookinfo":
+            return {"url": (self.webhook or {}).get("url", ""), "has_custom_certificate": False,
+                    "pending_update_count": 0}
+        if method in ("sendmessage", "editmessagetext", "senddocument"):
+            return self._next_message(params)
+        return True
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"].lower()
+        form = await request.post()
+        params: Dict[str, Any] = {}
+        for key, value in form.items():
+            if isinstance(value, str) and value[:1] in "{[":
+                try:
+                    value = json.loads(value)
+                except ValueError:
+                    pass
+            params[key] = value
+        if method == "getupdates":
+            return web.json_response({"ok": True, "result": await self._get_updates(params)})
+        result = self._result(method, params)
+        self._resolve_waiter(method, params)
+        if self.record_calls:
+            async with self._changed:
+                self.calls.append((method, params))
+                self._changed.notify_all()
+        return web.json_response({"ok": True, "result": result})
@@ -0,0 +1,191 @@
+# tools/loadgen.py
+
+import argparse
+import asyncio
+import importlib
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from benchmarks.seed import Scale, SeededShop, seed_shop
+from benchmarks.stats import summarize
+from services.metrics import UPDATES_IN_FLIGHT
+from tools.fake_api import FakeBotAPI
+
+LOADGEN_TOKEN = "123456:loadgen"
+DEFAULT_MIX = "start=1,categories=3,show_cat=4,buy=2,checkout=1"
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    unknown = set(mix) - set(ACTIONS)
+    if unknown:
+        raise ValueError(f"Unknown actions: {', '.join(sorted(unknown))}")
+    return mix
+
+
+@dataclass
+class Traffic:
+    shop: SeededShop
+    rng: random.Random
+    _ids: Any = field(default_factory=itertools.count)
+
+    def _user(self, tg_id: int) -> Dict[str, Any]:
+        return {"id": tg_id, "is_bot": False, "first_name": f"User{tg_id}", "username": f"user{tg_id}"}
+
+    def message(self, tg_id: int, text: str) -> Tuple[Dict[str, Any], str, Any]:
+        update = {"message": {
+            "message_id": next(self._ids), "date": int(time.time()), "text": text,
+            "chat": {"id": tg_id, "type": "private"}, "from": self._user(tg_id),
+        }}
+        return update, "sendMessage", tg_id
+
+    def callback(self, tg_id: int, data: str) -> Tuple[Dict[str, Any], str, Any]:
+        query_id = f"{tg_id}-{next(self._ids)}"
+        update = {"callback_query": {
+            "id": query_id, "from": self._user(tg_id), "chat_instance": str(tg_id), "data": data,
+            "message": {"message_id": 1, "date": int(time.time()), "text": "",
+                        "chat": {"id": tg_id, "type": "private"}},
+        }}
+        return update, "answerCallbackQuery", query_id
+
+
+def _pack(codec: str, *args: Any) -> str:
+    # Хендлеры (а с ними config) импортируются лениво: main() сначала выставляет окружение
+    from handlers import user_handlers
+    return getattr(user_handlers, codec).pack(*args)
+
+
+# Действие -> апдейт и ожидаемый ответ бота (метод Bot API и ключ: chat_id или callback_query_id)
+ACTIONS = {
+    "start": lambda t, tg_id: t.message(tg_id, "/start"),
+    "categories": lambda t, tg_id: t.message(tg_id, "/categories"),
+    "show_cat": lambda t, tg_id: t.callback(tg_id, _pack("SHOW_CATEGORY", t.rng.choice(t.shop.category_ids))),
+    "buy": lambda t, tg_id: t.callback(tg_id, _pack("BUY", t.rng.choice(t.shop.product_ids))),
+    "cart": lambda t, tg_id: t.message(tg_id, "/cart"),
+    "checkout": lambda t, tg_id: t.callback(tg_id, _pack("CART", "checkout")),
+    "orders": lambda t, tg_id: t.message(tg_id, "/orders"),
+}
+
+
+async def run_load(
+        api: FakeBotAPI,
+        traffic: Traffic,
+        telegram_ids: Sequence[int],
+        actions_per_user: int,
+        mix: Dict[str, float],
+        concurrency: int,
+        timeout: float = 10.0,
+) -> Dict[str, Any]:
+    samples: Dict[str, List[float]] = defaultdict(list)
+    timeouts: Dict[str, int] = defaultdict(int)
+    names, weights = list(mix), list(mix.values())
+    limiter = asyncio.Semaphore(concurrency)
+
+    # Закрытый цикл: пользователь шлёт следующий апдейт только после ответа бота на предыдущий
+    async def simulate(tg_id: int) -> None:
+        script = ["start"] + traffic.rng.choices(names, weights, k=actions_per_user)
+        async with limiter:
+            for action in script:
+                update, method, key = ACTIONS[action](traffic, tg_id)
+                reply = api.expect(method, key)
+                started = time.perf_counter()
+                await api.push_update(update)
+                try:
+                    await asyncio.wait_for(reply, timeout)
+                except asyncio.TimeoutError:
+                    timeouts[action] += 1
+                    continue
+                samples[action].append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(simulate(tg_id) for tg_id in telegram_ids))
+    wall = time.perf_counter() - started
+
+    every = [s for values in samples.values() for s in values]
+    return {
+        "users": len(telegram_ids),
+        "requests": len(every) + sum(timeouts.values()),
+        "completed": len(every),
+        "timeouts": dict(timeouts),
+        "wall_seconds": wall,
+        "throughput_rps": len(every) / wall if wall else 0.0,
+        "latency": summarize(every, wall) if every else {},
+        "actions": {name: summarize(values, wall) for name, values in sorted(samples.items())},
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    api = FakeBotAPI(record_calls=False)
+    url = await api.start(port=args.api_port)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        # config читается при импорте, поэтому окружение готовим до импорта bot.py
+        os.environ["TELEGRAM_BOT_TOKEN"] = LOADGEN_TOKEN
+        os.environ["TELEGRAM_API_URL"] = url
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmpdir, 'loadgen.db')}"
+        os.environ.setdefault("METRICS_PORT", "0")
+        # Лимиты Telegram к фейковому API не относятся и без флага только маскируют пропускную способность бота
+        os.environ["SEND_RATE_LIMIT"] = "1" if args.rate_limit else "0"
+        bot, dp = importlib.import_module("bot").create_app()
+        from database.db import engine
+
+        scale = Scale(users=args.users, categories=args.categories, products=args.products, orders=0, seed=args.seed)
+        shop = seed_shop(engine, scale)
+        traffic = Traffic(shop, random.Random(args.seed))
+        polling = asyncio.create_task(dp.start_polling(bot, handle_signals=False, polling_timeout=1))
+        try:
+            report = await run_load(
+                api, traffic, shop.telegram_ids, args.actions, parse_mix(args.mix), args.concurrency, args.timeout
+            )
+        finally:
+            await dp.stop_polling()
+            await polling
+            # Хендлеры, ответ которых не дождались, ещё работают с БД: ждём их до закрытия движка
+            deadline = time.monotonic() + args.timeout
+            while UPDATES_IN_FLIGHT.value() > 0 and time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+            await bot.session.close()
+            await api.stop()
+            engine.dispose()
+    report["meta"] = {"scale": scale.as_dict(), "actions_per_user": args.actions, "mix": args.mix,
+                      "concurrency": args.concurrency}
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="End-to-end load against a local fake Bot API")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--actions", type=int, default=5, help="Actions per user after /start")
+    parser.add_argument("--concurrency", type=int, default=200, help="Users active at the same time")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Action weights (default: {DEFAULT_MIX})")
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--timeout", type=float, default=10.0, help="Seconds to wait for each reply")
+    parser.add_argument("--api-port", type=int, default=0)
+    parser.add_argument("--rate-limit", action="store_true", help="Keep the outgoing send scheduler enabled")
+    parser.add_argument("--output", help="Write JSON report to this file (default: stdout)")
+    args = parser.parse_args(argv)
+    parse_mix(args.mix)
+
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+    else:
+        print(text)
+    return 1 if report["timeouts"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+# webhook.py
+
+import asyncio
+import logging
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class UpdateLimiter:
+    def __init__(self, limit: int) -> None:
+        self._semaphore = asyncio.Semaphore(limit)
+        self._in_flight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    # Ограничиваем число одновременно обрабатываемых апдейтов: лишние запросы ждут в очереди,
+    # а Telegram/балансировщик получает ответ только после обработки
+    @web.middleware
+    async def middleware(self, request: web.Request, handler):
+        self._in_flight += 1
+        self._idle.clear()
+        try:
+            async with self._semaphore:
+                return await handler(request)
+        finally:
+            self._in_flight -= 1
+            if not self._in_flight:
+                self._idle.set()
+
+    # aiohttp вызывает on_shutdown раньше, чем дожидается запросов, поэтому дренируем сами,
+    # пока сессия бота ещё открыта
+    async def drain(self, app: web.Application) -> None:
+        try:
+            await asyncio.wait_for(self._idle.wait(), config.WEBAPP_SHUTDOWN_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning("Shutting down with %d updates still in flight", self._in_flight)
+
+
+UPDATE_LIMITER = web.AppKey("update_limiter", UpdateLimiter)
+
+
+async def _health(request: web.Request) -> web.Response:
+    return web.Response(text="ok")
+
+
+def build_webhook_app(
+        bot: Bot,
+        dp: Dispatcher,
+        path: str = config.WEBHOOK_PATH,
+        secret: str = config.WEBHOOK_SECRET,
+        max_concurrency: int = config.WEBHOOK_MAX_CONCURRENCY,
+) -> web.Application:
+    limiter = UpdateLimiter(max_concurrency)
+    app = web.Application(middlewares=[limiter.middleware])
+    app[UPDATE_LIMITER] = limiter
+    app.on_shutdown.append(limiter.drain)
+    SimpleRequestHandler(
+        dispatcher=dp, bot=bot, secret_token=secret or None, handle_in_background=False
+    ).register(app, path=path)
+    app.router.add_get("/healthz", _health)
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+async def set_webhook(bot: Bot, dispatcher: Dispatcher) -> None:
+    url = config.WEBHOOK_BASE_URL.rstrip("/") + config.WEBHOOK_PATH
+    logger.info("Setting webhook to %s", url)
+    await bot.set_webhook(
+        url,
+        secret_token=config.WEBHOOK_SECRET or None,
+        max_connections=min(config.WEBHOOK_MAX_CONCURRENCY, 100),
+        allowed_updates=dispatcher.resolve_used_update_types(),
+    )
+
+
+def run_webhook(bot: Bot, dp: Dispatcher) -> None:
+    if not config.WEBHOOK_BASE_URL:
+        raise RuntimeError("WEBHOOK_BASE_URL must be set for RUN_MODE=webhook")
+    if config.WEBHOOK_SET_ON_STARTUP:
+        dp.startup.register(set_webhook)
+    app = build_webhook_app(bot, dp)
+    # run_app перехватывает SIGTERM/SIGINT: перестаёт принимать запросы и ждёт незавершённые
+    web.run_app(
+        app,
+        host=config.WEBAPP_HOST,
+        port=config.WEBAPP_PORT,
+        shutdown_timeout=config.WEBAPP_SHUTDOWN_TIMEOUT,
+        print=None,
+    )
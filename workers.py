@@ -0,0 +1,353 @@
+# workers.py
+
+import asyncio
+import importlib
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager, suppress
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.methods import GetUpdates
+from aiogram.utils.backoff import Backoff, BackoffConfig
+import config
+from database.db import init_db
+from services.catalog_cache import catalog_cache
+from services.metrics import MetricsServer, registry
+from webhook import set_webhook
+
+logger = logging.getLogger(__name__)
+
+WORKER_PENDING = registry.gauge(
+    "bot_worker_pending_updates", "Updates handed to a worker process and not yet acknowledged", ("worker",)
+)
+WORKER_RESTARTS = registry.counter("bot_worker_restarts", "Worker processes restarted after a crash", ("worker",))
+
+_POLLING_BACKOFF = BackoffConfig(min_delay=1.0, max_delay=5.0, factor=1.3, jitter=0.1)
+
+
+def shard_key(update: Dict[str, Any]) -> int:
+    # Пользователь апдейта (from/user), иначе чат, иначе сам update_id
+    for field, payload in update.items():
+        if field == "update_id" or not isinstance(payload, dict):
+            continue
+        user = payload.get("from") or payload.get("user")
+        if user:
+            return user["id"]
+        chat = payload.get("chat") or (payload.get("message") or {}).get("chat")
+        if chat:
+            return chat["id"]
+    return update["update_id"]
+
+
+# Апдейты одного пользователя выполняются строго по очереди, разных пользователей — параллельно
+class UserOrderedRunner:
+    def __init__(self, limit: int = config.WORKER_CONCURRENCY) -> None:
+        self._semaphore = asyncio.Semaphore(limit)
+        self._tails: Dict[int, asyncio.Task] = {}
+
+    def submit(self, key: int, job: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        task = asyncio.create_task(self._run(self._tails.get(key), job))
+        self._tails[key] = task
+        task.add_done_callback(partial(self._release, key))
+        return task
+
+    async def _run(self, previous: Optional[asyncio.Task], job: Callable[[], Awaitable[Any]]) -> Any:
+        if previous is not None:
+            await asyncio.wait([previous])
+        async with self._semaphore:
+            return await job()
+
+    def _release(self, key: int, task: asyncio.Task) -> None:
+        if self._tails.get(key) is task:
+            del self._tails[key]
+
+    async def join(self) -> None:
+        while self._tails:
+            await asyncio.wait(list(self._tails.values()))
+
+
+def _load_app(app_module: str) -> Tuple[Bot, Dispatcher]:
+    # Модуль приложения отдаёт (Bot, Dispatcher) фабрикой create_app: импорт ничего не запускает,
+    # поэтому повторное выполнение bot.py как __mp_main__ при spawn безвредно
+    return importlib.import_module(app_module).create_app()
+
+
+async def _process(dp: Dispatcher, bot: Bot, update: Dict[str, Any], index: int, acks: Any) -> None:
+    try:
+        await dp.feed_raw_update(bot, update)
+    except Exception:
+        logger.exception("Update %s failed in worker %d", update["update_id"], index)
+    finally:
+        # Подтверждаем и упавший хендлер: повторять стоит только апдейты умершего процесса
+        acks.put((index, update["update_id"]))
+
+
+def _publish_invalidation(index: int, acks: Any, kind: str, category_id: Optional[int]) -> None:
+    # Кэш каталога у каждого воркера свой: фронт разошлёт инвалидацию остальным процессам
+    acks.put(("catalog", index, kind, category_id))
+
+
+async def _serve(index: int, bot: Bot, dp: Dispatcher, inbox: Any, acks: Any) -> None:
+    loop = asyncio.get_running_loop()
+    runner = UserOrderedRunner()
+    catalog_cache.subscribe(partial(_publish_invalidation, index, acks))
+    workflow_data = {"dispatcher": dp, "bots": [bot], **dp.workflow_data}
+    await dp.emit_startup(bot=bot, **workflow_data)
+    try:
+        while True:
+            update = await loop.run_in_executor(None, inbox.get)
+            if update is None:
+                break
+            if isinstance(update, tuple):
+                catalog_cache.apply(*update[1:])
+                continue
+            runner.submit(shard_key(update), partial(_process, dp, bot, update, index, acks))
+        await runner.join()
+    finally:
+        await dp.emit_shutdown(bot=bot, **workflow_data)
+        await bot.session.close()
+
+
+def _worker_main(index: int, app_module: str, inbox: Any, acks: Any) -> None:
+    # Ctrl+C получает вся группа процессов; останавливает воркеры фронт, дослав им всё принятое
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logging.basicConfig(level=logging.INFO)
+    bot, dp = _load_app(app_module)
+    asyncio.run(_serve(index, bot, dp, inbox, acks))
+
+
+@contextmanager
+def _environ(values: Dict[str, str]) -> Iterator[None]:
+    saved = {key: os.environ.get(key) for key in values}
+    os.environ.update(values)
+    try:
+        yield
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+def worker_env(index: int, processes: int) -> Dict[str, str]:
+    # Каждому воркеру свой порт метрик, иначе процессы спорят за один. Планировщик отправки
+    # у каждого процесса свой, поэтому общий лимит Telegram делится между воркерами поровну
+    env = {"WORKER_INDEX": str(index), "SEND_GLOBAL_RATE": str(config.SEND_GLOBAL_RATE / processes)}
+    if config.METRICS_PORT:
+        env["METRICS_PORT"] = str(config.METRICS_PORT + 1 + index)
+    return env
+
+
+# Фронт-процесс: раздаёт апдейты воркерам по пользователю и помнит каждый до подтверждения.
+# Упавший воркер перезапускается и получает заново все свои неподтверждённые апдейты.
+# Через фронт же воркеры рассылают друг другу инвалидации кэша каталога.
+class WorkerPool:
+    def __init__(
+            self,
+            processes: int = config.WORKER_PROCESSES,
+            app_module: str = "bot",
+            max_pending: int = config.WORKER_MAX_PENDING,
+            check_interval: float = config.WORKER_CHECK_INTERVAL,
+    ) -> None:
+        self.app_module = app_module
+        self.max_pending = max_pending
+        self.check_interval = check_interval
+        self._ctx = multiprocessing.get_context("spawn")
+        self._processes: List[Any] = [None] * processes
+        self._inboxes: List[Any] = [None] * processes
+        self._pending: List["OrderedDict[int, Dict[str, Any]]"] = [OrderedDict() for _ in range(processes)]
+        self._acks: Any = None
+        self._ack_reader: Optional[threading.Thread] = None
+        self._supervisor: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._capacity = asyncio.Event()
+        self._capacity.set()
+
+    @property
+    def pending(self) -> int:
+        return sum(len(pending) for pending in self._pending)
+
+    def _spawn(self, index: int) -> None:
+        inbox = self._ctx.Queue()
+        process = self._ctx.Process(
+            target=_worker_main, args=(index, self.app_module, inbox, self._acks), name=f"bot-worker-{index}"
+        )
+        with _environ(worker_env(index, len(self._processes))):
+            process.start()
+        self._processes[index] = process
+        self._inboxes[index] = inbox
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._acks = self._ctx.Queue()
+        for index in range(len(self._processes)):
+            self._spawn(index)
+        self._ack_reader = threading.Thread(target=self._read_acks, name="bot-worker-acks", daemon=True)
+        self._ack_reader.start()
+        self._supervisor = asyncio.create_task(self._supervise())
+        logger.info("Started %d worker processes", len(self._processes))
+
+    def submit(self, update: Dict[str, Any]) -> int:
+        index = shard_key(update) % len(self._processes)
+        self._pending[index][update["update_id"]] = update
+        WORKER_PENDING.set(len(self._pending[index]), worker=str(index))
+        self._inboxes[index].put(update)
+        if self.pending >= self.max_pending:
+            self._capacity.clear()
+        return index
+
+    async def wait_capacity(self) -> None:
+        await self._capacity.wait()
+
+    def _read_acks(self) -> None:
+        while True:
+            item = self._acks.get()
+            if item is None:
+                return
+            if item[0] == "catalog":
+                self._loop.call_soon_threadsafe(self._broadcast, *item[1:])
+            else:
+                self._loop.call_soon_threadsafe(self._ack, *item)
+
+    def _ack(self, index: int, update_id: int) -> None:
+        self._pending[index].pop(update_id, None)
+        WORKER_PENDING.set(len(self._pending[index]), worker=str(index))
+        if self.pending < self.max_pending:
+            self._capacity.set()
+
+    def _broadcast(self, origin: int, kind: str, category_id: Optional[int]) -> None:
+        # Инвалидация кэша каталога идёт в те же очереди, что и апдейты: апдейт, отданный
+        # воркеру после неё, уже не прочитает устаревшую страницу
+        for index, inbox in enumerate(self._inboxes):
+            if index != origin:
+                inbox.put(("catalog", kind, category_id))
+
+    async def _supervise(self) -> None:
+        while True:
+            await asyncio.sleep(self.check_interval)
+            for index, process in enumerate(self._processes):
+                if not process.is_alive():
+                    self._restart(index)
+
+    def _restart(self, index: int) -> None:
+        process, inbox = self._processes[index], self._inboxes[index]
+        replay = list(self._pending[index].values())
+        logger.error(
+            "Worker %d exited with code %s, restarting and replaying %d updates", index, process.exitcode, len(replay)
+        )
+        WORKER_RESTARTS.inc(worker=str(index))
+        inbox.cancel_join_thread()
+        inbox.close()
+        self._spawn(index)
+        # Повтор может дублировать апдейт, обработанный до падения, но не подтверждённый;
+        # оформление заказа защищено ключом идемпотентности в БД
+        for update in replay:
+            self._inboxes[index].put(update)
+
+    async def stop(self, timeout: float = config.WORKER_SHUTDOWN_TIMEOUT) -> None:
+        if self._supervisor is not None:
+            self._supervisor.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._supervisor
+        for inbox in self._inboxes:
+            inbox.put(None)
+        deadline = self._loop.time() + timeout
+        for index, process in enumerate(self._processes):
+            await self._loop.run_in_executor(None, process.join, max(deadline - self._loop.time(), 0))
+            if process.is_alive():
+                logger.warning("Worker %d did not stop in time, terminating", index)
+                process.terminate()
+                await self._loop.run_in_executor(None, process.join)
+        self._acks.put(None)
+        await self._loop.run_in_executor(None, self._ack_reader.join)
+        if self.pending:
+            logger.warning("Stopped with %d unacknowledged updates", self.pending)
+
+
+async def poll_updates(bot: Bot, dp: Dispatcher, pool: WorkerPool, polling_timeout: int = 10) -> None:
+    backoff = Backoff(config=_POLLING_BACKOFF)
+    get_updates = GetUpdates(timeout=polling_timeout, allowed_updates=dp.resolve_used_update_types())
+    request_timeout = int(bot.session.timeout + polling_timeout)
+    while True:
+        # Воркеры не успевают — перестаём забирать апдейты, они подождут на стороне Telegram
+        await pool.wait_capacity()
+        try:
+            updates = await bot(get_updates, request_timeout=request_timeout)
+        except Exception as e:
+            logger.error("Failed to fetch updates - %s: %s", type(e).__name__, e)
+            await backoff.asleep()
+            continue
+        backoff.reset()
+        for update in updates:
+            pool.submit(update.model_dump(mode="json", by_alias=True, exclude_unset=True))
+            get_updates.offset = update.update_id + 1
+
+
+async def _health(request: web.Request) -> web.Response:
+    return web.Response(text="ok")
+
+
+def build_front_app(
+        pool: WorkerPool, path: str = config.WEBHOOK_PATH, secret: str = config.WEBHOOK_SECRET
+) -> web.Application:
+    async def receive(request: web.Request) -> web.Response:
+        if secret and request.headers.get("X-Telegram-Bot-Api-Secret-Token") != secret:
+            return web.Response(status=401)
+        update = await request.json()
+        await pool.wait_capacity()
+        pool.submit(update)
+        return web.json_response({})
+
+    app = web.Application()
+    app.router.add_post(path, receive)
+    app.router.add_get("/healthz", _health)
+    return app
+
+
+async def _run_front(bot: Bot, dp: Dispatcher, processes: int) -> None:
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    # Миграции — один раз до запуска воркеров, иначе их применяли бы N процессов одновременно
+    await loop.run_in_executor(None, init_db)
+    pool = WorkerPool(processes)
+    await pool.start()
+    metrics = MetricsServer(config.METRICS_HOST, config.METRICS_PORT) if config.METRICS_PORT else None
+    if metrics:
+        await metrics.start()
+    try:
+        if config.RUN_MODE == "webhook":
+            if not config.WEBHOOK_BASE_URL:
+                raise RuntimeError("WEBHOOK_BASE_URL must be set for RUN_MODE=webhook")
+            if config.WEBHOOK_SET_ON_STARTUP:
+                await set_webhook(bot, dp)
+            runner = web.AppRunner(build_front_app(pool), access_log=None)
+            await runner.setup()
+            await web.TCPSite(runner, config.WEBAPP_HOST, config.WEBAPP_PORT).start()
+            await stop.wait()
+            await runner.cleanup()
+        else:
+            poller = asyncio.create_task(poll_updates(bot, dp, pool))
+            await stop.wait()
+            poller.cancel()
+            with suppress(asyncio.CancelledError):
+                await poller
+    finally:
+        logger.info("Stopping workers, %d updates pending", pool.pending)
+        await pool.stop()
+        if metrics:
+            await metrics.stop()
+        await bot.session.close()
+
+
+def run_workers(bot: Bot, dp: Dispatcher, processes: int = config.WORKER_PROCESSES) -> None:
+    asyncio.run(_run_front(bot, dp, processes))